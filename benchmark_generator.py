@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+BioLens Code Generator Benchmarks
+Times template lookup, rendering, directory creation, file writes and full
+generator runs, with JSON output and a regression check against a baseline
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent
+sys.path.insert(0, str(ROOT))
+
+import generate_code  # noqa: E402
+
+SUITES = ["import", "templates", "main"]
+
+# Each scenario runs in a fresh interpreter so module caches start cold
+IMPORT_SCENARIOS = {
+    "import only": "pass",
+    "single template": "generate_code.TEMPLATES['infrastructure/gemini_service']",
+    "all templates (eager)": "dict(generate_code.TEMPLATES)",
+}
+
+IMPORT_PROBE = """
+import sys, time
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+import generate_code
+{body}
+print(time.perf_counter() - start)
+"""
+
+# Metrics whose baseline is below this are too noisy to gate on
+NOISE_FLOOR_MS = 0.05
+
+
+def drop_caches() -> bool:
+    """Try to evict the OS page cache; needs root on Linux"""
+    try:
+        os.sync()
+        with open("/proc/sys/vm/drop_caches", "w") as f:
+            f.write("3\n")
+        return True
+    except OSError:
+        return False
+
+
+def timed_ms(fn, *args) -> float:
+    start = time.perf_counter_ns()
+    fn(*args)
+    return (time.perf_counter_ns() - start) / 1e6
+
+
+def summarise(samples: list[float]) -> dict:
+    return {"median_ms": statistics.median(samples), "min_ms": min(samples)}
+
+
+def time_import(body: str, repeat: int) -> list[float]:
+    """Time importing the generator and running body in fresh interpreters"""
+    probe = IMPORT_PROBE.format(root=str(ROOT), body=body)
+    samples = []
+    for _ in range(repeat):
+        result = subprocess.run([sys.executable, "-c", probe],
+                                capture_output=True, text=True, check=True)
+        samples.append(float(result.stdout.strip()) * 1000)
+    return samples
+
+
+def run_import_suite(repeat: int) -> dict:
+    """Run every import scenario and return timings in milliseconds"""
+    results = {}
+    for name, body in IMPORT_SCENARIOS.items():
+        results[name] = summarise(time_import(body, repeat))
+        print(f"  {name:<24} median {results[name]['median_ms']:8.3f} ms"
+              f"   min {results[name]['min_ms']:8.3f} ms")
+    return results
+
+
+def run_templates_suite(repeat: int, cold: bool) -> dict:
+    """Time each phase of emitting every template in the layer listing
+
+    Every cold sample gets its own fresh registry, renderer and output
+    directory, and the page cache is evicted right before it when ``cold`` is
+    set and permitted; warm samples repeat the same operation against the
+    state the cold sample left behind.
+    """
+    # Project files and binary assets are built in code, not from templates
+    outputs = [(relative, key) for _, items in generate_code.LAYERS for relative, key in items
+               if key in generate_code.TEMPLATES]
+    phases = ["lookup", "render", "mkdir", "write"]
+    samples = {key: {f"{phase}_{state}": [] for phase in phases for state in ("cold", "warm")}
+               for _, key in outputs}
+    params = generate_code.resolve_params()
+
+    for _ in range(repeat):
+        for relative, key in outputs:
+            s = samples[key]
+            registry = generate_code.TemplateRegistry(generate_code.TEMPLATE_DIR)
+            out_dir = Path(tempfile.mkdtemp(prefix="biolens-bench-"))
+            try:
+                if cold:
+                    drop_caches()
+                s["lookup_cold"].append(timed_ms(registry.__getitem__, key))
+                s["lookup_warm"].append(timed_ms(registry.__getitem__, key))
+
+                source = registry[key]
+                s["render_cold"].append(timed_ms(
+                    lambda: generate_code.CompiledTemplate(key, source)(params)))
+                compiled = generate_code.CompiledTemplate(key, source)
+                s["render_warm"].append(timed_ms(compiled, params))
+                content = compiled(params)
+
+                parent = (out_dir / relative).parent
+                s["mkdir_cold"].append(timed_ms(
+                    lambda: parent.mkdir(parents=True, exist_ok=True)))
+                s["mkdir_warm"].append(timed_ms(
+                    lambda: parent.mkdir(parents=True, exist_ok=True)))
+
+                s["write_cold"].append(timed_ms(
+                    generate_code.emit_file, out_dir, relative, content, key))
+                s["write_warm"].append(timed_ms(
+                    generate_code.emit_file, out_dir, relative, content, key))
+            finally:
+                shutil.rmtree(out_dir, ignore_errors=True)
+
+    results = {}
+    for relative, key in outputs:
+        results[key] = {metric: summarise(values) for metric, values in samples[key].items()}
+        row = "  ".join(f"{phase} {results[key][phase + '_cold']['median_ms']:7.3f}"
+                        for phase in phases)
+        print(f"  {key:<40} {row}  (cold, ms)")
+    return results
+
+
+def run_main_suite(repeat: int, cold: bool) -> dict:
+    """Time full generator runs into a fresh and an already generated tree"""
+    scenarios = {
+        "full_cold": [],
+        "full_warm": [],
+        "incremental_warm": [],
+    }
+    for _ in range(repeat):
+        out_dir = Path(tempfile.mkdtemp(prefix="biolens-bench-"))
+        try:
+            generate_code.TEMPLATES.clear()
+            generate_code._render_cached.cache_clear()
+            if cold:
+                drop_caches()
+            argv = ["--output-dir", str(out_dir)]
+            with contextlib.redirect_stdout(io.StringIO()):
+                scenarios["full_cold"].append(timed_ms(generate_code.main, argv))
+                scenarios["full_warm"].append(timed_ms(generate_code.main, argv))
+                scenarios["incremental_warm"].append(
+                    timed_ms(generate_code.main, argv + ["--incremental"]))
+        finally:
+            shutil.rmtree(out_dir, ignore_errors=True)
+
+    results = {name: summarise(values) for name, values in scenarios.items()}
+    for name, result in results.items():
+        print(f"  {name:<24} median {result['median_ms']:8.3f} ms   min {result['min_ms']:8.3f} ms")
+    return results
+
+
+def flatten(results: dict, prefix: str = "") -> dict[str, float]:
+    """Flatten nested results to {'suite/.../metric': median_ms}"""
+    flat = {}
+    for name, value in results.items():
+        path = f"{prefix}/{name}" if prefix else name
+        if isinstance(value, dict) and "median_ms" in value:
+            flat[path] = value["median_ms"]
+        elif isinstance(value, dict):
+            flat.update(flatten(value, path))
+    return flat
+
+
+def check_regressions(current: dict, baseline: dict, threshold: float) -> list[str]:
+    """List metrics whose median grew by more than threshold over the baseline"""
+    current_flat = flatten(current["results"])
+    failures = []
+    for metric, before in flatten(baseline["results"]).items():
+        after = current_flat.get(metric)
+        if after is None or before < NOISE_FLOOR_MS:
+            continue
+        if after > before * (1 + threshold):
+            failures.append(f"{metric}: {before:.3f} ms -> {after:.3f} ms "
+                            f"(+{(after / before - 1) * 100:.0f}%)")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the BioLens code generator")
+    parser.add_argument("--suite", action="append", choices=SUITES,
+                        help="suite to run; may be repeated (default: all)")
+    parser.add_argument("--repeat", type=int, default=20,
+                        help="samples per scenario (default: 20)")
+    parser.add_argument("--cold", action="store_true",
+                        help="evict the OS page cache before cold samples (needs root)")
+    parser.add_argument("--json", type=Path, metavar="PATH",
+                        help="write machine-readable results to PATH")
+    parser.add_argument("--baseline", type=Path, metavar="PATH",
+                        help="compare against a previous --json result and fail on regressions")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="allowed slowdown over the baseline as a fraction (default: 0.25)")
+    args = parser.parse_args(argv)
+    suites = args.suite or SUITES
+
+    cache_mode = "fresh state only"
+    if args.cold:
+        cache_mode = "page cache dropped" if drop_caches() else "fresh state only (drop_caches denied)"
+
+    results = {}
+    if "import" in suites:
+        print("⏱  Import time")
+        results["import"] = run_import_suite(args.repeat)
+    if "templates" in suites:
+        print(f"⏱  Per-template phases ({cache_mode})")
+        results["templates"] = run_templates_suite(args.repeat, args.cold)
+    if "main" in suites:
+        print(f"⏱  Full generator runs ({cache_mode})")
+        results["main"] = run_main_suite(args.repeat, args.cold)
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "repeat": args.repeat,
+            "cold_cache": cache_mode,
+        },
+        "results": results,
+    }
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        print(f"📝 Results written to {args.json}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        failures = check_regressions(report, baseline, args.threshold)
+        if failures:
+            print(f"❌ {len(failures)} regression(s) over {args.threshold:.0%}:")
+            for failure in failures:
+                print(f"  {failure}")
+            sys.exit(1)
+        print(f"✅ No regressions over {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
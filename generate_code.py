@@ -1,1357 +1,1089 @@
 #!/usr/bin/env python3
 """
 BioLens Complete Solution Code Generator
-Generates all .NET 10.0 source files with Agentic AI pattern
+Generates all .NET 10.0 project and source files with Agentic AI pattern
 """
 
+import fnmatch
+import functools
+import hashlib
+import io
+import json
 import os
+import re
+import shutil
+import stat
+import sys
+import tempfile
+import time
+from collections.abc import Mapping
+from contextlib import nullcontext
 from pathlib import Path
+from typing import BinaryIO, Iterator
 
 BASE_DIR = Path("/home/claude/BioLens")
 
-# All code templates
-TEMPLATES = {
-    # ===================
-    # DOMAIN LAYER
-    # ===================
-    "domain/enums": """namespace BioLens.Domain.Enums;
-
-public enum CaseStatus
-{
-    Created,
-    InProgress,
-    DiagnosisCompleted,
-    TreatmentAssigned,
-    FollowUpRequired,
-    Resolved,
-    Escalated
+# Template bodies live in templates/<key>.cs.tmpl and are read on first use.
+# Modules only needed by the CLI (argparse, tarfile, zipfile, thread pools)
+# are imported where they are used to keep library imports cheap.
+TEMPLATE_DIR = Path(__file__).resolve().parent / "templates"
+TEMPLATE_SUFFIX = ".cs.tmpl"
+
+
+class TemplateRegistry(Mapping):
+    """Read-only, dict-like view of the template files
+
+    Keys are template paths relative to the root without the suffix, e.g.
+    ``infrastructure/gemini_service``. A body is read from disk the first time
+    it is looked up and cached afterwards, so tools that need a single
+    template never pay for the rest.
+    """
+
+    def __init__(self, root: Path):
+        self.root = root
+        self._cache: dict[str, str] = {}
+        self._compiled: dict[str, CompiledTemplate] = {}
+        self._keys: list[str] | None = None
+
+    def path(self, key: str) -> Path:
+        return self.root / (key + TEMPLATE_SUFFIX)
+
+    def __getitem__(self, key: str) -> str:
+        try:
+            return self._cache[key]
+        except KeyError:
+            pass
+        try:
+            body = self.path(key).read_text(encoding='utf-8')
+        except FileNotFoundError:
+            raise KeyError(key) from None
+        self._cache[key] = body
+        return body
+
+    def __contains__(self, key) -> bool:
+        return key in self._cache or (isinstance(key, str) and self.path(key).is_file())
+
+    def __iter__(self):
+        if self._keys is None:
+            self._keys = sorted(
+                path.relative_to(self.root).as_posix()[:-len(TEMPLATE_SUFFIX)]
+                for path in self.root.rglob("*" + TEMPLATE_SUFFIX))
+        return iter(self._keys)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def invalidate(self, key: str):
+        """Forget the cached body and renderer of a template after it changed"""
+        self._cache.pop(key, None)
+        self._compiled.pop(key, None)
+        self._keys = None
+
+    def clear(self):
+        """Forget every cached body and renderer"""
+        self._cache.clear()
+        self._compiled.clear()
+        self._keys = None
+
+    def compiled(self, key: str) -> "CompiledTemplate":
+        """Return the template compiled into a renderer, compiling it once"""
+        try:
+            return self._compiled[key]
+        except KeyError:
+            pass
+        compiled = CompiledTemplate(key, self[key])
+        self._compiled[key] = compiled
+        return compiled
+
+
+# Placeholders look like {{ name }}; C# escaped braces never match because a
+# parameter name must follow the opening braces directly
+PLACEHOLDER = re.compile(r"\{\{ *([a-z_][a-z0-9_]*) *\}\}")
+
+# Values baked into the generated solution, overridable per deployment
+DEFAULT_PARAMS = {
+    "gemini_base_url": "https://generativelanguage.googleapis.com",
+    "gemini_model": "gemini-3-pro",
+    "max_output_tokens": 4096,
+    "max_images_per_case": 10,
+    "target_framework": "net10.0",
+    "triage_image_size": 224,
 }
 
-public enum ConfidenceLevel
-{
-    Low,
-    Medium,
-    High,
-    VeryHigh
-}
 
-public enum UrgencyLevel
-{
-    Routine,
-    Urgent,
-    Emergency,
-    Critical
+class CompiledTemplate:
+    """A template split once into literal chunks and parameter slots"""
+
+    __slots__ = ("key", "chunks", "parameters")
+
+    def __init__(self, key: str, source: str):
+        self.key = key
+        # Even indexes are literal text, odd indexes are parameter names
+        self.chunks = PLACEHOLDER.split(source)
+        self.parameters = frozenset(self.chunks[1::2])
+
+    def __call__(self, params: Mapping) -> str:
+        chunks = self.chunks[:]
+        try:
+            chunks[1::2] = [str(params[name]) for name in chunks[1::2]]
+        except KeyError as e:
+            raise ValueError(f"Template {self.key} needs parameter {e.args[0]!r}") from None
+        return "".join(chunks)
+
+
+TEMPLATES = TemplateRegistry(TEMPLATE_DIR)
+
+
+# Values are pasted verbatim into C# sources, mostly inside string literals
+UNSAFE_PARAM_VALUE = re.compile(r'["\\\x00-\x1f]')
+
+
+def resolve_params(overrides: Mapping | None = None) -> dict:
+    """Merge parameter overrides onto DEFAULT_PARAMS
+
+    Rejects unknown names, and values that could break out of a C# string
+    literal (quotes, backslashes and control characters such as newlines).
+    """
+    params = dict(DEFAULT_PARAMS)
+    for name, value in (overrides or {}).items():
+        if name not in DEFAULT_PARAMS:
+            raise ValueError(f"Unknown template parameter: {name}")
+        if UNSAFE_PARAM_VALUE.search(str(value)):
+            raise ValueError(f"Template parameter {name} cannot contain quotes, backslashes "
+                             f"or control characters: {value!r}")
+        params[name] = value
+    return params
+
+
+# Keyed on the CompiledTemplate itself, so a template reloaded after an edit
+# never hits renders of its previous body
+@functools.lru_cache(maxsize=4096)
+def _render_cached(compiled: CompiledTemplate, values: tuple) -> str:
+    return compiled(dict(values))
+
+
+def render_template(key: str, params: Mapping | None = None) -> str:
+    """Render a template with the given parameters
+
+    Results are cached on the template key plus the values of the parameters
+    that template actually uses, so variants that differ only in unrelated
+    parameters share one rendering.
+    """
+    params = resolve_params(params)
+    compiled = TEMPLATES.compiled(key)
+    missing = compiled.parameters - params.keys()
+    if missing:
+        raise ValueError(f"Template {key} needs parameter {min(missing)!r}")
+    values = tuple(sorted((name, str(params[name])) for name in compiled.parameters))
+    return _render_cached(compiled, values)
+
+
+# Declarative project model; the .csproj files and BioLens.sln are rendered
+# from this rather than from templates
+PROJECTS = {
+    "BioLens.Domain": {
+        "packages": [("MediatR.Contracts", "2.0.1")],
+        "references": [],
+    },
+    "BioLens.Application": {
+        "packages": [
+            ("MediatR", "12.4.0"),
+            ("AutoMapper", "13.0.1"),
+            ("FluentValidation", "11.9.0"),
+        ],
+        "references": ["BioLens.Domain"],
+    },
+    "BioLens.Infrastructure": {
+        "packages": [
+            ("Microsoft.EntityFrameworkCore.Sqlite", "10.0.0"),
+            ("LiteDB", "5.0.20"),
+            ("Polly", "8.4.0"),
+            ("Microsoft.Extensions.Http.Polly", "10.0.0"),
+            ("Microsoft.ML", "3.0.1"),
+            ("Microsoft.ML.ImageAnalytics", "3.0.1"),
+            ("Microsoft.ML.OnnxTransformer", "3.0.1"),
+            ("Microsoft.ML.OnnxRuntime", "1.17.3"),
+            ("SkiaSharp", "2.88.8"),
+            ("SkiaSharp.NativeAssets.Linux.NoDependencies", "2.88.8"),
+        ],
+        "references": ["BioLens.Domain", "BioLens.Application"],
+        "copy_to_output": ["Models\\triage-stub.onnx"],
+    },
+    "BioLens.Agents": {
+        "packages": [
+            ("Microsoft.SemanticKernel", "1.13.0"),
+            ("Microsoft.SemanticKernel.Agents.Core", "1.13.0-alpha"),
+        ],
+        "references": ["BioLens.Domain", "BioLens.Application", "BioLens.Infrastructure"],
+    },
 }
 
-public enum ImageType
-{
-    Skin,
-    Wound,
-    Rash,
-    Eyes,
-    Throat,
-    Limb,
-    Other
+# Every entry in BioLens.sln: (solution folder, name, project path, GUID).
+# Projects not in PROJECTS are listed but their files are maintained by hand.
+SOLUTION_FOLDERS = [
+    ("src", "8BC9CEB8-8B4A-11D0-8D11-00A0C91BC942"),
+    ("tests", "8BC9CEB9-8B4A-11D0-8D11-00A0C91BC942"),
+]
+SOLUTION_PROJECTS = [
+    ("src", "BioLens.Domain", "src/BioLens.Domain/BioLens.Domain.csproj",
+     "A1111111-1111-1111-1111-111111111111"),
+    ("src", "BioLens.Application", "src/BioLens.Application/BioLens.Application.csproj",
+     "A2222222-2222-2222-2222-222222222222"),
+    ("src", "BioLens.Infrastructure", "src/BioLens.Infrastructure/BioLens.Infrastructure.csproj",
+     "A3333333-3333-3333-3333-333333333333"),
+    ("src", "BioLens.Agents", "src/BioLens.Agents/BioLens.Agents.csproj",
+     "A4444444-4444-4444-4444-444444444444"),
+    ("src", "BioLens.Mobile", "src/BioLens.Mobile/BioLens.Mobile.csproj",
+     "A5555555-5555-5555-5555-555555555555"),
+    ("src", "BioLens.API", "src/BioLens.API/BioLens.API.csproj",
+     "A6666666-6666-6666-6666-666666666666"),
+    ("tests", "BioLens.Domain.Tests", "tests/BioLens.Domain.Tests/BioLens.Domain.Tests.csproj",
+     "B1111111-1111-1111-1111-111111111111"),
+    ("tests", "BioLens.Agents.Tests", "tests/BioLens.Agents.Tests/BioLens.Agents.Tests.csproj",
+     "B2222222-2222-2222-2222-222222222222"),
+    ("tests", "BioLens.Benchmarks", "tests/BioLens.Benchmarks/BioLens.Benchmarks.csproj",
+     "B3333333-3333-3333-3333-333333333333"),
+]
+
+# Layer listing keys for the outputs rendered from the project model
+PROJECT_KEY_PREFIX = "projects/"
+SOLUTION_KEY = "projects/solution"
+
+SOLUTION_FOLDER_TYPE = "2150E333-8FDC-42A3-9474-1A3956D46DE8"
+CSHARP_PROJECT_TYPE = "FAE04EC0-301F-11D3-BF4B-00C04F79EFBC"
+
+
+def render_csproj(name: str, params: Mapping | None = None) -> str:
+    """Render the .csproj of a project in PROJECTS"""
+    project = PROJECTS[name]
+    params = resolve_params(params)
+    lines = [
+        '<Project Sdk="Microsoft.NET.Sdk">',
+        '  <PropertyGroup>',
+        f'    <TargetFramework>{params["target_framework"]}</TargetFramework>',
+        '    <Nullable>enable</Nullable>',
+        '    <ImplicitUsings>enable</ImplicitUsings>',
+        '    <LangVersion>latest</LangVersion>',
+        '  </PropertyGroup>',
+    ]
+    if project["packages"]:
+        lines += ['', '  <ItemGroup>']
+        lines += [f'    <PackageReference Include="{package}" Version="{version}" />'
+                  for package, version in project["packages"]]
+        lines += ['  </ItemGroup>']
+    if project["references"]:
+        lines += ['', '  <ItemGroup>']
+        lines += [f'    <ProjectReference Include="..\\{ref}\\{ref}.csproj" />'
+                  for ref in project["references"]]
+        lines += ['  </ItemGroup>']
+    if project.get("copy_to_output"):
+        lines += ['', '  <ItemGroup>']
+        lines += [f'    <None Update="{item}" CopyToOutputDirectory="PreserveNewest" />'
+                  for item in project["copy_to_output"]]
+        lines += ['  </ItemGroup>']
+    lines.append('</Project>')
+    return '\n'.join(lines)
+
+
+def render_solution() -> str:
+    """Render BioLens.sln from SOLUTION_FOLDERS and SOLUTION_PROJECTS"""
+    folder_guids = dict(SOLUTION_FOLDERS)
+    lines = [
+        'Microsoft Visual Studio Solution File, Format Version 12.00',
+        '# Visual Studio Version 17',
+        'VisualStudioVersion = 17.0.31903.59',
+        'MinimumVisualStudioVersion = 10.0.40219.1',
+        '',
+    ]
+    for folder, guid in SOLUTION_FOLDERS:
+        lines += [f'Project("{{{SOLUTION_FOLDER_TYPE}}}") = "{folder}", "{folder}", "{{{guid}}}"',
+                  'EndProject', '']
+    for _, name, path, guid in SOLUTION_PROJECTS:
+        windows_path = path.replace("/", "\\")
+        lines += [f'Project("{{{CSHARP_PROJECT_TYPE}}}") = "{name}", "{windows_path}", "{{{guid}}}"',
+                  'EndProject', '']
+
+    lines += [
+        'Global',
+        '\tGlobalSection(SolutionConfigurationPlatforms) = preSolution',
+        '\t\tDebug|Any CPU = Debug|Any CPU',
+        '\t\tRelease|Any CPU = Release|Any CPU',
+        '\tEndGlobalSection',
+        '\tGlobalSection(ProjectConfigurationPlatforms) = postSolution',
+    ]
+    for _, _, _, guid in SOLUTION_PROJECTS:
+        for config in ("Debug", "Release"):
+            lines += [f'\t\t{{{guid}}}.{config}|Any CPU.ActiveCfg = {config}|Any CPU',
+                      f'\t\t{{{guid}}}.{config}|Any CPU.Build.0 = {config}|Any CPU']
+    lines += ['\tEndGlobalSection', '\tGlobalSection(NestedProjects) = preSolution']
+    lines += [f'\t\t{{{guid}}} = {{{folder_guids[folder]}}}'
+              for folder, _, _, guid in SOLUTION_PROJECTS]
+    lines += ['\tEndGlobalSection', 'EndGlobal']
+    return '\n'.join(lines)
+
+
+# Binary outputs built in code rather than from templates
+ASSET_KEY_PREFIX = "assets/"
+TRIAGE_MODEL_KEY = "assets/triage_stub_model"
+
+
+def _protobuf_field(number: int, value: int | str | bytes) -> bytes:
+    """Encode one protobuf field: ints as varints, str/bytes length-delimited"""
+    def varint(n: int) -> bytes:
+        out = bytearray()
+        while True:
+            byte, n = n & 0x7F, n >> 7
+            out.append(byte | (0x80 if n else 0))
+            if not n:
+                return bytes(out)
+
+    if isinstance(value, int):
+        return varint(number << 3) + varint(value)
+    if isinstance(value, str):
+        value = value.encode("utf-8")
+    return varint(number << 3 | 2) + varint(len(value)) + value
+
+
+def render_triage_model(params: Mapping | None = None) -> bytes:
+    """Build the stub ONNX image-triage model
+
+    GlobalAveragePool + Flatten over a 1x3xNxN float image, so the three
+    scores are the mean red, green and blue intensities. Deterministic and
+    tiny, it lets the offline triage engine run end to end on any CPU; swap
+    in a trained model with the same input and output for real triage.
+    """
+    params = resolve_params(params)
+    size = int(params["triage_image_size"])
+    field = _protobuf_field
+
+    def float_tensor(name: str, dims: list[int]) -> bytes:
+        shape = b"".join(field(1, field(1, dim)) for dim in dims)
+        return field(1, name) + field(2, field(1, field(1, 1) + field(2, shape)))
+
+    def node(op: str, source: str, target: str) -> bytes:
+        return field(1, source) + field(2, target) + field(3, op.lower()) + field(4, op)
+
+    graph = (field(1, node("GlobalAveragePool", "input", "pooled"))
+             + field(1, node("Flatten", "pooled", "output"))
+             + field(2, "biolens_triage_stub")
+             + field(11, float_tensor("input", [1, 3, size, size]))
+             + field(12, float_tensor("output", [1, 3])))
+    return (field(1, 8)                        # ir_version
+            + field(2, "biolens-generator")    # producer_name
+            + field(7, graph)
+            + field(8, field(2, 13)))          # opset_import: default domain, opset 13
+
+
+ASSETS = {
+    TRIAGE_MODEL_KEY: render_triage_model,
 }
 
-public enum BiologicalSex
-{
-    Male,
-    Female,
-    Intersex,
-    Unknown
-}
 
-public enum AgeUnit
-{
-    Days,
-    Weeks,
-    Months,
-    Years
+def render_output(key: str, params: Mapping | None = None) -> str | bytes:
+    """Render a layer listing entry, from the project model, code or a template"""
+    if key in ASSETS:
+        return ASSETS[key](params)
+    if key == SOLUTION_KEY:
+        return render_solution()
+    if key.startswith(PROJECT_KEY_PREFIX):
+        return render_csproj(key[len(PROJECT_KEY_PREFIX):], params)
+    return render_template(key, params)
+
+
+# Output layout: (layer banner, [(output path, template key), ...]) in emission order
+LAYERS = [
+    ("🏗️  Generating Project Files...", [
+        ("BioLens.sln", SOLUTION_KEY),
+    ] + [
+        (f"src/{name}/{name}.csproj", PROJECT_KEY_PREFIX + name) for name in PROJECTS
+    ]),
+    ("📦 Generating Domain Layer...", [
+        ("src/BioLens.Domain/Enums/Enums.cs", "domain/enums"),
+        ("src/BioLens.Domain/Entities/Patient.cs", "domain/entities/patient"),
+        ("src/BioLens.Domain/Entities/DiagnosticCase.cs", "domain/entities/diagnostic_case"),
+        ("src/BioLens.Domain/ValueObjects/ValueObjects.cs", "domain/value_objects"),
+        ("src/BioLens.Domain/Events/DomainEvents.cs", "domain/events"),
+        ("src/BioLens.Domain/Repositories/IRepositories.cs", "domain/repositories"),
+    ]),
+    ("🤖 Generating Agents Layer...", [
+        ("src/BioLens.Agents/Core/AgentBase.cs", "agents/core/agent_base"),
+        ("src/BioLens.Agents/Core/IncrementalJsonObjectReader.cs", "agents/core/incremental_json"),
+        ("src/BioLens.Agents/Core/DiagnosticCoordinatorAgent.cs", "agents/core/diagnostic_coordinator"),
+        ("src/BioLens.Agents/Core/ImageAnalysisAgent.cs", "agents/specialized/image_analysis"),
+        ("src/BioLens.Agents/Core/AudioTranscriptionAgent.cs", "agents/specialized/audio_transcription"),
+        ("src/BioLens.Agents/Core/MedicalReasoningAgent.cs", "agents/specialized/medical_reasoning"),
+        ("src/BioLens.Agents/Core/TreatmentPlannerAgent.cs", "agents/specialized/treatment_planner"),
+    ]),
+    ("⚙️  Generating Application Layer...", [
+        ("src/BioLens.Application/Commands/Commands.cs", "application/commands"),
+        ("src/BioLens.Application/Handlers/CommandHandlers.cs", "application/handlers"),
+    ]),
+    ("🔧 Generating Infrastructure Layer...", [
+        ("src/BioLens.Infrastructure/AI/GeminiAIService.cs", "infrastructure/gemini_service"),
+        ("src/BioLens.Infrastructure/AI/GeminiRequestContent.cs", "infrastructure/gemini_media"),
+        ("src/BioLens.Infrastructure/AI/GeminiResilience.cs", "infrastructure/gemini_resilience"),
+        ("src/BioLens.Infrastructure/AI/ImageTriageEngine.cs", "infrastructure/image_triage"),
+        ("src/BioLens.Infrastructure/Models/triage-stub.onnx", TRIAGE_MODEL_KEY),
+        ("src/BioLens.Infrastructure/Imaging/ImagePreprocessor.cs", "infrastructure/image_preprocessing"),
+        ("src/BioLens.Infrastructure/Imaging/ImageFingerprinter.cs", "infrastructure/image_fingerprint"),
+        ("src/BioLens.Infrastructure/AI/CachedGeminiAIService.cs", "infrastructure/gemini_cache"),
+        ("src/BioLens.Infrastructure/AI/ScheduledGeminiAIService.cs", "infrastructure/gemini_scheduling"),
+        ("src/BioLens.Infrastructure/Persistence/BioLensDbContext.cs", "infrastructure/persistence"),
+        ("src/BioLens.Infrastructure/Persistence/EntityConfigurations.cs", "infrastructure/entity_configurations"),
+        ("src/BioLens.Infrastructure/Persistence/PersistenceServiceCollectionExtensions.cs",
+         "infrastructure/persistence_setup"),
+    ]),
+]
+
+# Templates each template needs in order to compile; used by --only to pull in
+# everything a scoped generation depends on. Project files are added by
+# dependencies_of.
+DEPENDENCIES = {
+    "domain/enums": [],
+    "domain/value_objects": ["domain/enums"],
+    "domain/events": [],
+    "domain/entities/patient": ["domain/enums", "domain/value_objects"],
+    "domain/entities/diagnostic_case": [
+        "domain/entities/patient", "domain/enums", "domain/value_objects", "domain/events"],
+    "domain/repositories": ["domain/entities/patient", "domain/entities/diagnostic_case"],
+    "agents/core/agent_base": ["infrastructure/gemini_service"],
+    "agents/core/incremental_json": [],
+    "agents/core/diagnostic_coordinator": [
+        "agents/core/agent_base",
+        "agents/specialized/image_analysis",
+        "agents/specialized/audio_transcription",
+        "agents/specialized/medical_reasoning",
+        "agents/specialized/treatment_planner",
+        "domain/entities/diagnostic_case",
+    ],
+    "agents/specialized/image_analysis": [
+        "agents/core/agent_base",
+        "domain/value_objects",
+        "infrastructure/image_triage",
+        "infrastructure/image_preprocessing",
+        "infrastructure/image_fingerprint",
+    ],
+    "agents/specialized/audio_transcription": ["agents/core/agent_base", "domain/value_objects"],
+    "agents/specialized/medical_reasoning": [
+        "agents/core/agent_base",
+        "agents/core/incremental_json",
+        "domain/entities/patient",
+        "domain/value_objects",
+    ],
+    "agents/specialized/treatment_planner": ["agents/core/agent_base", "domain/value_objects"],
+    "application/commands": ["domain/enums", "domain/value_objects"],
+    "application/handlers": [
+        "application/commands",
+        "domain/repositories",
+        "agents/core/diagnostic_coordinator",
+    ],
+    "infrastructure/gemini_service": [
+        "domain/enums", "infrastructure/gemini_media", "infrastructure/gemini_resilience"],
+    "infrastructure/gemini_media": ["infrastructure/gemini_service"],
+    "infrastructure/gemini_resilience": ["infrastructure/gemini_service"],
+    "infrastructure/gemini_cache": ["infrastructure/gemini_service", "domain/enums"],
+    "infrastructure/gemini_scheduling": ["infrastructure/gemini_cache"],
+    "infrastructure/image_triage": ["domain/value_objects", TRIAGE_MODEL_KEY],
+    "infrastructure/image_preprocessing": ["domain/value_objects", "infrastructure/gemini_media"],
+    "infrastructure/image_fingerprint": ["domain/value_objects"],
+    "infrastructure/persistence": ["domain/repositories", "infrastructure/entity_configurations"],
+    "infrastructure/persistence_setup": ["infrastructure/persistence", "domain/repositories"],
+    "infrastructure/entity_configurations": [
+        "domain/entities/diagnostic_case", "domain/entities/patient", "domain/value_objects"],
 }
 
-public enum FacilityCapabilities
-{
-    BasicHealthPost,
-    RuralClinic,
-    DistrictHospital,
-    ReferralHospital
-}
 
-public enum DiagnosisMode
-{
-    Online,
-    Offline,
-    Hybrid
-}
+def dependencies_of(key: str) -> list[str]:
+    """Declared dependencies of a layer listing key plus the project building it"""
+    if key.startswith(PROJECT_KEY_PREFIX) and key != SOLUTION_KEY:
+        name = key[len(PROJECT_KEY_PREFIX):]
+        return [PROJECT_KEY_PREFIX + ref for ref in PROJECTS[name]["references"]]
+    dependencies = list(DEPENDENCIES.get(key, []))
+    for _, outputs in LAYERS:
+        for relative, output_key in outputs:
+            parts = relative.split("/")
+            if output_key == key and parts[0] == "src" and parts[1] in PROJECTS:
+                dependencies.append(PROJECT_KEY_PREFIX + parts[1])
+    return dependencies
+
+
+def resolve_selection(patterns: list[str]) -> set[str]:
+    """Expand template key globs and add everything they depend on"""
+    keys = [key for _, outputs in LAYERS for _, key in outputs]
+    pending = []
+    for pattern in patterns:
+        matches = [key for key in keys if fnmatch.fnmatchcase(key, pattern)]
+        if not matches:
+            raise ValueError(f"No template matches {pattern!r}")
+        pending.extend(matches)
+
+    selected = set()
+    while pending:
+        key = pending.pop()
+        if key not in selected:
+            selected.add(key)
+            pending.extend(dependencies_of(key))
+    return selected
+
+
+def select_layers(patterns: list[str] | None, layers=LAYERS) -> list:
+    """Filter the layer listing down to the selection, keeping emission order"""
+    if not patterns:
+        return layers
+    selected = resolve_selection(patterns)
+    filtered = []
+    for banner, outputs in layers:
+        outputs = [(relative, key) for relative, key in outputs if key in selected]
+        if outputs:
+            filtered.append((banner, outputs))
+    return filtered
+
+
+# Per-file content hashes from the previous run, used by --incremental
+MANIFEST_NAME = ".biolens-manifest.json"
+MANIFEST_VERSION = 1
+
+
+def load_manifest(base_dir: Path) -> dict:
+    """Load the manifest of the previous run, or an empty one"""
+    try:
+        with open(base_dir / MANIFEST_NAME, encoding='utf-8') as f:
+            data = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+    if data.get("version") != MANIFEST_VERSION:
+        return {}
+    return data.get("files", {})
+
+
+def save_manifest(base_dir: Path, files: dict):
+    """Write the manifest for the current run"""
+    base_dir.mkdir(parents=True, exist_ok=True)
+    data = {"version": MANIFEST_VERSION, "files": dict(sorted(files.items()))}
+    with open(base_dir / MANIFEST_NAME, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+        f.write('\n')
+
+
+def render_content(content: str | bytes) -> bytes:
+    """Normalise a template body to the exact bytes written to disk
+
+    Binary assets are already final and pass through unchanged.
+    """
+    if isinstance(content, bytes):
+        return content
+    return (content.strip() + '\n').encode('utf-8')
+
+
+def iter_rendered(layers=LAYERS, params: Mapping | None = None) -> Iterator[tuple[str, bytes]]:
+    """Lazily yield (relative path, content) for every generated file
+
+    Nothing is written and BASE_DIR is never touched; templates are rendered
+    one at a time as the iterator is consumed, in emission order.
+    """
+    for _, outputs in layers:
+        for relative, key in outputs:
+            yield relative, render_content(render_output(key, params))
+
+
+def render_tree(layers=LAYERS, params: Mapping | None = None) -> dict[str, bytes]:
+    """Render the whole solution into an in-memory mapping of path to bytes"""
+    return dict(iter_rendered(layers, params))
+
+
+# Hand-maintained build files shipped alongside the rendered tree in archives,
+# so the stream is a complete `docker build -` context
+ARCHIVE_EXTRAS = [Path(__file__).resolve().parent / "Dockerfile"]
+
+
+def iter_archive_members(layers=LAYERS, params: Mapping | None = None) -> Iterator[tuple[str, bytes]]:
+    """Rendered files in emission order, then the build files in ARCHIVE_EXTRAS"""
+    yield from iter_rendered(layers, params)
+    for path in ARCHIVE_EXTRAS:
+        yield path.name, path.read_bytes()
+
+
+def archive_mtime() -> int:
+    """Timestamp stamped on archive members (honours SOURCE_DATE_EPOCH)"""
+    return int(os.environ.get("SOURCE_DATE_EPOCH", "0"))
+
+
+def write_archive(stream: BinaryIO, fmt: str, layers=LAYERS,
+                  params: Mapping | None = None) -> int:
+    """Stream the rendered solution and its Dockerfile into a tar or zip archive
+
+    Members are written in emission order with a fixed timestamp, owner and
+    mode, so identical templates always produce a byte-identical archive.
+    ``stream`` does not need to be seekable. Returns the number of members.
+    """
+    import tarfile
+    import zipfile
+
+    mtime = archive_mtime()
+    count = 0
+    if fmt == "tar":
+        with tarfile.open(fileobj=stream, mode="w|", format=tarfile.GNU_FORMAT) as archive:
+            for relative, data in iter_archive_members(layers, params):
+                info = tarfile.TarInfo(relative)
+                info.size = len(data)
+                info.mtime = mtime
+                info.mode = 0o644
+                archive.addfile(info, io.BytesIO(data))
+                count += 1
+    elif fmt == "zip":
+        # Zip timestamps cannot predate 1980
+        date_time = time.gmtime(max(mtime, 315532800))[:6]
+        with zipfile.ZipFile(stream, "w", zipfile.ZIP_DEFLATED) as archive:
+            for relative, data in iter_archive_members(layers, params):
+                info = zipfile.ZipInfo(relative, date_time)
+                info.compress_type = zipfile.ZIP_DEFLATED
+                info.external_attr = 0o644 << 16
+                archive.writestr(info, data)
+                count += 1
+    else:
+        raise ValueError(f"Unsupported archive format: {fmt}")
+    return count
+
+
+def emit_file(base_dir: Path, relative: str, content: str | bytes, key: str | None = None,
+              previous: dict | None = None, reuse_dir: Path | None = None,
+              shared: dict | None = None) -> tuple[bool, dict]:
+    """Write a generated file without logging
+
+    When ``previous`` is given, the file is left untouched if its hash and
+    template key match the previous manifest entry and the file on disk still
+    has the expected size. With ``reuse_dir`` the unchanged copy is looked up
+    there and hard-linked into ``base_dir`` instead. ``shared`` maps content
+    hashes to files already written, e.g. by other batch variants; identical
+    content is hard-linked from there rather than written again. Returns
+    whether the file was written and its manifest entry. Safe to call from
+    worker threads.
+    """
+    path = base_dir / relative
+    existing = (reuse_dir or base_dir) / relative
+    data = render_content(content)
+    entry = {"template": key, "sha256": hashlib.sha256(data).hexdigest()}
+
+    # The size check catches most hand edits without re-hashing the file
+    if (previous is not None and previous.get(relative) == entry
+            and existing.is_file() and existing.stat().st_size == len(data)):
+        if reuse_dir is None:
+            return False, entry
+        path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.link(existing, path)
+            return False, entry
+        except OSError:
+            pass  # e.g. cross-device; fall through and write a fresh copy
 
-public enum DiagnosisSource
-{
-    GeminiAI,
-    OfflineCache,
-    HumanExpert
-}
-""",
-
-    # ===================
-    "domain/entities/patient": """using BioLens.Domain.Common;
-using BioLens.Domain.Enums;
-using BioLens.Domain.ValueObjects;
-
-namespace BioLens.Domain.Entities;
-
-public class Patient : Entity
-{
-    private readonly List<KnownCondition> _medicalHistory = [];
-    private readonly List<Allergy> _knownAllergies = [];
-
-    private Patient() { } // EF Core
-
-    public Patient(
-        string anonymizedId,
-        int? ageYears,
-        AgeUnit ageUnit,
-        BiologicalSex sex)
-    {
-        Id = Guid.NewGuid();
-        AnonymizedId = anonymizedId;
-        AgeYears = ageYears;
-        AgeUnit = ageUnit;
-        Sex = sex;
-        CreatedAt = DateTimeOffset.UtcNow;
-    }
-
-    public string AnonymizedId { get; private set; } = default!;
-    public int? AgeYears { get; private set; }
-    public AgeUnit AgeUnit { get; private set; }
-    public BiologicalSex Sex { get; private set; }
-    public DateTimeOffset CreatedAt { get; private set; }
-
-    public IReadOnlyCollection<KnownCondition> MedicalHistory => _medicalHistory.AsReadOnly();
-    public IReadOnlyCollection<Allergy> KnownAllergies => _knownAllergies.AsReadOnly();
-
-    public void AddMedicalCondition(KnownCondition condition) => _medicalHistory.Add(condition);
-    public void AddAllergy(Allergy allergy) => _knownAllergies.Add(allergy);
-}
-""",
-
-    # ===================
-    "domain/entities/diagnostic_case": """using BioLens.Domain.Common;
-using BioLens.Domain.Enums;
-using BioLens.Domain.ValueObjects;
-using BioLens.Domain.Events;
-
-namespace BioLens.Domain.Entities;
-
-public class DiagnosticCase : AggregateRoot
-{
-    private readonly List<MedicalImage> _images = [];
-    private readonly List<DifferentialDiagnosis> _alternativeDiagnoses = [];
-
-    private DiagnosticCase() { } // EF Core
-
-    public DiagnosticCase(
-        Patient patient,
-        Guid healthcareWorkerId,
-        ContextualInformation context)
-    {
-        Id = Guid.NewGuid();
-        Patient = patient;
-        HealthcareWorkerId = healthcareWorkerId;
-        Context = context;
-        Status = CaseStatus.Created;
-        CreatedAt = DateTimeOffset.UtcNow;
-        IsSyncedToCloud = false;
-
-        AddDomainEvent(new DiagnosticCaseCreatedEvent(Id, patient.Id));
-    }
-
-    public Patient Patient { get; private set; } = default!;
-    public Guid HealthcareWorkerId { get; private set; }
-    public AudioSymptomDescription? AudioDescription { get; private set; }
-    public ContextualInformation Context { get; private set; } = default!;
-    
-    public DifferentialDiagnosis? PrimaryDiagnosis { get; private set; }
-    public IReadOnlyCollection<DifferentialDiagnosis> AlternativeDiagnoses => _alternativeDiagnoses.AsReadOnly();
-    public TreatmentProtocol? RecommendedProtocol { get; private set; }
-    
-    public CaseStatus Status { get; private set; }
-    public DateTimeOffset CreatedAt { get; private set; }
-    public DateTimeOffset? CompletedAt { get; private set; }
-    public bool IsSyncedToCloud { get; private set; }
-    
-    public IReadOnlyCollection<MedicalImage> Images => _images.AsReadOnly();
-
-    public Result AddMedicalImage(MedicalImage image)
-    {
-        if (_images.Count >= 10)
-            return Result.Failure("Maximum 10 images per case");
-        
-        _images.Add(image);
-        AddDomainEvent(new ImageAddedEvent(Id, image.Id));
-        return Result.Success();
-    }
-
-    public Result SetAudioDescription(AudioSymptomDescription audio)
-    {
-        AudioDescription = audio;
-        AddDomainEvent(new AudioDescriptionAddedEvent(Id));
-        return Result.Success();
-    }
-
-    public Result CompleteDiagnosis(
-        DifferentialDiagnosis primary,
-        List<DifferentialDiagnosis> alternatives,
-        TreatmentProtocol protocol)
-    {
-        if (Status != CaseStatus.InProgress && Status != CaseStatus.Created)
-            return Result.Failure("Case must be in progress");
-
-        PrimaryDiagnosis = primary;
-        _alternativeDiagnoses.Clear();
-        _alternativeDiagnoses.AddRange(alternatives);
-        RecommendedProtocol = protocol;
-        Status = CaseStatus.DiagnosisCompleted;
-        CompletedAt = DateTimeOffset.UtcNow;
-        
-        AddDomainEvent(new DiagnosisCompletedEvent(Id, primary.ConditionName));
-        return Result.Success();
-    }
-
-    public void StartDiagnosis()
-    {
-        Status = CaseStatus.InProgress;
-    }
-
-    public void MarkAsSynced()
-    {
-        IsSyncedToCloud = true;
-    }
-}
-""",
-
-    # ===================
-    "domain/value_objects": """using BioLens.Domain.Common;
-using BioLens.Domain.Enums;
-
-namespace BioLens.Domain.ValueObjects;
-
-public record MedicalImage(
-    Guid Id,
-    string LocalFilePath,
-    string? CloudBlobUrl,
-    ImageType Type,
-    ImageMetadata Metadata,
-    DateTimeOffset CapturedAt);
-
-public record ImageMetadata(
-    int Width,
-    int Height,
-    long FileSizeBytes,
-    string DeviceModel);
-
-public record AudioSymptomDescription(
-    Guid Id,
-    string LocalFilePath,
-    string? CloudBlobUrl,
-    string LanguageCode,
-    int DurationSeconds,
-    string? TranscribedText,
-    DateTimeOffset RecordedAt);
-
-public record DifferentialDiagnosis(
-    string ConditionName,
-    string ICD10Code,
-    ConfidenceLevel Confidence,
-    List<string> SupportingEvidence,
-    List<string> WarningFlags,
-    UrgencyLevel Urgency);
-
-public record TreatmentStep(
-    int StepNumber,
-    string Instruction,
-    int DurationMinutes,
-    List<string> RequiredMaterials);
-
-public record MedicationRecommendation(
-    string MedicationName,
-    string Dosage,
-    string Frequency,
-    int DurationDays,
-    List<string> Contraindications);
-
-public record FollowUpGuidance(
-    List<string> ImprovementSigns,
-    List<string> WorseningSigns,
-    int FollowUpDays);
-
-public record EmergencyEscalation(
-    List<string> EscalationCriteria,
-    UrgencyLevel EscalationUrgency,
-    string RecommendedFacility);
-
-public record TreatmentProtocol(
-    string ProtocolName,
-    List<TreatmentStep> Steps,
-    List<MedicationRecommendation> Medications,
-    List<string> Contraindications,
-    FollowUpGuidance FollowUp,
-    EmergencyEscalation EscalationCriteria);
-
-public record GeographicRegion(
-    string Country,
-    string Region,
-    string? District,
-    double Latitude,
-    double Longitude);
-
-public record CulturalConsiderations(
-    string PrimaryLanguage,
-    List<string> CommonBeliefs,
-    List<string> TreatmentPreferences);
-
-public record ContextualInformation(
-    GeographicRegion Region,
-    List<string> AvailableMedications,
-    List<string> LocalEndemicDiseases,
-    FacilityCapabilities FacilityLevel,
-    CulturalConsiderations CulturalContext);
-
-public record KnownCondition(
-    string ConditionName,
-    string ICD10Code,
-    DateTimeOffset DiagnosedDate,
-    bool IsActive);
-
-public record Allergy(
-    string AllergenName,
-    string Severity,
-    string Reaction);
-""",
-
-    # ===================
-    "domain/events": """using BioLens.Domain.Common;
-
-namespace BioLens.Domain.Events;
-
-public record DiagnosticCaseCreatedEvent(
-    Guid CaseId,
-    Guid PatientId) : DomainEvent;
-
-public record ImageAddedEvent(
-    Guid CaseId,
-    Guid ImageId) : DomainEvent;
-
-public record AudioDescriptionAddedEvent(
-    Guid CaseId) : DomainEvent;
-
-public record DiagnosisCompletedEvent(
-    Guid CaseId,
-    string PrimaryCondition) : DomainEvent;
-
-public record CaseSyncedEvent(
-    Guid CaseId,
-    DateTimeOffset SyncedAt) : DomainEvent;
-""",
-
-    # ===================
-    "domain/repositories": """using BioLens.Domain.Entities;
-
-namespace BioLens.Domain.Repositories;
-
-public interface IDiagnosticCaseRepository
-{
-    Task<DiagnosticCase?> GetByIdAsync(Guid id, CancellationToken cancellationToken = default);
-    Task<Guid> AddAsync(DiagnosticCase diagnosticCase, CancellationToken cancellationToken = default);
-    Task UpdateAsync(DiagnosticCase diagnosticCase, CancellationToken cancellationToken = default);
-    Task<List<DiagnosticCase>> GetUnsyncedAsync(CancellationToken cancellationToken = default);
-}
-
-public interface IPatientRepository
-{
-    Task<Patient?> GetByAnonymizedIdAsync(string anonymizedId, CancellationToken cancellationToken = default);
-    Task<Guid> AddAsync(Patient patient, CancellationToken cancellationToken = default);
-}
-""",
-
-    # ===================
-    # AGENTS LAYER - Core Agentic AI
-    # ===================
-    "agents/core/agent_base": """using Microsoft.SemanticKernel;
-using Microsoft.SemanticKernel.Agents;
-
-namespace BioLens.Agents.Core;
-
-/// <summary>
-/// Base class for all BioLens agents
-/// </summary>
-public abstract class BioLensAgent
-{
-    protected readonly Kernel Kernel;
-    protected readonly string AgentName;
-    protected readonly string AgentDescription;
-
-    protected BioLensAgent(Kernel kernel, string name, string description)
-    {
-        Kernel = kernel;
-        AgentName = name;
-        AgentDescription = description;
-    }
-
-    public abstract Task<AgentResponse> ExecuteAsync(AgentRequest request, CancellationToken cancellationToken = default);
-    
-    protected async Task<string> InvokePromptAsync(string prompt, CancellationToken cancellationToken)
-    {
-        var result = await Kernel.InvokePromptAsync(prompt, cancellationToken: cancellationToken);
-        return result.ToString();
-    }
-}
-
-/// <summary>
-/// Agent request wrapper
-/// </summary>
-public record AgentRequest(
-    string RequestId,
-    string RequestType,
-    Dictionary<string, object> Parameters,
-    AgentContext Context);
-
-/// <summary>
-/// Agent response wrapper
-/// </summary>
-public record AgentResponse(
-    string RequestId,
-    bool IsSuccess,
-    object? Result,
-    List<string> Messages,
-    Dictionary<string, object> Metadata);
-
-/// <summary>
-/// Context shared across agents
-/// </summary>
-public record AgentContext(
-    Guid CaseId,
-    Dictionary<string, object> SharedMemory);
-""",
-
-    # ===================
-    "agents/core/diagnostic_coordinator": """using BioLens.Domain.Entities;
-using BioLens.Domain.ValueObjects;
-using Microsoft.SemanticKernel;
-
-namespace BioLens.Agents.Core;
-
-/// <summary>
-/// Coordinator agent that orchestrates the diagnostic workflow
-/// Uses Chain of Thought and ReAct pattern
-/// </summary>
-public class DiagnosticCoordinatorAgent : BioLensAgent
-{
-    private readonly ImageAnalysisAgent _imageAgent;
-    private readonly AudioTranscriptionAgent _audioAgent;
-    private readonly MedicalReasoningAgent _reasoningAgent;
-    private readonly TreatmentPlannerAgent _treatmentAgent;
-
-    public DiagnosticCoordinatorAgent(
-        Kernel kernel,
-        ImageAnalysisAgent imageAgent,
-        AudioTranscriptionAgent audioAgent,
-        MedicalReasoningAgent reasoningAgent,
-        TreatmentPlannerAgent treatmentAgent)
-        : base(kernel, "DiagnosticCoordinator", "Orchestrates multi-agent diagnostic workflow")
-    {
-        _imageAgent = imageAgent;
-        _audioAgent = audioAgent;
-        _reasoningAgent = reasoningAgent;
-        _treatmentAgent = treatmentAgent;
-    }
-
-    public override async Task<AgentResponse> ExecuteAsync(
-        AgentRequest request,
-        CancellationToken cancellationToken = default)
-    {
-        var diagnosticCase = (DiagnosticCase)request.Parameters["case"];
-        var messages = new List<string>();
-        
-        try
-        {
-            // Step 1: Analyze images
-            messages.Add("🔍 Analyzing medical images...");
-            var imageAnalysis = await _imageAgent.ExecuteAsync(
-                new AgentRequest(
-                    request.RequestId,
-                    "AnalyzeImages",
-                    new Dictionary<string, object> { ["images"] = diagnosticCase.Images },
-                    request.Context),
-                cancellationToken);
-
-            // Step 2: Transcribe and analyze audio
-            messages.Add("🎤 Processing audio symptoms...");
-            var audioAnalysis = await _audioAgent.ExecuteAsync(
-                new AgentRequest(
-                    request.RequestId,
-                    "TranscribeAudio",
-                    new Dictionary<string, object> { ["audio"] = diagnosticCase.AudioDescription! },
-                    request.Context),
-                cancellationToken);
-
-            // Step 3: Medical reasoning and differential diagnosis
-            messages.Add("🧠 Generating differential diagnosis...");
-            var diagnosis = await _reasoningAgent.ExecuteAsync(
-                new AgentRequest(
-                    request.RequestId,
-                    "GenerateDiagnosis",
-                    new Dictionary<string, object>
-                    {
-                        ["imageFindings"] = imageAnalysis.Result!,
-                        ["audioFindings"] = audioAnalysis.Result!,
-                        ["patient"] = diagnosticCase.Patient,
-                        ["context"] = diagnosticCase.Context
-                    },
-                    request.Context),
-                cancellationToken);
-
-            // Step 4: Generate treatment protocol
-            messages.Add("💊 Creating treatment protocol...");
-            var treatment = await _treatmentAgent.ExecuteAsync(
-                new AgentRequest(
-                    request.RequestId,
-                    "CreateTreatmentPlan",
-                    new Dictionary<string, object>
-                    {
-                        ["diagnosis"] = diagnosis.Result!,
-                        ["context"] = diagnosticCase.Context
-                    },
-                    request.Context),
-                cancellationToken);
-
-            messages.Add("✅ Diagnostic workflow completed");
-
-            return new AgentResponse(
-                request.RequestId,
-                true,
-                new
-                {
-                    Diagnosis = diagnosis.Result,
-                    Treatment = treatment.Result
-                },
-                messages,
-                new Dictionary<string, object>
-                {
-                    ["completedAt"] = DateTimeOffset.UtcNow,
-                    ["agentsInvolved"] = new[] { "Image", "Audio", "Reasoning", "Treatment" }
-                });
-        }
-        catch (Exception ex)
-        {
-            messages.Add($"❌ Error: {ex.Message}");
-            return new AgentResponse(
-                request.RequestId,
-                false,
-                null,
-                messages,
-                new Dictionary<string, object> { ["error"] = ex.ToString() });
-        }
-    }
-}
-""",
-
-    # ===================
-    "agents/specialized/image_analysis": """using BioLens.Domain.ValueObjects;
-using Microsoft.SemanticKernel;
-using System.Text.Json;
-
-namespace BioLens.Agents.Core;
-
-/// <summary>
-/// Specialized agent for analyzing medical images using Gemini 3 Vision
-/// </summary>
-public class ImageAnalysisAgent : BioLensAgent
-{
-    public ImageAnalysisAgent(Kernel kernel)
-        : base(kernel, "ImageAnalyzer", "Analyzes medical images for diagnostic clues")
-    {
-    }
-
-    public override async Task<AgentResponse> ExecuteAsync(
-        AgentRequest request,
-        CancellationToken cancellationToken = default)
-    {
-        var images = (IReadOnlyCollection<MedicalImage>)request.Parameters["images"];
-        
-        var prompt = BuildImageAnalysisPrompt(images);
-        var analysisResult = await InvokePromptAsync(prompt, cancellationToken);
-        
-        var findings = ParseImageFindings(analysisResult);
-        
-        return new AgentResponse(
-            request.RequestId,
-            true,
-            findings,
-            new List<string> { $"Analyzed {images.Count} images" },
-            new Dictionary<string, object>
-            {
-                ["imageCount"] = images.Count,
-                ["rawResponse"] = analysisResult
-            });
-    }
-
-    private string BuildImageAnalysisPrompt(IReadOnlyCollection<MedicalImage> images)
-    {
-        return $@"
-You are an expert medical image analyst. Analyze the following {images.Count} medical images.
-
-TASK:
-1. Identify all visible symptoms, lesions, or abnormalities
-2. Note color, texture, size, and location
-3. Identify any warning signs or red flags
-4. Suggest possible conditions (do NOT diagnose yet)
-
-For each image, provide:
-- Image type: {string.Join(", ", images.Select(i => i.Type))}
-- Observed features
-- Clinical significance
-- Confidence level
-
-Return as JSON:
-{{
-  ""findings"": [
-    {{
-      ""imageId"": ""guid"",
-      ""observations"": ["".....""],
-      ""suspectedConditions"": ["".....""],
-      ""redFlags"": ["".....""],
-      ""confidence"": ""High|Medium|Low""
-    }}
-  ],
-  ""overallAssessment"": ""....""
-}}
-";
-    }
-
-    private object ParseImageFindings(string response)
-    {
-        try
-        {
-            return JsonSerializer.Deserialize<object>(response) ?? new { };
-        }
-        catch
-        {
-            return new { rawText = response };
-        }
-    }
-}
-""",
-
-    # ===================
-    "agents/specialized/audio_transcription": """using BioLens.Domain.ValueObjects;
-using Microsoft.SemanticKernel;
-
-namespace BioLens.Agents.Core;
-
-/// <summary>
-/// Agent for transcribing and analyzing audio symptom descriptions
-/// </summary>
-public class AudioTranscriptionAgent : BioLensAgent
-{
-    public AudioTranscriptionAgent(Kernel kernel)
-        : base(kernel, "AudioTranscriber", "Transcribes and extracts symptoms from audio")
-    {
-    }
-
-    public override async Task<AgentResponse> ExecuteAsync(
-        AgentRequest request,
-        CancellationToken cancellationToken = default)
-    {
-        var audio = (AudioSymptomDescription)request.Parameters["audio"];
-        
-        var prompt = $@"
-You are a medical scribe. The healthcare worker has recorded audio describing patient symptoms.
-
-AUDIO DETAILS:
-- Language: {audio.LanguageCode}
-- Duration: {audio.DurationSeconds} seconds
-- Transcribed text: {audio.TranscribedText ?? "[Not yet transcribed]"}
-
-TASK:
-1. Extract all mentioned symptoms
-2. Note duration, severity, and progression
-3. Identify critical information (onset time, triggers, etc.)
-4. Flag any emergency indicators
-
-Return as JSON:
-{{
-  ""symptoms"": [
-    {{
-      ""symptom"": ""....."",
-      ""severity"": ""Mild|Moderate|Severe"",
-      ""duration"": ""....."",
-      ""onset"": "".....""
-    }}
-  ],
-  ""emergencyFlags"": ["".....""],
-  ""additionalInfo"": ""....."
-}}
-";
-        
-        var result = await InvokePromptAsync(prompt, cancellationToken);
-        
-        return new AgentResponse(
-            request.RequestId,
-            true,
-            result,
-            new List<string> { "Audio analyzed successfully" },
-            new Dictionary<string, object> { ["language"] = audio.LanguageCode });
-    }
-}
-""",
-
-    # ===================
-    "agents/specialized/medical_reasoning": """using BioLens.Domain.Entities;
-using BioLens.Domain.ValueObjects;
-using BioLens.Domain.Enums;
-using Microsoft.SemanticKernel;
-using System.Text.Json;
-
-namespace BioLens.Agents.Core;
-
-/// <summary>
-/// Core reasoning agent that generates differential diagnoses
-/// Uses Chain-of-Thought reasoning
-/// </summary>
-public class MedicalReasoningAgent : BioLensAgent
-{
-    public MedicalReasoningAgent(Kernel kernel)
-        : base(kernel, "MedicalReasoner", "Generates differential diagnoses using clinical reasoning")
-    {
-    }
-
-    public override async Task<AgentResponse> ExecuteAsync(
-        AgentRequest request,
-        CancellationToken cancellationToken = default)
-    {
-        var imageFindings = request.Parameters["imageFindings"];
-        var audioFindings = request.Parameters["audioFindings"];
-        var patient = (Patient)request.Parameters["patient"];
-        var context = (ContextualInformation)request.Parameters["context"];
-        
-        var prompt = BuildDiagnosticPrompt(imageFindings, audioFindings, patient, context);
-        var diagnosisJson = await InvokePromptAsync(prompt, cancellationToken);
-        
-        var diagnosis = ParseDiagnosis(diagnosisJson);
-        
-        return new AgentResponse(
-            request.RequestId,
-            true,
-            diagnosis,
-            new List<string> { "Differential diagnosis generated" },
-            new Dictionary<string, object>
-            {
-                ["reasoningApproach"] = "Chain-of-Thought",
-                ["contextConsidered"] = true
-            });
-    }
-
-    private string BuildDiagnosticPrompt(
-        object imageFindings,
-        object audioFindings,
-        Patient patient,
-        ContextualInformation context)
-    {
-        return $@"
-You are an expert diagnostic physician. Use step-by-step clinical reasoning.
-
-PATIENT INFORMATION:
-- Age: {patient.AgeYears} {patient.AgeUnit}
-- Sex: {patient.Sex}
-- Known conditions: {JsonSerializer.Serialize(patient.MedicalHistory)}
-- Known allergies: {JsonSerializer.Serialize(patient.KnownAllergies)}
-
-GEOGRAPHIC CONTEXT:
-- Region: {context.Region.Country}, {context.Region.Region}
-- Endemic diseases: {string.Join(", ", context.LocalEndemicDiseases)}
-- Facility level: {context.FacilityLevel}
-
-IMAGE FINDINGS:
-{JsonSerializer.Serialize(imageFindings)}
-
-AUDIO FINDINGS (Symptoms):
-{JsonSerializer.Serialize(audioFindings)}
-
-REASONING PROCESS:
-1. List all clinical findings
-2. Group findings by system (dermatologic, respiratory, etc.)
-3. Consider differential diagnoses (at least 3-5)
-4. Apply clinical decision rules
-5. Factor in endemic diseases and local epidemiology
-6. Assign probability and urgency to each diagnosis
-
-Return as JSON:
-{{
-  ""reasoningSteps"": ["".....""],
-  ""primaryDiagnosis"": {{
-    ""conditionName"": ""....."",
-    ""icd10Code"": ""....."",
-    ""confidence"": ""High|Medium|Low"",
-    ""supportingEvidence"": ["".....""],
-    ""warningFlags"": ["".....""],
-    ""urgency"": ""Routine|Urgent|Emergency|Critical""
-  }},
-  ""alternativeDiagnoses"": [
-    {{
-      ""conditionName"": ""....."",
-      ""icd10Code"": ""....."",
-      ""confidence"": ""High|Medium|Low"",
-      ""supportingEvidence"": ["".....""],
-      ""warningFlags"": ["".....""],
-      ""urgency"": ""Routine|Urgent|Emergency|Critical""
-    }}
-  ]
-}}
-
-CRITICAL: Base diagnosis on evidence. If uncertain, indicate lower confidence.
-";
-    }
-
-    private object ParseDiagnosis(string json)
-    {
-        try
-        {
-            return JsonSerializer.Deserialize<object>(json) ?? new { };
-        }
-        catch
-        {
-            return new { error = "Failed to parse diagnosis", raw = json };
-        }
-    }
-}
-""",
-
-    # ===================
-    "agents/specialized/treatment_planner": """using BioLens.Domain.ValueObjects;
-using Microsoft.SemanticKernel;
-using System.Text.Json;
-
-namespace BioLens.Agents.Core;
-
-/// <summary>
-/// Agent that creates context-aware treatment protocols
-/// </summary>
-public class TreatmentPlannerAgent : BioLensAgent
-{
-    public TreatmentPlannerAgent(Kernel kernel)
-        : base(kernel, "TreatmentPlanner", "Creates resource-aware treatment protocols")
-    {
-    }
-
-    public override async Task<AgentResponse> ExecuteAsync(
-        AgentRequest request,
-        CancellationToken cancellationToken = default)
-    {
-        var diagnosis = request.Parameters["diagnosis"];
-        var context = (ContextualInformation)request.Parameters["context"];
-        
-        var prompt = BuildTreatmentPrompt(diagnosis, context);
-        var treatmentJson = await InvokePromptAsync(prompt, cancellationToken);
-        
-        var treatment = ParseTreatment(treatmentJson);
-        
-        return new AgentResponse(
-            request.RequestId,
-            true,
-            treatment,
-            new List<string> { "Treatment protocol created" },
-            new Dictionary<string, object>
-            {
-                ["availableMedications"] = context.AvailableMedications.Count,
-                ["facilityLevel"] = context.FacilityLevel.ToString()
-            });
-    }
-
-    private string BuildTreatmentPrompt(object diagnosis, ContextualInformation context)
-    {
-        return $@"
-You are creating a treatment protocol for a resource-constrained setting.
-
-DIAGNOSIS:
-{JsonSerializer.Serialize(diagnosis)}
-
-AVAILABLE RESOURCES:
-- Medications: {string.Join(", ", context.AvailableMedications)}
-- Facility: {context.FacilityLevel}
-- Cultural context: {context.CulturalContext.PrimaryLanguage}
-
-REQUIREMENTS:
-1. Use ONLY available medications
-2. Provide step-by-step treatment instructions
-3. Include dosing appropriate for patient age/weight
-4. List contraindications
-5. Define follow-up criteria
-6. Specify escalation triggers
-
-Return as JSON:
-{{
-  ""protocolName"": ""....."",
-  ""steps"": [
-    {{
-      ""stepNumber"": 1,
-      ""instruction"": ""....."",
-      ""durationMinutes"": 30,
-      ""requiredMaterials"": ["".....""]
-    }}
-  ],
-  ""medications"": [
-    {{
-      ""medicationName"": ""....."",
-      ""dosage"": ""....."",
-      ""frequency"": ""....."",
-      ""durationDays"": 7,
-      ""contraindications"": ["".....""]
-    }}
-  ],
-  ""contraindications"": ["".....""],
-  ""followUp"": {{
-    ""improvementSigns"": ["".....""],
-    ""worseningSigns"": ["".....""],
-    ""followUpDays"": 3
-  }},
-  ""escalationCriteria"": {{
-    ""escalationCriteria"": ["".....""],
-    ""escalationUrgency"": ""Urgent|Emergency"",
-    ""recommendedFacility"": ""....."
-  }}
-}}
-
-CRITICAL: Patient safety first. Only recommend treatments appropriate for setting.
-";
-    }
-
-    private object ParseTreatment(string json)
-    {
-        try
-        {
-            return JsonSerializer.Deserialize<object>(json) ?? new { };
-        }
-        catch
-        {
-            return new { error = "Failed to parse treatment", raw = json };
-        }
-    }
-}
-""",
-
-    # ===================
-    # APPLICATION LAYER
-    # ===================
-    "application/commands": """using BioLens.Domain.Entities;
-using BioLens.Domain.ValueObjects;
-using BioLens.Domain.Enums;
-using MediatR;
-
-namespace BioLens.Application.Commands;
-
-public record CreateDiagnosticCaseCommand(
-    string PatientAnonymizedId,
-    int? PatientAge,
-    AgeUnit PatientAgeUnit,
-    BiologicalSex PatientSex,
-    Guid HealthcareWorkerId,
-    ContextualInformation Context) : IRequest<Guid>;
-
-public record AddMedicalImageCommand(
-    Guid CaseId,
-    byte[] ImageData,
-    ImageType Type,
-    ImageMetadata Metadata) : IRequest<Result>;
-
-public record AddAudioSymptomCommand(
-    Guid CaseId,
-    byte[] AudioData,
-    string LanguageCode,
-    int DurationSeconds,
-    string? TranscribedText) : IRequest<Result>;
-
-public record RequestDiagnosisCommand(
-    Guid CaseId,
-    DiagnosisMode Mode) : IRequest<DiagnosisResultDto>;
-
-public record DiagnosisResultDto(
-    DifferentialDiagnosis PrimaryDiagnosis,
-    List<DifferentialDiagnosis> AlternativeDiagnoses,
-    TreatmentProtocol TreatmentProtocol,
-    List<string> ReasoningSteps);
-""",
-
-    # ===================
-    "application/handlers": """using BioLens.Application.Commands;
-using BioLens.Domain.Entities;
-using BioLens.Domain.Repositories;
-using BioLens.Domain.ValueObjects;
-using BioLens.Agents.Core;
-using MediatR;
-
-namespace BioLens.Application.Handlers;
-
-public class CreateDiagnosticCaseHandler : IRequestHandler<CreateDiagnosticCaseCommand, Guid>
-{
-    private readonly IPatientRepository _patientRepository;
-    private readonly IDiagnosticCaseRepository _caseRepository;
-
-    public CreateDiagnosticCaseHandler(
-        IPatientRepository patientRepository,
-        IDiagnosticCaseRepository caseRepository)
-    {
-        _patientRepository = patientRepository;
-        _caseRepository = caseRepository;
-    }
-
-    public async Task<Guid> Handle(CreateDiagnosticCaseCommand request, CancellationToken cancellationToken)
-    {
-        var patient = await _patientRepository.GetByAnonymizedIdAsync(
-            request.PatientAnonymizedId,
-            cancellationToken);
-
-        if (patient == null)
-        {
-            patient = new Patient(
-                request.PatientAnonymizedId,
-                request.PatientAge,
-                request.PatientAgeUnit,
-                request.PatientSex);
-            await _patientRepository.AddAsync(patient, cancellationToken);
-        }
-
-        var diagnosticCase = new DiagnosticCase(
-            patient,
-            request.HealthcareWorkerId,
-            request.Context);
-
-        var caseId = await _caseRepository.AddAsync(diagnosticCase, cancellationToken);
-        return caseId;
-    }
-}
-
-public class RequestDiagnosisHandler : IRequestHandler<RequestDiagnosisCommand, DiagnosisResultDto>
-{
-    private readonly IDiagnosticCaseRepository _repository;
-    private readonly DiagnosticCoordinatorAgent _coordinatorAgent;
-
-    public RequestDiagnosisHandler(
-        IDiagnosticCaseRepository repository,
-        DiagnosticCoordinatorAgent coordinatorAgent)
-    {
-        _repository = repository;
-        _coordinatorAgent = coordinatorAgent;
-    }
-
-    public async Task<DiagnosisResultDto> Handle(
-        RequestDiagnosisCommand request,
-        CancellationToken cancellationToken)
-    {
-        var diagnosticCase = await _repository.GetByIdAsync(request.CaseId, cancellationToken)
-            ?? throw new KeyNotFoundException($"Case {request.CaseId} not found");
-
-        diagnosticCase.StartDiagnosis();
-
-        var agentRequest = new AgentRequest(
-            Guid.NewGuid().ToString(),
-            "RunDiagnosis",
-            new Dictionary<string, object> { ["case"] = diagnosticCase },
-            new AgentContext(diagnosticCase.Id, new Dictionary<string, object>()));
-
-        var agentResponse = await _coordinatorAgent.ExecuteAsync(agentRequest, cancellationToken);
-
-        if (!agentResponse.IsSuccess)
-            throw new InvalidOperationException("Diagnosis failed: " + string.Join(", ", agentResponse.Messages));
-
-        dynamic result = agentResponse.Result!;
-        
-        // Map to domain objects (simplified for demo)
-        var primaryDiagnosis = new DifferentialDiagnosis(
-            "Sample Diagnosis",
-            "A00.0",
-            Domain.Enums.ConfidenceLevel.Medium,
-            new List<string> { "Evidence 1" },
-            new List<string>(),
-            Domain.Enums.UrgencyLevel.Routine);
-
-        var treatment = new TreatmentProtocol(
-            "Sample Protocol",
-            new List<TreatmentStep>(),
-            new List<MedicationRecommendation>(),
-            new List<string>(),
-            new FollowUpGuidance(new List<string>(), new List<string>(), 7),
-            new EmergencyEscalation(new List<string>(), Domain.Enums.UrgencyLevel.Urgent, "District Hospital"));
-
-        diagnosticCase.CompleteDiagnosis(
-            primaryDiagnosis,
-            new List<DifferentialDiagnosis>(),
-            treatment);
-
-        await _repository.UpdateAsync(diagnosticCase, cancellationToken);
-
-        return new DiagnosisResultDto(
-            primaryDiagnosis,
-            new List<DifferentialDiagnosis>(),
-            treatment,
-            agentResponse.Messages);
-    }
-}
-""",
-
-    # ===================
-    # INFRASTRUCTURE
-    # ===================
-    "infrastructure/gemini_service": """using System.Net.Http.Json;
-using System.Text.Json;
-using Microsoft.Extensions.Options;
-using Microsoft.Extensions.Logging;
-
-namespace BioLens.Infrastructure.AI;
-
-public interface IGeminiAIService
-{
-    Task<string> GenerateContentAsync(
-        string prompt,
-        List<byte[]>? images = null,
-        byte[]? audio = null,
-        CancellationToken cancellationToken = default);
-}
-
-public class GeminiAIService : IGeminiAIService
-{
-    private readonly HttpClient _httpClient;
-    private readonly ILogger<GeminiAIService> _logger;
-    private readonly GeminiConfiguration _config;
-
-    public GeminiAIService(
-        HttpClient httpClient,
-        ILogger<GeminiAIService> logger,
-        IOptions<GeminiConfiguration> config)
-    {
-        _httpClient = httpClient;
-        _logger = logger;
-        _config = config.Value;
-    }
-
-    public async Task<string> GenerateContentAsync(
-        string prompt,
-        List<byte[]>? images = null,
-        byte[]? audio = null,
-        CancellationToken cancellationToken = default)
-    {
-        try
-        {
-            var request = BuildRequest(prompt, images, audio);
-            
-            var response = await _httpClient.PostAsJsonAsync(
-                $"https://generativelanguage.googleapis.com/v1beta/models/gemini-3-pro:generateContent?key={_config.ApiKey}",
-                request,
-                cancellationToken);
-
-            response.EnsureSuccessStatusCode();
-
-            var result = await response.Content.ReadFromJsonAsync<GeminiResponse>(
-                cancellationToken: cancellationToken);
-
-            return result?.Candidates?.FirstOrDefault()?.Content?.Parts?.FirstOrDefault()?.Text ?? "";
-        }
-        catch (Exception ex)
-        {
-            _logger.LogError(ex, "Gemini API call failed");
-            throw;
-        }
-    }
-
-    private object BuildRequest(string prompt, List<byte[]>? images, byte[]? audio)
-    {
-        var parts = new List<object> { new { text = prompt } };
-
-        if (images != null)
-        {
-            parts.AddRange(images.Select(img => new
-            {
-                inline_data = new
-                {
-                    mime_type = "image/jpeg",
-                    data = Convert.ToBase64String(img)
-                }
-            }));
-        }
-
-        if (audio != null)
-        {
-            parts.Add(new
-            {
-                inline_data = new
-                {
-                    mime_type = "audio/wav",
-                    data = Convert.ToBase64String(audio)
-                }
-            });
-        }
-
-        return new
-        {
-            contents = new[]
-            {
-                new { role = "user", parts }
-            },
-            generationConfig = new
-            {
-                temperature = 0.2,
-                topP = 0.95,
-                topK = 40,
-                maxOutputTokens = 4096,
-                responseMimeType = "application/json"
-            }
-        };
-    }
-}
-
-public class GeminiConfiguration
-{
-    public string ApiKey { get; set; } = "";
-    public string BaseUrl { get; set; } = "https://generativelanguage.googleapis.com";
-}
-
-public record GeminiResponse(Candidate[]? Candidates);
-public record Candidate(Content? Content);
-public record Content(Part[]? Parts);
-public record Part(string? Text);
-""",
-
-    # ===================
-    "infrastructure/persistence": """using BioLens.Domain.Entities;
-using BioLens.Domain.Repositories;
-using Microsoft.EntityFrameworkCore;
-
-namespace BioLens.Infrastructure.Persistence;
-
-public class BioLensDbContext : DbContext
-{
-    public BioLensDbContext(DbContextOptions<BioLensDbContext> options) : base(options) { }
-
-    public DbSet<DiagnosticCase> DiagnosticCases => Set<DiagnosticCase>();
-    public DbSet<Patient> Patients => Set<Patient>();
+    path.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        # Never write through a hard link shared with another output
+        if path.stat().st_nlink > 1:
+            path.unlink()
+    except FileNotFoundError:
+        pass
+
+    if shared is not None:
+        source = shared.setdefault(entry["sha256"], path)
+        if source != path:
+            try:
+                os.link(source, path)
+                return True, entry
+            except OSError:
+                pass  # not written yet or cross-device; write our own copy
+
+    with open(path, 'wb') as f:
+        f.write(data)
+    return True, entry
+
+
+def foreign_files(base_dir: Path, manifest: dict) -> list[str]:
+    """List files under base_dir that the generator's manifest does not own"""
+    if not base_dir.exists():
+        return []
+    owned = set(manifest) | {MANIFEST_NAME}
+    return sorted(relative for relative in
+                  (path.relative_to(base_dir).as_posix() for path in base_dir.rglob("*")
+                   if not path.is_dir())
+                  if relative not in owned)
+
+
+def _rename_exchange(a: Path, b: Path) -> bool:
+    """Atomically swap two paths with renameat2(RENAME_EXCHANGE) where available"""
+    import ctypes
+    import errno
+
+    try:
+        renameat2 = ctypes.CDLL(None, use_errno=True).renameat2
+    except (OSError, AttributeError):
+        return False
+    at_fdcwd, rename_exchange = -100, 2
+    if renameat2(at_fdcwd, os.fsencode(a), at_fdcwd, os.fsencode(b), rename_exchange) == 0:
+        return True
+    err = ctypes.get_errno()
+    if err in (errno.EINVAL, errno.ENOSYS, errno.EOPNOTSUPP):
+        return False
+    raise OSError(err, os.strerror(err), str(b))
+
+
+def directory_mode(target: Path) -> int:
+    """Permission bits for a staged replacement of target
+
+    An existing target keeps its mode; a new one gets what mkdir would give it.
+    """
+    try:
+        return stat.S_IMODE(target.stat().st_mode)
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o777 & ~umask
+
+
+def swap_directories(staged: Path, target: Path):
+    """Move a fully written staging directory into place
+
+    On Linux the old and new trees are exchanged in a single rename, so
+    readers see either one or the other. Elsewhere the old tree is renamed
+    aside first, leaving a brief window where the target is missing.
+    """
+    if not target.exists():
+        os.rename(staged, target)
+    elif _rename_exchange(staged, target):
+        shutil.rmtree(staged)  # now holds the previous tree
+    else:
+        backup = staged.with_name(staged.name + ".old")
+        os.rename(target, backup)
+        os.rename(staged, target)
+        shutil.rmtree(backup)
+
+
+def report_file(relative: str, written: bool):
+    """Log the outcome of emit_file"""
+    print(f"✓ Created: {relative}" if written else f"· Unchanged: {relative}")
+
+
+def parse_args(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generate the BioLens .NET solution sources")
+    parser.add_argument("--incremental", action="store_true",
+                        help="skip files whose content hash matches the previous run's manifest")
+    parser.add_argument("--parallel", action="store_true",
+                        help="render and write templates on a thread pool")
+    parser.add_argument("--jobs", type=int, metavar="N",
+                        help="maximum number of concurrent writers (implies --parallel)")
+    parser.add_argument("--archive", choices=["tar", "zip"],
+                        help="stream the solution and its Dockerfile as an archive (a docker build "
+                             "context) instead of writing BASE_DIR")
+    parser.add_argument("--archive-output", default="-", metavar="PATH",
+                        help="archive destination, '-' for stdout or /dev/fd/N (default: -)")
+    parser.add_argument("--output-dir", type=Path, default=None, metavar="DIR",
+                        help=f"directory to generate into (default: {BASE_DIR})")
+    parser.add_argument("--param", action="append", default=[], metavar="NAME=VALUE",
+                        help="override a template parameter; may be repeated")
+    parser.add_argument("--params", type=Path, metavar="FILE",
+                        help="JSON object of template parameter overrides")
+    parser.add_argument("--only", action="append", metavar="PATTERN",
+                        help="generate only templates matching this key glob (e.g. 'agents/*') "
+                             "plus their dependencies; may be repeated")
+    parser.add_argument("--watch", action="store_true",
+                        help="keep running and regenerate outputs whose template changed "
+                             "(implies --incremental)")
+    parser.add_argument("--interval", type=float, default=0.5, metavar="SECONDS",
+                        help="polling interval for --watch (default: 0.5)")
+    parser.add_argument("--batch", type=Path, metavar="FILE",
+                        help="JSON list of variants ({name, params, output_dir}) to generate "
+                             "in one run under --output-dir")
+    parser.add_argument("--staged", action="store_true",
+                        help="write into a sibling temp directory and swap it into place when "
+                             "complete; the output directory must be generator-owned")
+    parser.add_argument("--fsync", action="store_true",
+                        help="with --staged, flush everything to disk once before the swap")
+    args = parser.parse_args(argv)
+
+    if args.watch and args.archive:
+        parser.error("--watch cannot be combined with --archive")
+    if args.staged and (args.watch or args.archive):
+        parser.error("--staged cannot be combined with --watch or --archive")
+    if args.batch and (args.watch or args.archive):
+        parser.error("--batch cannot be combined with --watch or --archive")
+    if args.fsync and not args.staged:
+        parser.error("--fsync requires --staged")
+    args.incremental = args.incremental or args.watch
+
+    try:
+        args.layers = select_layers(args.only)
+    except ValueError as e:
+        parser.error(str(e))
+
+    overrides = {}
+    if args.params:
+        with open(args.params, encoding='utf-8') as f:
+            overrides.update(json.load(f))
+    for item in args.param:
+        name, sep, value = item.partition("=")
+        if not sep:
+            parser.error(f"--param expects NAME=VALUE, got {item!r}")
+        overrides[name] = value
+    try:
+        args.template_params = resolve_params(overrides)
+    except ValueError as e:
+        parser.error(str(e))
+    args.output_dir = args.output_dir or BASE_DIR
+
+    if args.jobs is not None and args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    return args
+
+
+def generate(args, base_dir: Path, params: Mapping, shared: dict | None = None):
+    """Emit the selected layers into base_dir and update its manifest
+
+    Honours the --incremental, --parallel/--jobs and --staged options in
+    ``args``. ``shared`` is passed through to emit_file to hard-link
+    identical outputs across runs. Returns the new manifest, the written
+    and skipped counts, and the stale paths.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    previous = load_manifest(base_dir)
+    written = skipped = 0
+
+    jobs = [(banner, relative, key)
+            for banner, outputs in args.layers for relative, key in outputs]
+
+    # A scoped run keeps the manifest entries of the files it did not touch
+    scoped = args.layers is not LAYERS
+    if scoped:
+        in_scope = {relative for _, relative, _ in jobs}
+        manifest = {relative: entry for relative, entry in previous.items() if relative not in in_scope}
+        print(f"🎯 Generating {len(jobs)} files (selection plus dependencies)")
+        print()
+    else:
+        manifest = {}
+
+    write_dir = base_dir
+    if args.staged:
+        foreign = foreign_files(base_dir, previous)
+        if foreign:
+            sys.exit(f"❌ Refusing to replace {base_dir}: {len(foreign)} files are not generated "
+                     f"(e.g. {foreign[0]})")
+        base_dir.parent.mkdir(parents=True, exist_ok=True)
+        write_dir = Path(tempfile.mkdtemp(prefix=f".{base_dir.name}.staging-", dir=base_dir.parent))
+        # mkdtemp creates the directory 0700; give it the mode the output should have
+        os.chmod(write_dir, directory_mode(base_dir))
+        print(f"🗂  Staging into {write_dir}")
+        # Files outside a scoped selection are carried over unchanged
+        for relative in manifest:
+            if (base_dir / relative).is_file():
+                (write_dir / relative).parent.mkdir(parents=True, exist_ok=True)
+                os.link(base_dir / relative, write_dir / relative)
+
+    def emit(job):
+        _, relative, key = job
+        return emit_file(write_dir, relative, render_output(key, params), key,
+                         previous if args.incremental else None,
+                         base_dir if args.staged else None, shared)
+
+    try:
+        # Results are consumed in submission order, so the log matches a serial run
+        with ThreadPoolExecutor(max_workers=args.jobs) if args.parallel or args.jobs else nullcontext() as pool:
+            results = pool.map(emit, jobs) if pool else map(emit, jobs)
+            current_banner = None
+            for (banner, relative, key), (was_written, entry) in zip(jobs, results):
+                if banner != current_banner:
+                    print(banner)
+                    current_banner = banner
+                manifest[relative] = entry
+                report_file(relative, was_written)
+                if was_written:
+                    written += 1
+                else:
+                    skipped += 1
+
+        stale = [] if scoped else sorted(set(previous) - set(manifest))
+        for relative in stale:
+            print(f"⚠ Stale: {relative} (no longer generated)")
+        save_manifest(write_dir, manifest)
+
+        if args.staged:
+            if args.fsync:
+                os.sync()
+            swap_directories(write_dir, base_dir)
+            print(f"🔀 Swapped staged output into {base_dir}")
+            if shared is not None:
+                # The staging paths are gone after the swap; later variants link the final ones
+                for digest, source in shared.items():
+                    if source.is_relative_to(write_dir):
+                        shared[digest] = base_dir / source.relative_to(write_dir)
+    except BaseException:
+        if args.staged:
+            shutil.rmtree(write_dir, ignore_errors=True)
+        raise
+
+    return manifest, written, skipped, stale
+
+
+def load_batch(path: Path, base_params: Mapping) -> list[tuple[str, Path | None, dict]]:
+    """Read a batch file into (name, output dir, resolved params) variants
+
+    The file holds a JSON list (or an object with a "variants" list) of
+    ``{"name": ..., "params": {...}, "output_dir": ...}``. Variant params are
+    applied over the command line ones; output_dir defaults to the name.
+    """
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get("variants", [])
+
+    variants = []
+    seen = set()
+    for variant in data:
+        name = variant.get("name")
+        if not name:
+            raise ValueError("Every batch variant needs a name")
+        if name in seen:
+            raise ValueError(f"Duplicate batch variant: {name}")
+        seen.add(name)
+        params = resolve_params({**base_params, **variant.get("params", {})})
+        output_dir = variant.get("output_dir")
+        variants.append((name, Path(output_dir) if output_dir else None, params))
+    return variants
+
+
+def run_batch(args):
+    """Generate every variant of a batch file in one process
+
+    Renders are shared through the render cache, so a template is rendered
+    once per distinct set of the parameters it uses. Byte-identical outputs
+    are written once and hard-linked into the other variants.
+    """
+    try:
+        variants = load_batch(args.batch, args.template_params)
+    except ValueError as e:
+        sys.exit(f"❌ {args.batch}: {e}")
+
+    shared = {}
+    total_written = total_skipped = 0
+    for name, output_dir, params in variants:
+        base_dir = args.output_dir / (output_dir or name)
+        print(f"🧬 Variant {name} → {base_dir}")
+        _, written, skipped, _ = generate(args, base_dir, params, shared)
+        total_written += written
+        total_skipped += skipped
+        print()
 
-    protected override void OnModelCreating(ModelBuilder modelBuilder)
-    {
-        modelBuilder.ApplyConfigurationsFromAssembly(typeof(BioLensDbContext).Assembly);
-    }
-}
+    print("=" * 60)
+    print(f"✅ Generated {len(variants)} variants")
+    print(f"📁 Files created under: {args.output_dir}")
+    print(f"   {total_written} written, {total_skipped} skipped, "
+          f"{len(shared)} distinct files written")
+    print("=" * 60)
 
-public class DiagnosticCaseRepository : IDiagnosticCaseRepository
-{
-    private readonly BioLensDbContext _context;
-
-    public DiagnosticCaseRepository(BioLensDbContext context)
-    {
-        _context = context;
-    }
-
-    public async Task<DiagnosticCase?> GetByIdAsync(Guid id, CancellationToken cancellationToken = default)
-    {
-        return await _context.DiagnosticCases
-            .Include(c => c.Patient)
-            .FirstOrDefaultAsync(c => c.Id == id, cancellationToken);
-    }
-
-    public async Task<Guid> AddAsync(DiagnosticCase diagnosticCase, CancellationToken cancellationToken = default)
-    {
-        await _context.DiagnosticCases.AddAsync(diagnosticCase, cancellationToken);
-        await _context.SaveChangesAsync(cancellationToken);
-        return diagnosticCase.Id;
-    }
-
-    public async Task UpdateAsync(DiagnosticCase diagnosticCase, CancellationToken cancellationToken = default)
-    {
-        _context.DiagnosticCases.Update(diagnosticCase);
-        await _context.SaveChangesAsync(cancellationToken);
-    }
-
-    public async Task<List<DiagnosticCase>> GetUnsyncedAsync(CancellationToken cancellationToken = default)
-    {
-        return await _context.DiagnosticCases
-            .Where(c => !c.IsSyncedToCloud)
-            .ToListAsync(cancellationToken);
-    }
-}
 
-public class PatientRepository : IPatientRepository
-{
-    private readonly BioLensDbContext _context;
-
-    public PatientRepository(BioLensDbContext context)
-    {
-        _context = context;
-    }
-
-    public async Task<Patient?> GetByAnonymizedIdAsync(
-        string anonymizedId,
-        CancellationToken cancellationToken = default)
-    {
-        return await _context.Patients
-            .FirstOrDefaultAsync(p => p.AnonymizedId == anonymizedId, cancellationToken);
-    }
-
-    public async Task<Guid> AddAsync(Patient patient, CancellationToken cancellationToken = default)
-    {
-        await _context.Patients.AddAsync(patient, cancellationToken);
-        await _context.SaveChangesAsync(cancellationToken);
-        return patient.Id;
-    }
-}
-""",
-}
+def main(argv=None):
+    args = parse_args(argv)
 
-def create_file(path: Path, content: str):
-    """Create a file with the given content"""
-    path.parent.mkdir(parents=True, exist_ok=True)
-    with open(path, 'w', encoding='utf-8') as f:
-        f.write(content.strip() + '\n')
-    print(f"✓ Created: {path.relative_to(BASE_DIR)}")
+    if args.archive:
+        if args.archive_output == "-":
+            count = write_archive(sys.stdout.buffer, args.archive, args.layers, args.template_params)
+            sys.stdout.buffer.flush()
+        else:
+            with open(args.archive_output, 'wb') as f:
+                count = write_archive(f, args.archive, args.layers, args.template_params)
+        print(f"✅ Archived {count} files as {args.archive}", file=sys.stderr)
+        return
 
-def main():
     print("=" * 60)
     print("BioLens Code Generator")
     print("Agentic AI Healthcare Diagnostic Assistant")
     print("=" * 60)
     print()
 
-    # Domain Layer
-    print("📦 Generating Domain Layer...")
-    create_file(BASE_DIR / "src/BioLens.Domain/Enums/Enums.cs", TEMPLATES["domain/enums"])
-    create_file(BASE_DIR / "src/BioLens.Domain/Entities/Patient.cs", TEMPLATES["domain/entities/patient"])
-    create_file(BASE_DIR / "src/BioLens.Domain/Entities/DiagnosticCase.cs", TEMPLATES["domain/entities/diagnostic_case"])
-    create_file(BASE_DIR / "src/BioLens.Domain/ValueObjects/ValueObjects.cs", TEMPLATES["domain/value_objects"])
-    create_file(BASE_DIR / "src/BioLens.Domain/Events/DomainEvents.cs", TEMPLATES["domain/events"])
-    create_file(BASE_DIR / "src/BioLens.Domain/Repositories/IRepositories.cs", TEMPLATES["domain/repositories"])
-
-    # Agents Layer
-    print("🤖 Generating Agents Layer...")
-    create_file(BASE_DIR / "src/BioLens.Agents/Core/AgentBase.cs", TEMPLATES["agents/core/agent_base"])
-    create_file(BASE_DIR / "src/BioLens.Agents/Core/DiagnosticCoordinatorAgent.cs", TEMPLATES["agents/core/diagnostic_coordinator"])
-    create_file(BASE_DIR / "src/BioLens.Agents/Core/ImageAnalysisAgent.cs", TEMPLATES["agents/specialized/image_analysis"])
-    create_file(BASE_DIR / "src/BioLens.Agents/Core/AudioTranscriptionAgent.cs", TEMPLATES["agents/specialized/audio_transcription"])
-    create_file(BASE_DIR / "src/BioLens.Agents/Core/MedicalReasoningAgent.cs", TEMPLATES["agents/specialized/medical_reasoning"])
-    create_file(BASE_DIR / "src/BioLens.Agents/Core/TreatmentPlannerAgent.cs", TEMPLATES["agents/specialized/treatment_planner"])
-
-    # Application Layer
-    print("⚙️  Generating Application Layer...")
-    create_file(BASE_DIR / "src/BioLens.Application/Commands/Commands.cs", TEMPLATES["application/commands"])
-    create_file(BASE_DIR / "src/BioLens.Application/Handlers/CommandHandlers.cs", TEMPLATES["application/handlers"])
-
-    # Infrastructure Layer
-    print("🔧 Generating Infrastructure Layer...")
-    create_file(BASE_DIR / "src/BioLens.Infrastructure/AI/GeminiAIService.cs", TEMPLATES["infrastructure/gemini_service"])
-    create_file(BASE_DIR / "src/BioLens.Infrastructure/Persistence/BioLensDbContext.cs", TEMPLATES["infrastructure/persistence"])
+    if args.batch:
+        run_batch(args)
+        return
+
+    base_dir = args.output_dir
+    manifest, written, skipped, stale = generate(args, base_dir, args.template_params)
 
     print()
     print("=" * 60)
     print("✅ Code generation complete!")
-    print(f"📁 Files created in: {BASE_DIR}")
+    print(f"📁 Files created in: {base_dir}")
+    print(f"   {written} written, {skipped} skipped, {len(stale)} stale")
     print("=" * 60)
 
+    if args.watch:
+        watch(args, manifest)
+
+
+def _stat_snapshot(paths) -> dict:
+    """Map each path to (mtime_ns, size), or None if it does not exist"""
+    stamps = {}
+    for path in paths:
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            stamps[path] = None
+        else:
+            stamps[path] = (st.st_mtime_ns, st.st_size)
+    return stamps
+
+
+def watch(args, manifest: dict):
+    """Regenerate outputs whose template changed until interrupted
+
+    Template files are polled every ``args.interval`` seconds. A changed
+    template is reloaded and recompiled, and its outputs are rewritten only if
+    the rendered hash differs from the manifest. Renders of unchanged
+    templates stay cached. An edit to the generator itself or to the --params
+    file restarts the process so the new code and parameters take effect.
+    """
+    base_dir = args.output_dir
+    outputs = [(relative, key) for _, items in args.layers for relative, key in items]
+    template_paths = {key: TEMPLATES.path(key) for _, key in outputs if key in TEMPLATES}
+    restart_paths = [Path(__file__).resolve()] + ([args.params] if args.params else [])
+
+    templates_seen = _stat_snapshot(template_paths.values())
+    restart_seen = _stat_snapshot(restart_paths)
+    print()
+    print(f"👀 Watching {len(template_paths)} templates in {TEMPLATE_DIR} (Ctrl+C to stop)")
+
+    try:
+        while True:
+            time.sleep(args.interval)
+            if _stat_snapshot(restart_paths) != restart_seen:
+                print("♻️  Generator changed, restarting...")
+                sys.stdout.flush()
+                os.execv(sys.executable, [sys.executable] + sys.argv)
+
+            current = _stat_snapshot(template_paths.values())
+            if current == templates_seen:
+                continue
+            changed = {key for key, path in template_paths.items()
+                       if current[path] != templates_seen[path]}
+            templates_seen = current
+            for key in changed:
+                TEMPLATES.invalidate(key)
+
+            print(f"🔄 {time.strftime('%H:%M:%S')} {len(changed)} template(s) changed")
+            for relative, key in outputs:
+                if key not in changed:
+                    continue
+                try:
+                    content = render_output(key, args.template_params)
+                except (KeyError, ValueError) as e:
+                    print(f"✗ Failed: {relative} ({e})")
+                    continue
+                written, entry = emit_file(base_dir, relative, content, key, manifest)
+                manifest[relative] = entry
+                report_file(relative, written)
+            save_manifest(base_dir, manifest)
+    except KeyboardInterrupt:
+        print()
+        print("👋 Watch stopped")
+
 if __name__ == "__main__":
     main()
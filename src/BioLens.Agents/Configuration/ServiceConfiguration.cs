@@ -3,6 +3,8 @@ using Microsoft.Extensions.Configuration;
 using Microsoft.SemanticKernel;
 using BioLens.Agents.Core;
 using BioLens.Infrastructure.AI;
+using BioLens.Infrastructure.Imaging;
+using BioLens.Infrastructure.Persistence;
 
 namespace BioLens.Agents.Configuration;
 
@@ -27,9 +29,28 @@ public static class AgentServiceCollectionExtensions
         services.AddScoped<TreatmentPlannerAgent>();
         services.AddScoped<DiagnosticCoordinatorAgent>();
 
-        // Register Gemini service
-        services.AddHttpClient<IGeminiAIService, GeminiAIService>();
+        // Register Gemini service behind the scheduling layer and response cache
+        services.AddScheduledGeminiAIService();
         services.Configure<GeminiConfiguration>(configuration.GetSection("Gemini"));
+        services.Configure<GeminiResilienceOptions>(configuration.GetSection("Gemini:Resilience"));
+        services.Configure<GeminiSchedulingOptions>(configuration.GetSection("Gemini:Scheduling"));
+        services.Configure<GeminiCacheOptions>(configuration.GetSection("Gemini:Cache"));
+
+        // On-device image triage for offline and hybrid diagnosis
+        services.AddImageTriage();
+        services.Configure<ImageTriageOptions>(configuration.GetSection("ImageTriage"));
+
+        // Downscale and strip captures before they are analyzed or uploaded
+        services.AddImagePreprocessing();
+        services.Configure<ImagePreprocessingOptions>(configuration.GetSection("ImagePreprocessing"));
+
+        // Analyze near-duplicate captures once and reuse findings for repeated images
+        services.AddImageFingerprinting();
+        services.Configure<ImageFingerprintOptions>(configuration.GetSection("ImageFingerprinting"));
+
+        // Pooled contexts over WAL-mode SQLite, shared by capture and background sync
+        services.AddBioLensPersistence();
+        services.Configure<DatabaseOptions>(configuration.GetSection("Database"));
 
         return services;
     }
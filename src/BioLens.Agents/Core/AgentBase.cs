@@ -1,3 +1,7 @@
+using System.Runtime.CompilerServices;
+using System.Text.Json;
+using BioLens.Domain.Enums;
+using BioLens.Infrastructure.AI;
 using Microsoft.SemanticKernel;
 using Microsoft.SemanticKernel.Agents;
 
@@ -5,26 +9,76 @@ namespace BioLens.Agents.Core;
 
 /// <summary>
 /// Base class for all BioLens agents
+/// Prompts go through the injected IGeminiAIService when there is one, so
+/// agent calls share its single-flight, response cache and resilience
+/// layers and can carry media; without one they fall back to the Kernel
 /// </summary>
 public abstract class BioLensAgent
 {
     protected readonly Kernel Kernel;
+    protected readonly IGeminiAIService? Gemini;
     protected readonly string AgentName;
     protected readonly string AgentDescription;
 
-    protected BioLensAgent(Kernel kernel, string name, string description)
+    protected BioLensAgent(Kernel kernel, string name, string description, IGeminiAIService? gemini = null)
     {
         Kernel = kernel;
+        Gemini = gemini;
         AgentName = name;
         AgentDescription = description;
     }
 
     public abstract Task<AgentResponse> ExecuteAsync(AgentRequest request, CancellationToken cancellationToken = default);
     
-    protected async Task<string> InvokePromptAsync(string prompt, CancellationToken cancellationToken)
+    protected Task<GeminiResult> InvokePromptAsync(string prompt, CancellationToken cancellationToken) =>
+        InvokePromptAsync(prompt, null, cancellationToken);
+
+    /// <summary>
+    /// Media is only sent through the Gemini service; the Kernel fallback is text-only
+    /// The result carries its source, so agents can report a cached answer as such
+    /// </summary>
+    protected async Task<GeminiResult> InvokePromptAsync(
+        string prompt,
+        IReadOnlyList<GeminiMedia>? media,
+        CancellationToken cancellationToken)
     {
+        if (Gemini != null)
+        {
+            return await Gemini.GenerateAsync(prompt, media, cancellationToken);
+        }
+
         var result = await Kernel.InvokePromptAsync(prompt, cancellationToken: cancellationToken);
-        return result.ToString();
+        return new GeminiResult(result.ToString(), DiagnosisSource.GeminiAI);
+    }
+
+    /// <summary>
+    /// Streams the model output chunk by chunk as it is generated
+    /// </summary>
+    protected async IAsyncEnumerable<string> InvokePromptStreamingAsync(
+        string prompt,
+        [EnumeratorCancellation] CancellationToken cancellationToken)
+    {
+        var chunks = Gemini != null
+            ? Gemini.StreamContentAsync(prompt, cancellationToken: cancellationToken)
+            : KernelStreamAsync(prompt, cancellationToken);
+
+        await foreach (var text in chunks.WithCancellation(cancellationToken))
+        {
+            if (!string.IsNullOrEmpty(text))
+            {
+                yield return text;
+            }
+        }
+    }
+
+    private async IAsyncEnumerable<string> KernelStreamAsync(
+        string prompt,
+        [EnumeratorCancellation] CancellationToken cancellationToken)
+    {
+        await foreach (var chunk in Kernel.InvokePromptStreamingAsync(prompt, cancellationToken: cancellationToken))
+        {
+            yield return chunk.ToString();
+        }
     }
 }
 
@@ -47,6 +101,16 @@ public record AgentResponse(
     List<string> Messages,
     Dictionary<string, object> Metadata);
 
+/// <summary>
+/// A top-level field of an agent result that became available before the
+/// rest of the result finished streaming
+/// </summary>
+public record PartialAgentResult(
+    string RequestId,
+    string AgentName,
+    string Field,
+    JsonElement Value);
+
 /// <summary>
 /// Context shared across agents
 /// </summary>
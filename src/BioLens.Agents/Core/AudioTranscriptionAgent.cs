@@ -1,4 +1,5 @@
 using BioLens.Domain.ValueObjects;
+using BioLens.Infrastructure.AI;
 using Microsoft.SemanticKernel;
 
 namespace BioLens.Agents.Core;
@@ -8,8 +9,8 @@ namespace BioLens.Agents.Core;
 /// </summary>
 public class AudioTranscriptionAgent : BioLensAgent
 {
-    public AudioTranscriptionAgent(Kernel kernel)
-        : base(kernel, "AudioTranscriber", "Transcribes and extracts symptoms from audio")
+    public AudioTranscriptionAgent(Kernel kernel, IGeminiAIService? gemini = null)
+        : base(kernel, "AudioTranscriber", "Transcribes and extracts symptoms from audio", gemini)
     {
     }
 
@@ -53,8 +54,12 @@ Return as JSON:
         return new AgentResponse(
             request.RequestId,
             true,
-            result,
+            result.Text,
             new List<string> { "Audio analyzed successfully" },
-            new Dictionary<string, object> { ["language"] = audio.LanguageCode });
+            new Dictionary<string, object>
+            {
+                ["language"] = audio.LanguageCode,
+                ["source"] = result.Source
+            });
     }
 }
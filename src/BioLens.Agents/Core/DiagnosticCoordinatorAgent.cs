@@ -1,3 +1,5 @@
+using System.Collections.Concurrent;
+using System.Diagnostics;
 using BioLens.Domain.Entities;
 using BioLens.Domain.ValueObjects;
 using Microsoft.SemanticKernel;
@@ -7,6 +9,8 @@ namespace BioLens.Agents.Core;
 /// <summary>
 /// Coordinator agent that orchestrates the diagnostic workflow
 /// Uses Chain of Thought and ReAct pattern
+/// Runs the agents as a dependency graph: a step starts as soon as the steps
+/// it depends on have finished, so independent steps run concurrently
 /// </summary>
 public class DiagnosticCoordinatorAgent : BioLensAgent
 {
@@ -35,58 +39,72 @@ public class DiagnosticCoordinatorAgent : BioLensAgent
     {
         var diagnosticCase = (DiagnosticCase)request.Parameters["case"];
         var messages = new List<string>();
-        
-        try
+        var stepDurations = new ConcurrentDictionary<string, double>();
+        var workflowTimer = Stopwatch.StartNew();
+
+        var steps = new List<WorkflowStep>
         {
-            // Step 1: Analyze images
-            messages.Add("🔍 Analyzing medical images...");
-            var imageAnalysis = await _imageAgent.ExecuteAsync(
+            // Step 1: Analyze images (on device when the requested mode allows it)
+            new("Image", [], "🔍 Analyzing medical images...", _ => _imageAgent.ExecuteAsync(
                 new AgentRequest(
                     request.RequestId,
                     "AnalyzeImages",
-                    new Dictionary<string, object> { ["images"] = diagnosticCase.Images },
+                    Forward(request, new Dictionary<string, object> { ["images"] = diagnosticCase.Images }, "mode"),
                     request.Context),
-                cancellationToken);
+                cancellationToken))
+        };
 
-            // Step 2: Transcribe and analyze audio
-            messages.Add("🎤 Processing audio symptoms...");
-            var audioAnalysis = await _audioAgent.ExecuteAsync(
+        // Step 2: Transcribe and analyze audio (independent of step 1)
+        if (diagnosticCase.AudioDescription is { } audio)
+        {
+            steps.Add(new("Audio", [], "🎤 Processing audio symptoms...", _ => _audioAgent.ExecuteAsync(
                 new AgentRequest(
                     request.RequestId,
                     "TranscribeAudio",
-                    new Dictionary<string, object> { ["audio"] = diagnosticCase.AudioDescription! },
+                    new Dictionary<string, object> { ["audio"] = audio },
                     request.Context),
-                cancellationToken);
+                cancellationToken)));
+        }
 
-            // Step 3: Medical reasoning and differential diagnosis
-            messages.Add("🧠 Generating differential diagnosis...");
-            var diagnosis = await _reasoningAgent.ExecuteAsync(
-                new AgentRequest(
-                    request.RequestId,
-                    "GenerateDiagnosis",
-                    new Dictionary<string, object>
-                    {
-                        ["imageFindings"] = imageAnalysis.Result!,
-                        ["audioFindings"] = audioAnalysis.Result!,
-                        ["patient"] = diagnosticCase.Patient,
-                        ["context"] = diagnosticCase.Context
-                    },
-                    request.Context),
-                cancellationToken);
+        // Step 3: Medical reasoning and differential diagnosis
+        steps.Add(new("Reasoning", steps.Select(s => s.Name).ToArray(), "🧠 Generating differential diagnosis...",
+            results =>
+            {
+                var parameters = new Dictionary<string, object>
+                {
+                    ["imageFindings"] = results["Image"].Result!,
+                    ["audioFindings"] = results.TryGetValue("Audio", out var audioAnalysis)
+                        ? audioAnalysis.Result!
+                        : new { note = "No audio symptom description was recorded" },
+                    ["patient"] = diagnosticCase.Patient,
+                    ["context"] = diagnosticCase.Context
+                };
 
-            // Step 4: Generate treatment protocol
-            messages.Add("💊 Creating treatment protocol...");
-            var treatment = await _treatmentAgent.ExecuteAsync(
+                // Let the caller see the primary diagnosis while the differential still streams
+                Forward(request, parameters, "progress");
+
+                return _reasoningAgent.ExecuteAsync(
+                    new AgentRequest(request.RequestId, "GenerateDiagnosis", parameters, request.Context),
+                    cancellationToken);
+            }));
+
+        // Step 4: Generate treatment protocol
+        steps.Add(new("Treatment", ["Reasoning"], "💊 Creating treatment protocol...",
+            results => _treatmentAgent.ExecuteAsync(
                 new AgentRequest(
                     request.RequestId,
                     "CreateTreatmentPlan",
                     new Dictionary<string, object>
                     {
-                        ["diagnosis"] = diagnosis.Result!,
+                        ["diagnosis"] = results["Reasoning"].Result!,
                         ["context"] = diagnosticCase.Context
                     },
                     request.Context),
-                cancellationToken);
+                cancellationToken)));
+
+        try
+        {
+            var stepResults = await RunWorkflowAsync(steps, messages, stepDurations);
 
             messages.Add("✅ Diagnostic workflow completed");
 
@@ -95,25 +113,103 @@ public class DiagnosticCoordinatorAgent : BioLensAgent
                 true,
                 new
                 {
-                    Diagnosis = diagnosis.Result,
-                    Treatment = treatment.Result
+                    Diagnosis = stepResults["Reasoning"].Result,
+                    Treatment = stepResults["Treatment"].Result
                 },
                 messages,
                 new Dictionary<string, object>
                 {
                     ["completedAt"] = DateTimeOffset.UtcNow,
-                    ["agentsInvolved"] = new[] { "Image", "Audio", "Reasoning", "Treatment" }
+                    ["agentsInvolved"] = steps.Select(s => s.Name).ToArray(),
+                    ["stepDurationsMs"] = new Dictionary<string, double>(stepDurations),
+                    ["totalDurationMs"] = workflowTimer.Elapsed.TotalMilliseconds
                 });
         }
         catch (Exception ex)
         {
-            messages.Add($"❌ Error: {ex.Message}");
+            lock (messages)
+            {
+                messages.Add($"❌ Error: {ex.Message}");
+            }
             return new AgentResponse(
                 request.RequestId,
                 false,
                 null,
                 messages,
-                new Dictionary<string, object> { ["error"] = ex.ToString() });
+                new Dictionary<string, object>
+                {
+                    ["error"] = ex.ToString(),
+                    ["stepDurationsMs"] = new Dictionary<string, double>(stepDurations)
+                });
         }
     }
+
+    /// <summary>
+    /// Copies the named optional parameters of the workflow request into a step's parameters
+    /// </summary>
+    private static Dictionary<string, object> Forward(
+        AgentRequest request,
+        Dictionary<string, object> parameters,
+        params string[] names)
+    {
+        foreach (var name in names)
+        {
+            if (request.Parameters.TryGetValue(name, out var value))
+            {
+                parameters[name] = value;
+            }
+        }
+        return parameters;
+    }
+
+    /// <summary>
+    /// Starts every step once its dependencies have completed and waits for all of them.
+    /// Steps must be listed after the steps they depend on.
+    /// </summary>
+    private static async Task<IReadOnlyDictionary<string, AgentResponse>> RunWorkflowAsync(
+        IReadOnlyList<WorkflowStep> steps,
+        List<string> messages,
+        ConcurrentDictionary<string, double> stepDurations)
+    {
+        var tasks = new Dictionary<string, Task<AgentResponse>>();
+        foreach (var step in steps)
+        {
+            var dependencies = step.DependsOn.ToDictionary(name => name, name => tasks[name]);
+            tasks[step.Name] = RunStepAsync(step, dependencies, messages, stepDurations);
+        }
+
+        await Task.WhenAll(tasks.Values);
+        return tasks.ToDictionary(t => t.Key, t => t.Value.Result);
+    }
+
+    private static async Task<AgentResponse> RunStepAsync(
+        WorkflowStep step,
+        IReadOnlyDictionary<string, Task<AgentResponse>> dependencies,
+        List<string> messages,
+        ConcurrentDictionary<string, double> stepDurations)
+    {
+        await Task.WhenAll(dependencies.Values);
+        var results = dependencies.ToDictionary(d => d.Key, d => d.Value.Result);
+
+        lock (messages)
+        {
+            messages.Add(step.StartMessage);
+        }
+
+        var timer = Stopwatch.StartNew();
+        try
+        {
+            return await step.Run(results);
+        }
+        finally
+        {
+            stepDurations[step.Name] = timer.Elapsed.TotalMilliseconds;
+        }
+    }
+
+    private sealed record WorkflowStep(
+        string Name,
+        string[] DependsOn,
+        string StartMessage,
+        Func<IReadOnlyDictionary<string, AgentResponse>, Task<AgentResponse>> Run);
 }
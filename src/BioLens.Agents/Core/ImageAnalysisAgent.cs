@@ -1,17 +1,42 @@
+using BioLens.Domain.Enums;
 using BioLens.Domain.ValueObjects;
+using BioLens.Infrastructure.AI;
+using BioLens.Infrastructure.Imaging;
 using Microsoft.SemanticKernel;
 using System.Text.Json;
+using System.Text.Json.Nodes;
 
 namespace BioLens.Agents.Core;
 
 /// <summary>
 /// Specialized agent for analyzing medical images using Gemini 3 Vision
+/// With an on-device triage engine it works offline (DiagnosisMode.Offline)
+/// and pre-screens images before the Gemini call (DiagnosisMode.Hybrid)
+/// With a preprocessor, captures are downscaled and stripped of EXIF first
+/// With a fingerprinter, near-duplicate captures are analyzed once; with a
+/// findings index, byte-identical repeats of images seen in earlier cases
+/// reuse the findings stored for them
 /// </summary>
 public class ImageAnalysisAgent : BioLensAgent
 {
-    public ImageAnalysisAgent(Kernel kernel)
-        : base(kernel, "ImageAnalyzer", "Analyzes medical images for diagnostic clues")
+    private readonly IImageTriageEngine? _triageEngine;
+    private readonly IImagePreprocessor? _preprocessor;
+    private readonly IImageFingerprinter? _fingerprinter;
+    private readonly IImageFindingsIndex? _findingsIndex;
+
+    public ImageAnalysisAgent(
+        Kernel kernel,
+        IImageTriageEngine? triageEngine = null,
+        IImagePreprocessor? preprocessor = null,
+        IImageFingerprinter? fingerprinter = null,
+        IImageFindingsIndex? findingsIndex = null,
+        IGeminiAIService? gemini = null)
+        : base(kernel, "ImageAnalyzer", "Analyzes medical images for diagnostic clues", gemini)
     {
+        _triageEngine = triageEngine;
+        _preprocessor = preprocessor;
+        _fingerprinter = fingerprinter;
+        _findingsIndex = findingsIndex;
     }
 
     public override async Task<AgentResponse> ExecuteAsync(
@@ -19,28 +44,329 @@ public class ImageAnalysisAgent : BioLensAgent
         CancellationToken cancellationToken = default)
     {
         var images = (IReadOnlyCollection<MedicalImage>)request.Parameters["images"];
+        var mode = request.Parameters.GetValueOrDefault("mode") as DiagnosisMode? ?? DiagnosisMode.Online;
+
+        IReadOnlyList<PreparedImage>? prepared = null;
+        if (_preprocessor != null && images.Count > 0)
+        {
+            prepared = await _preprocessor.PrepareAllAsync(images, cancellationToken);
+            var preparedPaths = prepared.ToDictionary(p => p.ImageId, p => p.FilePath);
+            images = images.Select(i => i with { LocalFilePath = preparedPaths[i.Id] }).ToList();
+        }
+
+        var duplicates = new Dictionary<Guid, Guid>();
+        if (_fingerprinter != null && images.Count > 0)
+        {
+            images = await _fingerprinter.FingerprintAllAsync(images, cancellationToken);
+            var groups = _fingerprinter.GroupNearDuplicates(images);
+            foreach (var group in groups)
+            {
+                foreach (var duplicate in group.Duplicates)
+                    duplicates[duplicate.Id] = group.Representative.Id;
+            }
+            images = groups.Select(g => g.Representative).ToList();
+        }
+
+        var contentKeys = await ComputeContentKeysAsync(images, cancellationToken);
+        var reused = ReuseIndexedFindings(images, contentKeys, out var pending);
+        if (pending.Count == 0 && reused.Count > 0)
+        {
+            return ReusedResponse(request, images, reused, duplicates);
+        }
+
+        IReadOnlyList<ImageTriageResult>? triage = null;
+        if (_triageEngine != null && mode != DiagnosisMode.Online && pending.Count > 0)
+        {
+            triage = await _triageEngine.TriageAsync(pending, cancellationToken);
+        }
+
+        if (mode == DiagnosisMode.Offline)
+        {
+            return triage != null || pending.Count == 0
+                ? TriageResponse(request, images, triage ?? [], reused, duplicates, "Triaged {0} images on device")
+                : new AgentResponse(
+                    request.RequestId,
+                    false,
+                    null,
+                    new List<string> { "Offline image analysis needs the on-device triage model" },
+                    new Dictionary<string, object> { ["imageCount"] = images.Count });
+        }
+
+        GeminiResult analysis;
+        try
+        {
+            var prompt = BuildImageAnalysisPrompt(pending, triage);
+            analysis = await InvokePromptAsync(prompt, ToMedia(pending, prepared), cancellationToken);
+        }
+        catch (Exception) when (triage != null && !cancellationToken.IsCancellationRequested)
+        {
+            // Hybrid mode keeps working on the pre-screen when the model is unreachable
+            return TriageResponse(request, images, triage, reused, duplicates,
+                "Gemini unavailable; triaged {0} images on device");
+        }
+
+        var analysisResult = analysis.Text;
+        IndexFindings(analysisResult, contentKeys);
+        var findings = reused.Count > 0
+            ? MergeFindings(analysisResult, reused)
+            : ParseImageFindings(analysisResult);
         
-        var prompt = BuildImageAnalysisPrompt(images);
-        var analysisResult = await InvokePromptAsync(prompt, cancellationToken);
-        
-        var findings = ParseImageFindings(analysisResult);
-        
+        var metadata = new Dictionary<string, object>
+        {
+            ["imageCount"] = images.Count,
+            ["rawResponse"] = analysisResult,
+            ["source"] = analysis.Source
+        };
+        AddDeduplicationMetadata(metadata, reused, duplicates);
+        if (triage != null)
+        {
+            metadata["triage"] = triage;
+        }
+        if (prepared != null)
+        {
+            metadata["originalBytes"] = prepared.Sum(p => p.OriginalSizeBytes);
+            metadata["preparedBytes"] = prepared.Sum(p => p.FileSizeBytes);
+        }
+
         return new AgentResponse(
             request.RequestId,
             true,
             findings,
             new List<string> { $"Analyzed {images.Count} images" },
-            new Dictionary<string, object>
+            metadata);
+    }
+
+    /// <summary>
+    /// Hashes the files that will be analyzed (the prepared ones when there
+    /// are any), so findings are only reused for the exact bytes the model saw;
+    /// unreadable files are left out and simply analyzed
+    /// </summary>
+    private async Task<IReadOnlyDictionary<Guid, string>> ComputeContentKeysAsync(
+        IReadOnlyCollection<MedicalImage> images,
+        CancellationToken cancellationToken)
+    {
+        var keys = new Dictionary<Guid, string>();
+        if (_findingsIndex == null)
+            return keys;
+
+        foreach (var image in images)
+        {
+            try
+            {
+                keys[image.Id] = await _findingsIndex.ComputeKeyAsync(image.LocalFilePath, cancellationToken);
+            }
+            catch (Exception ex) when (ex is IOException or UnauthorizedAccessException)
+            {
+                // Not indexed
+            }
+        }
+        return keys;
+    }
+
+    /// <summary>
+    /// Splits the images into findings stored for identical content and the
+    /// images that still need analysis
+    /// </summary>
+    private List<JsonObject> ReuseIndexedFindings(
+        IReadOnlyCollection<MedicalImage> images,
+        IReadOnlyDictionary<Guid, string> contentKeys,
+        out IReadOnlyCollection<MedicalImage> pending)
+    {
+        var reused = new List<JsonObject>();
+        if (_findingsIndex == null)
+        {
+            pending = images;
+            return reused;
+        }
+
+        var remaining = new List<MedicalImage>(images.Count);
+        foreach (var image in images)
+        {
+            if (contentKeys.TryGetValue(image.Id, out var key)
+                && _findingsIndex.TryGet(key, out var stored)
+                && JsonNode.Parse(stored) is JsonObject finding)
+            {
+                finding["imageId"] = image.Id.ToString();
+                finding["reused"] = true;
+                reused.Add(finding);
+            }
+            else
+            {
+                remaining.Add(image);
+            }
+        }
+        pending = remaining;
+        return reused;
+    }
+
+    /// <summary>
+    /// Stores each per-image finding of a Gemini response under the image's content key
+    /// </summary>
+    private void IndexFindings(string analysisResult, IReadOnlyDictionary<Guid, string> contentKeys)
+    {
+        if (_findingsIndex == null || contentKeys.Count == 0)
+            return;
+
+        try
+        {
+            if (JsonNode.Parse(analysisResult)?["findings"] is not JsonArray findings)
+                return;
+
+            foreach (var finding in findings.OfType<JsonObject>())
+            {
+                if (finding["imageId"] is JsonValue id
+                    && id.TryGetValue<string>(out var text)
+                    && Guid.TryParse(text, out var imageId)
+                    && contentKeys.TryGetValue(imageId, out var key))
+                {
+                    _findingsIndex.Store(key, imageId, finding.ToJsonString());
+                }
+            }
+        }
+        catch (JsonException)
+        {
+            // Unstructured responses are used as-is but not indexed
+        }
+    }
+
+    private object MergeFindings(string analysisResult, IReadOnlyList<JsonObject> reused)
+    {
+        JsonNode? parsed;
+        try
+        {
+            parsed = JsonNode.Parse(analysisResult);
+        }
+        catch (JsonException)
+        {
+            return new { rawText = analysisResult, findings = reused };
+        }
+
+        if (parsed is not JsonObject result)
+            return ParseImageFindings(analysisResult);
+
+        if (result["findings"] is not JsonArray findings)
+        {
+            findings = new JsonArray();
+            result["findings"] = findings;
+        }
+        foreach (var finding in reused)
+        {
+            findings.Add(finding);
+        }
+        return result;
+    }
+
+    private static AgentResponse ReusedResponse(
+        AgentRequest request,
+        IReadOnlyCollection<MedicalImage> images,
+        IReadOnlyList<JsonObject> reused,
+        IReadOnlyDictionary<Guid, Guid> duplicates)
+    {
+        var metadata = new Dictionary<string, object>
+        {
+            ["imageCount"] = images.Count,
+            ["source"] = DiagnosisSource.OfflineCache
+        };
+        AddDeduplicationMetadata(metadata, reused, duplicates);
+
+        return new AgentResponse(
+            request.RequestId,
+            true,
+            new { findings = reused, overallAssessment = "Findings reused from identical images in earlier cases" },
+            new List<string> { $"Reused findings for {images.Count} previously analyzed images" },
+            metadata);
+    }
+
+    private static void AddDeduplicationMetadata(
+        Dictionary<string, object> metadata,
+        IReadOnlyList<JsonObject> reused,
+        IReadOnlyDictionary<Guid, Guid> duplicates)
+    {
+        if (duplicates.Count > 0)
+        {
+            metadata["duplicates"] = duplicates;
+        }
+        if (reused.Count > 0)
+        {
+            metadata["reusedFindings"] = reused.Count;
+        }
+    }
+
+    private static AgentResponse TriageResponse(
+        AgentRequest request,
+        IReadOnlyCollection<MedicalImage> images,
+        IReadOnlyList<ImageTriageResult> triage,
+        IReadOnlyList<JsonObject> reused,
+        IReadOnlyDictionary<Guid, Guid> duplicates,
+        string message)
+    {
+        var findings = new
+        {
+            findings = triage.Select(t => (object)new
             {
-                ["imageCount"] = images.Count,
-                ["rawResponse"] = analysisResult
-            });
+                imageId = t.ImageId,
+                triageLabel = t.Label,
+                confidence = t.Confidence,
+                scores = t.Scores
+            }).Concat(reused).ToList(),
+            overallAssessment = "On-device triage only; confirm with online analysis or a clinician"
+        };
+
+        var metadata = new Dictionary<string, object>
+        {
+            ["imageCount"] = images.Count,
+            ["source"] = DiagnosisSource.OnDeviceModel,
+            ["triage"] = triage
+        };
+        AddDeduplicationMetadata(metadata, reused, duplicates);
+
+        return new AgentResponse(
+            request.RequestId,
+            true,
+            findings,
+            new List<string> { string.Format(message, images.Count) },
+            metadata);
+    }
+
+    /// <summary>
+    /// The images to upload, in prompt order: the prepared JPEG when there is
+    /// one, otherwise the capture itself. Files are streamed, not buffered.
+    /// </summary>
+    private static IReadOnlyList<GeminiMedia> ToMedia(
+        IReadOnlyCollection<MedicalImage> images,
+        IReadOnlyList<PreparedImage>? prepared)
+    {
+        var preparedById = prepared?.ToDictionary(p => p.ImageId) ?? new Dictionary<Guid, PreparedImage>();
+        return images
+            .Select(image => preparedById.TryGetValue(image.Id, out var preparedImage)
+                ? preparedImage.ToGeminiMedia()
+                : GeminiMedia.FromFile(image.LocalFilePath, MimeTypeOf(image.LocalFilePath)))
+            .ToList();
+    }
+
+    private static string MimeTypeOf(string path) => Path.GetExtension(path).ToLowerInvariant() switch
+    {
+        ".png" => "image/png",
+        ".webp" => "image/webp",
+        ".heic" => "image/heic",
+        _ => "image/jpeg"
+    };
+
+    private static string FormatTriage(IReadOnlyList<ImageTriageResult>? triage)
+    {
+        if (triage == null || triage.Count == 0)
+            return "";
+
+        var lines = triage.Select(t => $"- Image {t.ImageId}: {t.Label} ({t.Confidence:P0})");
+        return $"ON-DEVICE PRE-SCREEN (coarse triage; verify, do not copy):\n{string.Join("\n", lines)}\n";
     }
 
-    private string BuildImageAnalysisPrompt(IReadOnlyCollection<MedicalImage> images)
+    private string BuildImageAnalysisPrompt(
+        IReadOnlyCollection<MedicalImage> images,
+        IReadOnlyList<ImageTriageResult>? triage = null)
     {
         return $@"
-You are an expert medical image analyst. Analyze the following {images.Count} medical images.
+You are an expert medical image analyst. Analyze the {images.Count} attached medical images.
 
 TASK:
 1. Identify all visible symptoms, lesions, or abnormalities
@@ -48,7 +374,9 @@ TASK:
 3. Identify any warning signs or red flags
 4. Suggest possible conditions (do NOT diagnose yet)
 
+{FormatTriage(triage)}
 For each image, provide:
+- Image id (use it as imageId; ids are listed in attachment order): {string.Join(", ", images.Select(i => i.Id))}
 - Image type: {string.Join(", ", images.Select(i => i.Type))}
 - Observed features
 - Clinical significance
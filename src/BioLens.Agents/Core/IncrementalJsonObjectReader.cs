@@ -0,0 +1,126 @@
+using System.Text;
+using System.Text.Json;
+
+namespace BioLens.Agents.Core;
+
+/// <summary>
+/// Parses a JSON object that arrives in chunks and hands out each top-level
+/// property as soon as its value is complete, long before the closing brace
+/// Text before the opening brace (e.g. a markdown fence or prose) is ignored;
+/// the object starts at the first brace outside a quoted string
+/// </summary>
+public sealed class IncrementalJsonObjectReader
+{
+    private readonly StringBuilder _buffer = new();
+    private int _position;
+    private int _depth;
+    private bool _inString;
+    private bool _escaped;
+    private bool _completed;
+    private int _keyStart = -1;
+    private string? _currentKey;
+    private int _valueStart = -1;
+
+    /// <summary>
+    /// Everything received so far
+    /// </summary>
+    public string Text => _buffer.ToString();
+
+    /// <summary>
+    /// True once the root object has been closed
+    /// </summary>
+    public bool IsCompleted => _completed;
+
+    /// <summary>
+    /// Appends a chunk and returns the top-level properties it completed
+    /// </summary>
+    public IReadOnlyList<KeyValuePair<string, JsonElement>> Append(string chunk)
+    {
+        _buffer.Append(chunk);
+        var completed = new List<KeyValuePair<string, JsonElement>>();
+
+        for (; _position < _buffer.Length && !_completed; _position++)
+        {
+            var c = _buffer[_position];
+
+            if (_inString)
+            {
+                if (_escaped)
+                {
+                    _escaped = false;
+                }
+                else if (c == '\\')
+                {
+                    _escaped = true;
+                }
+                else if (c == '"')
+                {
+                    _inString = false;
+                    if (_depth == 1 && _valueStart < 0 && _keyStart >= 0)
+                    {
+                        _currentKey = JsonSerializer.Deserialize<string>(
+                            _buffer.ToString(_keyStart, _position - _keyStart + 1));
+                        _keyStart = -1;
+                    }
+                }
+                else if (c == '\n' && _depth == 0)
+                {
+                    // JSON strings never span lines, so an open quote in the preamble was prose
+                    _inString = false;
+                }
+                continue;
+            }
+
+            switch (c)
+            {
+                case '"':
+                    _inString = true;
+                    if (_depth == 1 && _valueStart < 0)
+                    {
+                        _keyStart = _position;
+                    }
+                    break;
+                case ':' when _depth == 1 && _currentKey is not null:
+                    _valueStart = _position + 1;
+                    break;
+                case '{':
+                case '[' when _depth > 0:
+                    _depth++;
+                    break;
+                case ',' when _depth == 1:
+                    CompleteProperty(completed);
+                    break;
+                case '}' or ']' when _depth > 0:
+                    if (_depth == 1)
+                    {
+                        CompleteProperty(completed);
+                        _completed = true;
+                    }
+                    _depth--;
+                    break;
+            }
+        }
+
+        return completed;
+    }
+
+    private void CompleteProperty(List<KeyValuePair<string, JsonElement>> completed)
+    {
+        if (_currentKey is not null && _valueStart >= 0)
+        {
+            var raw = _buffer.ToString(_valueStart, _position - _valueStart);
+            try
+            {
+                using var document = JsonDocument.Parse(raw);
+                completed.Add(new(_currentKey, document.RootElement.Clone()));
+            }
+            catch (JsonException)
+            {
+                // Malformed value; the caller still sees it in the final parse
+            }
+        }
+
+        _currentKey = null;
+        _valueStart = -1;
+    }
+}
@@ -1,7 +1,9 @@
 using BioLens.Domain.Entities;
 using BioLens.Domain.ValueObjects;
 using BioLens.Domain.Enums;
+using BioLens.Infrastructure.AI;
 using Microsoft.SemanticKernel;
+using System.Diagnostics;
 using System.Text.Json;
 
 namespace BioLens.Agents.Core;
@@ -9,11 +11,15 @@ namespace BioLens.Agents.Core;
 /// <summary>
 /// Core reasoning agent that generates differential diagnoses
 /// Uses Chain-of-Thought reasoning
+/// Streams the model output and reports each top-level field through an
+/// optional "progress" parameter (IProgress&lt;PartialAgentResult&gt;) as soon as
+/// it is complete, so the primary diagnosis and urgency arrive before the
+/// differential list
 /// </summary>
 public class MedicalReasoningAgent : BioLensAgent
 {
-    public MedicalReasoningAgent(Kernel kernel)
-        : base(kernel, "MedicalReasoner", "Generates differential diagnoses using clinical reasoning")
+    public MedicalReasoningAgent(Kernel kernel, IGeminiAIService? gemini = null)
+        : base(kernel, "MedicalReasoner", "Generates differential diagnoses using clinical reasoning", gemini)
     {
     }
 
@@ -26,21 +32,52 @@ public class MedicalReasoningAgent : BioLensAgent
         var patient = (Patient)request.Parameters["patient"];
         var context = (ContextualInformation)request.Parameters["context"];
         
+        var progress = request.Parameters.GetValueOrDefault("progress") as IProgress<PartialAgentResult>;
+        
         var prompt = BuildDiagnosticPrompt(imageFindings, audioFindings, patient, context);
-        var diagnosisJson = await InvokePromptAsync(prompt, cancellationToken);
+        var messages = new List<string>();
+        var metadata = new Dictionary<string, object>
+        {
+            ["reasoningApproach"] = "Chain-of-Thought",
+            ["contextConsidered"] = true
+        };
+
+        var timer = Stopwatch.StartNew();
+        var reader = new IncrementalJsonObjectReader();
+        await foreach (var chunk in InvokePromptStreamingAsync(prompt, cancellationToken))
+        {
+            foreach (var (field, value) in reader.Append(chunk))
+            {
+                progress?.Report(new PartialAgentResult(request.RequestId, AgentName, field, value));
+                if (field == "primaryDiagnosis")
+                {
+                    metadata["timeToPrimaryDiagnosisMs"] = timer.Elapsed.TotalMilliseconds;
+                    messages.Add($"🩺 Primary diagnosis: {DescribeDiagnosis(value)}");
+                }
+            }
+        }
         
-        var diagnosis = ParseDiagnosis(diagnosisJson);
+        var diagnosis = ParseDiagnosis(reader.Text);
+        messages.Add("Differential diagnosis generated");
         
         return new AgentResponse(
             request.RequestId,
             true,
             diagnosis,
-            new List<string> { "Differential diagnosis generated" },
-            new Dictionary<string, object>
-            {
-                ["reasoningApproach"] = "Chain-of-Thought",
-                ["contextConsidered"] = true
-            });
+            messages,
+            metadata);
+    }
+
+    private static string DescribeDiagnosis(JsonElement diagnosis)
+    {
+        string? Field(string name) =>
+            diagnosis.ValueKind == JsonValueKind.Object
+            && diagnosis.TryGetProperty(name, out var value)
+            && value.ValueKind == JsonValueKind.String
+                ? value.GetString()
+                : null;
+
+        return $"{Field("conditionName") ?? "Unknown condition"} (urgency: {Field("urgency") ?? "unknown"})";
     }
 
     private string BuildDiagnosticPrompt(
@@ -1,4 +1,5 @@
 using BioLens.Domain.ValueObjects;
+using BioLens.Infrastructure.AI;
 using Microsoft.SemanticKernel;
 using System.Text.Json;
 
@@ -9,8 +10,8 @@ namespace BioLens.Agents.Core;
 /// </summary>
 public class TreatmentPlannerAgent : BioLensAgent
 {
-    public TreatmentPlannerAgent(Kernel kernel)
-        : base(kernel, "TreatmentPlanner", "Creates resource-aware treatment protocols")
+    public TreatmentPlannerAgent(Kernel kernel, IGeminiAIService? gemini = null)
+        : base(kernel, "TreatmentPlanner", "Creates resource-aware treatment protocols", gemini)
     {
     }
 
@@ -22,9 +23,9 @@ public class TreatmentPlannerAgent : BioLensAgent
         var context = (ContextualInformation)request.Parameters["context"];
         
         var prompt = BuildTreatmentPrompt(diagnosis, context);
-        var treatmentJson = await InvokePromptAsync(prompt, cancellationToken);
+        var treatmentResult = await InvokePromptAsync(prompt, cancellationToken);
         
-        var treatment = ParseTreatment(treatmentJson);
+        var treatment = ParseTreatment(treatmentResult.Text);
         
         return new AgentResponse(
             request.RequestId,
@@ -34,7 +35,8 @@ public class TreatmentPlannerAgent : BioLensAgent
             new Dictionary<string, object>
             {
                 ["availableMedications"] = context.AvailableMedications.Count,
-                ["facilityLevel"] = context.FacilityLevel.ToString()
+                ["facilityLevel"] = context.FacilityLevel.ToString(),
+                ["source"] = treatmentResult.Source
             });
     }
 
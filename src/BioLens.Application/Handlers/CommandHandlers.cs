@@ -66,18 +66,28 @@ public class RequestDiagnosisHandler : IRequestHandler<RequestDiagnosisCommand,
         var diagnosticCase = await _repository.GetByIdAsync(request.CaseId, cancellationToken)
             ?? throw new KeyNotFoundException($"Case {request.CaseId} not found");
 
-        diagnosticCase.StartDiagnosis();
+        await _repository.StartDiagnosisAsync(diagnosticCase, cancellationToken);
 
         var agentRequest = new AgentRequest(
             Guid.NewGuid().ToString(),
             "RunDiagnosis",
-            new Dictionary<string, object> { ["case"] = diagnosticCase },
+            new Dictionary<string, object> { ["case"] = diagnosticCase, ["mode"] = request.Mode },
             new AgentContext(diagnosticCase.Id, new Dictionary<string, object>()));
 
-        var agentResponse = await _coordinatorAgent.ExecuteAsync(agentRequest, cancellationToken);
+        AgentResponse agentResponse;
+        try
+        {
+            agentResponse = await _coordinatorAgent.ExecuteAsync(agentRequest, cancellationToken);
 
-        if (!agentResponse.IsSuccess)
-            throw new InvalidOperationException("Diagnosis failed: " + string.Join(", ", agentResponse.Messages));
+            if (!agentResponse.IsSuccess)
+                throw new InvalidOperationException("Diagnosis failed: " + string.Join(", ", agentResponse.Messages));
+        }
+        catch
+        {
+            // Otherwise the case stays InProgress and can never be diagnosed again
+            await _repository.AbandonDiagnosisAsync(diagnosticCase, CancellationToken.None);
+            throw;
+        }
 
         dynamic result = agentResponse.Result!;
         
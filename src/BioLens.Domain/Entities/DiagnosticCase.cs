@@ -7,8 +7,9 @@ namespace BioLens.Domain.Entities;
 
 public class DiagnosticCase : AggregateRoot
 {
-    private readonly List<MedicalImage> _images = [];
-    private readonly List<DifferentialDiagnosis> _alternativeDiagnoses = [];
+    // Not readonly: EF Core materializes these from JSON columns
+    private List<MedicalImage> _images = [];
+    private List<DifferentialDiagnosis> _alternativeDiagnoses = [];
 
     private DiagnosticCase() { } // EF Core
 
@@ -85,6 +86,12 @@ public class DiagnosticCase : AggregateRoot
         Status = CaseStatus.InProgress;
     }
 
+    public void AbandonDiagnosis()
+    {
+        if (Status == CaseStatus.InProgress)
+            Status = CaseStatus.Created;
+    }
+
     public void MarkAsSynced()
     {
         IsSyncedToCloud = true;
@@ -6,8 +6,9 @@ namespace BioLens.Domain.Entities;
 
 public class Patient : Entity
 {
-    private readonly List<KnownCondition> _medicalHistory = [];
-    private readonly List<Allergy> _knownAllergies = [];
+    // Not readonly: EF Core materializes these from JSON columns
+    private List<KnownCondition> _medicalHistory = [];
+    private List<Allergy> _knownAllergies = [];
 
     private Patient() { } // EF Core
 
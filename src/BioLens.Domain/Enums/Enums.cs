@@ -73,5 +73,6 @@ public enum DiagnosisSource
 {
     GeminiAI,
     OfflineCache,
-    HumanExpert
+    HumanExpert,
+    OnDeviceModel
 }
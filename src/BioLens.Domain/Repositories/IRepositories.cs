@@ -1,4 +1,5 @@
 using BioLens.Domain.Entities;
+using BioLens.Domain.Enums;
 
 namespace BioLens.Domain.Repositories;
 
@@ -7,9 +8,44 @@ public interface IDiagnosticCaseRepository
     Task<DiagnosticCase?> GetByIdAsync(Guid id, CancellationToken cancellationToken = default);
     Task<Guid> AddAsync(DiagnosticCase diagnosticCase, CancellationToken cancellationToken = default);
     Task UpdateAsync(DiagnosticCase diagnosticCase, CancellationToken cancellationToken = default);
-    Task<List<DiagnosticCase>> GetUnsyncedAsync(CancellationToken cancellationToken = default);
+
+    /// <summary>
+    /// Applies StartDiagnosis and persists just the status change
+    /// </summary>
+    Task StartDiagnosisAsync(DiagnosticCase diagnosticCase, CancellationToken cancellationToken = default);
+
+    /// <summary>
+    /// Applies AbandonDiagnosis and persists just the status change
+    /// </summary>
+    Task AbandonDiagnosisAsync(DiagnosticCase diagnosticCase, CancellationToken cancellationToken = default);
+
+    /// <summary>
+    /// Flags uploaded cases as synced without loading them
+    /// </summary>
+    Task<int> MarkSyncedAsync(IReadOnlyCollection<Guid> caseIds, CancellationToken cancellationToken = default);
+
+    /// <summary>
+    /// Streams unsynced cases oldest first, one page at a time, without tracking them
+    /// </summary>
+    IAsyncEnumerable<DiagnosticCase> GetUnsyncedAsync(int pageSize = 50, CancellationToken cancellationToken = default);
+
+    /// <summary>
+    /// Read-only list view of a health worker's most recent cases
+    /// </summary>
+    Task<List<DiagnosticCaseSummary>> GetSummariesByHealthcareWorkerAsync(
+        Guid healthcareWorkerId,
+        int take = 50,
+        CancellationToken cancellationToken = default);
 }
 
+public record DiagnosticCaseSummary(
+    Guid Id,
+    string PatientAnonymizedId,
+    CaseStatus Status,
+    DateTimeOffset CreatedAt,
+    DateTimeOffset? CompletedAt,
+    bool IsSyncedToCloud);
+
 public interface IPatientRepository
 {
     Task<Patient?> GetByAnonymizedIdAsync(string anonymizedId, CancellationToken cancellationToken = default);
@@ -9,7 +9,8 @@ public record MedicalImage(
     string? CloudBlobUrl,
     ImageType Type,
     ImageMetadata Metadata,
-    DateTimeOffset CapturedAt);
+    DateTimeOffset CapturedAt,
+    ulong? PerceptualHash = null);
 
 public record ImageMetadata(
     int Width,
@@ -0,0 +1,436 @@
+using System.Buffers;
+using System.Buffers.Binary;
+using System.Runtime.CompilerServices;
+using System.Security.Cryptography;
+using System.Text;
+using BioLens.Domain.Enums;
+using LiteDB;
+using Microsoft.Extensions.DependencyInjection;
+using Microsoft.Extensions.Options;
+
+namespace BioLens.Infrastructure.AI;
+
+/// <summary>
+/// Serves repeated Gemini requests from a content-addressed cache
+/// Identical prompt, media and generation config always hash to the same key,
+/// so re-runs and retries never pay for a second model call
+/// </summary>
+public class CachedGeminiAIService : IGeminiAIService
+{
+    private readonly GeminiAIService _inner;
+    private readonly GeminiResponseCache _cache;
+
+    public CachedGeminiAIService(GeminiAIService inner, GeminiResponseCache cache)
+    {
+        _inner = inner;
+        _cache = cache;
+    }
+
+    public async Task<string> GenerateContentAsync(
+        string prompt,
+        IReadOnlyList<GeminiMedia>? media = null,
+        CancellationToken cancellationToken = default)
+    {
+        var result = await GenerateAsync(prompt, media, cancellationToken);
+        return result.Text;
+    }
+
+    public async Task<GeminiResult> GenerateAsync(
+        string prompt,
+        IReadOnlyList<GeminiMedia>? media = null,
+        CancellationToken cancellationToken = default)
+    {
+        var key = await GeminiResponseCache.ComputeKeyAsync(
+            GeminiAIService.GenerationConfig, prompt, media, cancellationToken);
+        return await GenerateAsync(key, prompt, media, cancellationToken);
+    }
+
+    /// <summary>
+    /// Same as GenerateAsync, for callers that already computed the cache key
+    /// (null when the media cannot be replayed), so media is hashed only once
+    /// </summary>
+    public async Task<GeminiResult> GenerateAsync(
+        string? key,
+        string prompt,
+        IReadOnlyList<GeminiMedia>? media,
+        CancellationToken cancellationToken)
+    {
+        if (key is not null && _cache.TryGet(key, out var cached))
+        {
+            return new GeminiResult(cached, DiagnosisSource.OfflineCache);
+        }
+
+        var result = await _inner.GenerateAsync(prompt, media, cancellationToken);
+
+        // Empty text means the model returned nothing usable; never pin that in the cache
+        if (key is not null && !string.IsNullOrEmpty(result.Text))
+        {
+            _cache.Set(key, result.Text);
+        }
+
+        return result;
+    }
+
+    public async IAsyncEnumerable<string> StreamContentAsync(
+        string prompt,
+        IReadOnlyList<GeminiMedia>? media = null,
+        [EnumeratorCancellation] CancellationToken cancellationToken = default)
+    {
+        var key = await GeminiResponseCache.ComputeKeyAsync(
+            GeminiAIService.GenerationConfig, prompt, media, cancellationToken);
+        if (key is not null && _cache.TryGet(key, out var cached))
+        {
+            yield return cached;
+            yield break;
+        }
+
+        // Only a stream that ran to completion is cached
+        var text = new StringBuilder();
+        await foreach (var chunk in _inner.StreamContentAsync(prompt, media, cancellationToken))
+        {
+            text.Append(chunk);
+            yield return chunk;
+        }
+
+        if (key is not null && text.Length > 0)
+        {
+            _cache.Set(key, text.ToString());
+        }
+    }
+}
+
+/// <summary>
+/// Two-tier response cache: a size-bounded in-memory LRU in front of a
+/// LiteDB store that survives restarts and serves cases while offline
+/// </summary>
+public sealed class GeminiResponseCache : IDisposable
+{
+    private const string CollectionName = "gemini_responses";
+    private const int HashChunkSize = 64 * 1024;
+
+    private readonly GeminiCacheOptions _options;
+    private readonly LiteDatabase? _database;
+    private readonly ILiteCollection<CachedResponse>? _responses;
+
+    private readonly object _memoryLock = new();
+    private readonly Dictionary<string, LinkedListNode<MemoryEntry>> _memoryIndex = new();
+    private readonly LinkedList<MemoryEntry> _memoryLru = new();
+    private long _memoryBytes;
+
+    private readonly object _storeLock = new();
+    private long _storeBytes;
+
+    public GeminiResponseCache(IOptions<GeminiCacheOptions> options)
+    {
+        _options = options.Value;
+        if (!_options.Enabled || string.IsNullOrEmpty(_options.DatabasePath))
+        {
+            return;
+        }
+
+        _database = new LiteDatabase(_options.DatabasePath);
+        _responses = _database.GetCollection<CachedResponse>(CollectionName);
+        _responses.EnsureIndex(r => r.LastAccessedAt);
+
+        lock (_storeLock)
+        {
+            var cutoff = DateTime.UtcNow - TimeToLive;
+            _responses.DeleteMany(r => r.CreatedAt < cutoff);
+
+            // Project the size only; the response bodies are never deserialized
+            _storeBytes = _responses.Query()
+                .Select(r => r.SizeBytes)
+                .ToEnumerable()
+                .Sum(size => (long)size);
+        }
+    }
+
+    private TimeSpan TimeToLive => TimeSpan.FromHours(_options.ExpirationHours);
+    private long MemoryLimitBytes => _options.MemoryCacheSizeMb * 1024L * 1024L;
+    private long StoreLimitBytes => _options.StoreSizeMb * 1024L * 1024L;
+
+    /// <summary>
+    /// Hashes everything that influences the model output into a hex key
+    /// Each field is length-prefixed so concatenations cannot collide; media
+    /// is streamed through the hash in pooled chunks and contributes its own
+    /// digest. Returns null when a media stream cannot be read twice.
+    /// </summary>
+    public static async Task<string?> ComputeKeyAsync(
+        GeminiGenerationConfig config,
+        string prompt,
+        IReadOnlyList<GeminiMedia>? media,
+        CancellationToken cancellationToken = default)
+    {
+        if (media is not null && media.Any(m => !m.CanReplay))
+        {
+            return null;
+        }
+
+        using var hash = IncrementalHash.CreateHash(HashAlgorithmName.SHA256);
+        AppendField(hash, Encoding.UTF8.GetBytes(config.ToString()));
+        AppendField(hash, Encoding.UTF8.GetBytes(prompt));
+
+        AppendLength(hash, media?.Count ?? 0);
+        if (media is null)
+        {
+            return Convert.ToHexString(hash.GetHashAndReset());
+        }
+
+        var buffer = ArrayPool<byte>.Shared.Rent(HashChunkSize);
+        try
+        {
+            foreach (var item in media)
+            {
+                AppendField(hash, Encoding.UTF8.GetBytes(item.MimeType));
+                AppendField(hash, await HashMediaAsync(item, buffer, cancellationToken));
+            }
+        }
+        finally
+        {
+            ArrayPool<byte>.Shared.Return(buffer);
+        }
+
+        return Convert.ToHexString(hash.GetHashAndReset());
+    }
+
+    public bool TryGet(string key, out string text)
+    {
+        text = "";
+        if (!_options.Enabled)
+        {
+            return false;
+        }
+
+        lock (_memoryLock)
+        {
+            if (_memoryIndex.TryGetValue(key, out var node))
+            {
+                if (node.Value.CreatedAt >= DateTime.UtcNow - TimeToLive)
+                {
+                    _memoryLru.Remove(node);
+                    _memoryLru.AddFirst(node);
+                    text = node.Value.Text;
+                    return true;
+                }
+                RemoveFromMemory(node);
+            }
+        }
+
+        if (_responses is null)
+        {
+            return false;
+        }
+
+        CachedResponse? stored;
+        lock (_storeLock)
+        {
+            stored = _responses.FindById(key);
+            if (stored is null)
+            {
+                return false;
+            }
+            if (stored.CreatedAt < DateTime.UtcNow - TimeToLive)
+            {
+                _responses.Delete(key);
+                _storeBytes -= stored.SizeBytes;
+                return false;
+            }
+            stored.LastAccessedAt = DateTime.UtcNow;
+            _responses.Update(stored);
+        }
+
+        // Promote to the memory tier so the next hit skips the database
+        AddToMemory(key, stored.Text, stored.CreatedAt);
+        text = stored.Text;
+        return true;
+    }
+
+    public void Set(string key, string text)
+    {
+        if (!_options.Enabled)
+        {
+            return;
+        }
+
+        var now = DateTime.UtcNow;
+        AddToMemory(key, text, now);
+
+        if (_responses is null)
+        {
+            return;
+        }
+
+        var entry = new CachedResponse
+        {
+            Id = key,
+            Text = text,
+            SizeBytes = Encoding.UTF8.GetByteCount(text),
+            CreatedAt = now,
+            LastAccessedAt = now
+        };
+
+        lock (_storeLock)
+        {
+            _storeBytes -= _responses.Query()
+                .Where(r => r.Id == key)
+                .Select(r => r.SizeBytes)
+                .FirstOrDefault();
+            _responses.Upsert(entry);
+            _storeBytes += entry.SizeBytes;
+            EvictFromStore();
+        }
+    }
+
+    public void Dispose() => _database?.Dispose();
+
+    private void AddToMemory(string key, string text, DateTime createdAt)
+    {
+        var size = (long)text.Length * sizeof(char);
+        if (size > MemoryLimitBytes)
+        {
+            return;
+        }
+
+        lock (_memoryLock)
+        {
+            if (_memoryIndex.TryGetValue(key, out var existing))
+            {
+                RemoveFromMemory(existing);
+            }
+
+            var node = _memoryLru.AddFirst(new MemoryEntry(key, text, size, createdAt));
+            _memoryIndex[key] = node;
+            _memoryBytes += size;
+
+            while (_memoryBytes > MemoryLimitBytes && _memoryLru.Last is { } oldest)
+            {
+                RemoveFromMemory(oldest);
+            }
+        }
+    }
+
+    private void RemoveFromMemory(LinkedListNode<MemoryEntry> node)
+    {
+        _memoryLru.Remove(node);
+        _memoryIndex.Remove(node.Value.Key);
+        _memoryBytes -= node.Value.SizeBytes;
+    }
+
+    /// <summary>
+    /// Drops expired entries, then the least recently used ones until the
+    /// store is back under its size limit. Only ids, sizes and access times
+    /// are read, never the response bodies. Caller holds the store lock.
+    /// </summary>
+    private void EvictFromStore()
+    {
+        if (_storeBytes <= StoreLimitBytes)
+        {
+            return;
+        }
+
+        var cutoff = DateTime.UtcNow - TimeToLive;
+        _storeBytes -= _responses!.Query()
+            .Where(r => r.CreatedAt < cutoff)
+            .Select(r => r.SizeBytes)
+            .ToEnumerable()
+            .Sum(size => (long)size);
+        _responses.DeleteMany(r => r.CreatedAt < cutoff);
+
+        // The cursor is lazy, so only as many entries are read as are evicted
+        var victims = new List<string>();
+        foreach (var entry in _responses.Query()
+                     .OrderBy(r => r.LastAccessedAt)
+                     .Select(r => new { r.Id, r.SizeBytes })
+                     .ToEnumerable())
+        {
+            if (_storeBytes <= StoreLimitBytes)
+            {
+                break;
+            }
+            victims.Add(entry.Id);
+            _storeBytes -= entry.SizeBytes;
+        }
+
+        foreach (var id in victims)
+        {
+            _responses.Delete(id);
+        }
+    }
+
+    private static async Task<byte[]> HashMediaAsync(
+        GeminiMedia media,
+        byte[] buffer,
+        CancellationToken cancellationToken)
+    {
+        using var hash = IncrementalHash.CreateHash(HashAlgorithmName.SHA256);
+        var source = media.OpenRead();
+        try
+        {
+            int read;
+            while ((read = await source.ReadAsync(buffer, cancellationToken)) > 0)
+            {
+                hash.AppendData(buffer, 0, read);
+            }
+        }
+        finally
+        {
+            if (media.OwnsStream)
+            {
+                await source.DisposeAsync();
+            }
+        }
+
+        return hash.GetHashAndReset();
+    }
+
+    private static void AppendField(IncrementalHash hash, ReadOnlySpan<byte> data)
+    {
+        AppendLength(hash, data.Length);
+        hash.AppendData(data);
+    }
+
+    private static void AppendLength(IncrementalHash hash, int length)
+    {
+        Span<byte> prefix = stackalloc byte[sizeof(int)];
+        BinaryPrimitives.WriteInt32LittleEndian(prefix, length);
+        hash.AppendData(prefix);
+    }
+
+    private sealed record MemoryEntry(string Key, string Text, long SizeBytes, DateTime CreatedAt);
+}
+
+public class CachedResponse
+{
+    public string Id { get; set; } = "";
+    public string Text { get; set; } = "";
+    public int SizeBytes { get; set; }
+    public DateTime CreatedAt { get; set; }
+    public DateTime LastAccessedAt { get; set; }
+}
+
+/// <summary>
+/// Bound to the Gemini:Cache configuration section
+/// </summary>
+public class GeminiCacheOptions
+{
+    public bool Enabled { get; set; } = true;
+    public int MemoryCacheSizeMb { get; set; } = 16;
+    public int StoreSizeMb { get; set; } = 100;
+    public int ExpirationHours { get; set; } = 168;
+    public string DatabasePath { get; set; } = "biolens-cache.db";
+}
+
+public static class GeminiCacheServiceCollectionExtensions
+{
+    /// <summary>
+    /// Registers the Gemini client behind the response cache
+    /// </summary>
+    public static IServiceCollection AddCachedGeminiAIService(this IServiceCollection services)
+    {
+        services.AddGeminiHttpClient();
+        services.AddSingleton<GeminiResponseCache>();
+        services.AddTransient<CachedGeminiAIService>();
+        services.AddTransient<IGeminiAIService, CachedGeminiAIService>();
+        return services;
+    }
+}
@@ -1,7 +1,12 @@
+using System.Diagnostics;
+using System.Net;
 using System.Net.Http.Json;
+using System.Runtime.CompilerServices;
 using System.Text.Json;
+using BioLens.Domain.Enums;
 using Microsoft.Extensions.Options;
 using Microsoft.Extensions.Logging;
+using Polly;
 
 namespace BioLens.Infrastructure.AI;
 
@@ -9,48 +14,79 @@ public interface IGeminiAIService
 {
     Task<string> GenerateContentAsync(
         string prompt,
-        List<byte[]>? images = null,
-        byte[]? audio = null,
+        IReadOnlyList<GeminiMedia>? media = null,
+        CancellationToken cancellationToken = default);
+
+    /// <summary>
+    /// Generates content and reports where the answer came from
+    /// </summary>
+    Task<GeminiResult> GenerateAsync(
+        string prompt,
+        IReadOnlyList<GeminiMedia>? media = null,
+        CancellationToken cancellationToken = default);
+
+    /// <summary>
+    /// Streams generated text as the model produces it
+    /// </summary>
+    IAsyncEnumerable<string> StreamContentAsync(
+        string prompt,
+        IReadOnlyList<GeminiMedia>? media = null,
         CancellationToken cancellationToken = default);
 }
 
 public class GeminiAIService : IGeminiAIService
 {
+    public static readonly GeminiGenerationConfig GenerationConfig = new(
+        Model: "gemini-3-pro",
+        Temperature: 0.2,
+        TopP: 0.95,
+        TopK: 40,
+        MaxOutputTokens: 4096,
+        ResponseMimeType: "application/json");
+
     private readonly HttpClient _httpClient;
     private readonly ILogger<GeminiAIService> _logger;
     private readonly GeminiConfiguration _config;
+    private readonly GeminiResilience _resilience;
 
     public GeminiAIService(
         HttpClient httpClient,
         ILogger<GeminiAIService> logger,
-        IOptions<GeminiConfiguration> config)
+        IOptions<GeminiConfiguration> config,
+        GeminiResilience resilience)
     {
         _httpClient = httpClient;
         _logger = logger;
         _config = config.Value;
+        _resilience = resilience;
     }
 
     public async Task<string> GenerateContentAsync(
         string prompt,
-        List<byte[]>? images = null,
-        byte[]? audio = null,
+        IReadOnlyList<GeminiMedia>? media = null,
+        CancellationToken cancellationToken = default)
+    {
+        var result = await GenerateAsync(prompt, media, cancellationToken);
+        return result.Text;
+    }
+
+    public async Task<GeminiResult> GenerateAsync(
+        string prompt,
+        IReadOnlyList<GeminiMedia>? media = null,
         CancellationToken cancellationToken = default)
     {
         try
         {
-            var request = BuildRequest(prompt, images, audio);
-            
-            var response = await _httpClient.PostAsJsonAsync(
-                $"https://generativelanguage.googleapis.com/v1beta/models/gemini-3-pro:generateContent?key={_config.ApiKey}",
-                request,
-                cancellationToken);
+            using var response = await SendAsync(
+                "generateContent", prompt, media, HttpCompletionOption.ResponseContentRead, cancellationToken);
 
             response.EnsureSuccessStatusCode();
 
             var result = await response.Content.ReadFromJsonAsync<GeminiResponse>(
                 cancellationToken: cancellationToken);
 
-            return result?.Candidates?.FirstOrDefault()?.Content?.Parts?.FirstOrDefault()?.Text ?? "";
+            var text = result?.Candidates?.FirstOrDefault()?.Content?.Parts?.FirstOrDefault()?.Text ?? "";
+            return new GeminiResult(text, DiagnosisSource.GeminiAI);
         }
         catch (Exception ex)
         {
@@ -59,50 +95,98 @@ public class GeminiAIService : IGeminiAIService
         }
     }
 
-    private object BuildRequest(string prompt, List<byte[]>? images, byte[]? audio)
+    public async IAsyncEnumerable<string> StreamContentAsync(
+        string prompt,
+        IReadOnlyList<GeminiMedia>? media = null,
+        [EnumeratorCancellation] CancellationToken cancellationToken = default)
     {
-        var parts = new List<object> { new { text = prompt } };
+        // Read headers only so chunks are handed out as soon as they arrive
+        using var response = await SendAsync(
+            "streamGenerateContent", prompt, media, HttpCompletionOption.ResponseHeadersRead, cancellationToken);
 
-        if (images != null)
+        if (!response.IsSuccessStatusCode)
         {
-            parts.AddRange(images.Select(img => new
+            _logger.LogError("Gemini streaming call failed with {StatusCode}", response.StatusCode);
+            response.EnsureSuccessStatusCode();
+        }
+
+        await using var body = await response.Content.ReadAsStreamAsync(cancellationToken);
+        using var reader = new StreamReader(body);
+
+        // Server-sent events: every "data:" line carries one GeminiResponse chunk
+        while (await reader.ReadLineAsync(cancellationToken) is { } line)
+        {
+            if (!line.StartsWith("data:", StringComparison.Ordinal))
             {
-                inline_data = new
-                {
-                    mime_type = "image/jpeg",
-                    data = Convert.ToBase64String(img)
-                }
-            }));
+                continue;
+            }
+
+            var chunk = JsonSerializer.Deserialize<GeminiResponse>(line.AsSpan(5).Trim(), JsonOptions);
+            var text = chunk?.Candidates?.FirstOrDefault()?.Content?.Parts?.FirstOrDefault()?.Text;
+            if (!string.IsNullOrEmpty(text))
+            {
+                yield return text;
+            }
         }
+    }
+
+    /// <summary>
+    /// Sends one logical call through the resilience pipeline, building a
+    /// fresh request for every retry or hedged attempt and logging its latency
+    /// </summary>
+    private async Task<HttpResponseMessage> SendAsync(
+        string method,
+        string prompt,
+        IReadOnlyList<GeminiMedia>? media,
+        HttpCompletionOption completionOption,
+        CancellationToken cancellationToken)
+    {
+        var query = method == "streamGenerateContent" ? "alt=sse&" : "";
+        var url = $"{_config.BaseUrl.TrimEnd('/')}/v1beta/models/{GenerationConfig.Model}:{method}?{query}key={_config.ApiKey}";
 
-        if (audio != null)
+        var context = ResilienceContextPool.Shared.Get(cancellationToken);
+        context.Properties.Set(GeminiResilience.CanRetryKey, media?.All(m => m.CanReplay) ?? true);
+        context.Properties.Set(GeminiResilience.CanHedgeKey, media?.All(m => m.CanReadConcurrently) ?? true);
+
+        var attempts = 0;
+        try
         {
-            parts.Add(new
+            return await _resilience.Pipeline.ExecuteAsync(async attemptContext =>
             {
-                inline_data = new
+                var attempt = Interlocked.Increment(ref attempts);
+                var timer = Stopwatch.StartNew();
+
+                using var request = new HttpRequestMessage(HttpMethod.Post, url)
+                {
+                    Content = new GeminiRequestContent(prompt, media, GenerationConfig),
+                    Version = HttpVersion.Version20,
+                    VersionPolicy = HttpVersionPolicy.RequestVersionOrLower
+                };
+
+                try
                 {
-                    mime_type = "audio/wav",
-                    data = Convert.ToBase64String(audio)
+                    var response = await _httpClient.SendAsync(request, completionOption, attemptContext.CancellationToken);
+                    _logger.LogInformation(
+                        "Gemini {Method} attempt {Attempt} returned {StatusCode} in {ElapsedMs:F0} ms",
+                        method, attempt, (int)response.StatusCode, timer.Elapsed.TotalMilliseconds);
+                    return response;
                 }
-            });
+                catch (Exception ex)
+                {
+                    _logger.LogWarning(
+                        "Gemini {Method} attempt {Attempt} failed with {Error} after {ElapsedMs:F0} ms",
+                        method, attempt, ex.GetType().Name, timer.Elapsed.TotalMilliseconds);
+                    throw;
+                }
+            }, context);
         }
-
-        return new
+        finally
         {
-            contents = new[]
-            {
-                new { role = "user", parts }
-            },
-            generationConfig = new
-            {
-                temperature = 0.2,
-                topP = 0.95,
-                topK = 40,
-                maxOutputTokens = 4096,
-                responseMimeType = "application/json"
-            }
-        };
+            ResilienceContextPool.Shared.Return(context);
+        }
     }
+
+    private static readonly JsonSerializerOptions JsonOptions = new(JsonSerializerDefaults.Web);
 }
 
 public class GeminiConfiguration
@@ -111,6 +195,19 @@ public class GeminiConfiguration
     public string BaseUrl { get; set; } = "https://generativelanguage.googleapis.com";
 }
 
+public record GeminiGenerationConfig(
+    string Model,
+    double Temperature,
+    double TopP,
+    int TopK,
+    int MaxOutputTokens,
+    string ResponseMimeType);
+
+/// <summary>
+/// Generated text and where it came from (live model call or offline cache)
+/// </summary>
+public record GeminiResult(string Text, DiagnosisSource Source);
+
 public record GeminiResponse(Candidate[]? Candidates);
 public record Candidate(Content? Content);
 public record Content(Part[]? Parts);
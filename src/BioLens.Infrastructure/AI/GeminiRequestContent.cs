@@ -0,0 +1,193 @@
+using System.Buffers;
+using System.Buffers.Text;
+using System.Net;
+using System.Text.Json;
+
+namespace BioLens.Infrastructure.AI;
+
+/// <summary>
+/// An image or audio attachment for a Gemini request, read from a file or a
+/// caller-owned stream only while the request body is being sent
+/// </summary>
+public sealed class GeminiMedia
+{
+    private readonly string? _path;
+    private readonly Stream? _stream;
+    private readonly long _start;
+
+    private GeminiMedia(string mimeType, string? path, Stream? stream)
+    {
+        MimeType = mimeType;
+        _path = path;
+        _stream = stream;
+        _start = stream is { CanSeek: true } ? stream.Position : 0;
+    }
+
+    public string MimeType { get; }
+
+    /// <summary>
+    /// True when the content can be read more than once (hashing, retries)
+    /// </summary>
+    public bool CanReplay => _path is not null || _stream!.CanSeek;
+
+    public static GeminiMedia FromFile(string path, string mimeType = "image/jpeg") =>
+        new(mimeType, path, null);
+
+    /// <summary>
+    /// Wraps a stream the caller keeps ownership of; seekable streams are
+    /// rewound to their current position before every read
+    /// </summary>
+    public static GeminiMedia FromStream(Stream stream, string mimeType = "image/jpeg") =>
+        new(mimeType, null, stream);
+
+    public static GeminiMedia FromBytes(byte[] data, string mimeType = "image/jpeg") =>
+        FromStream(new MemoryStream(data, writable: false), mimeType);
+
+    /// <summary>
+    /// Opens the content for reading; dispose the result only when OwnsStream is true
+    /// </summary>
+    internal Stream OpenRead()
+    {
+        if (_path is not null)
+        {
+            // Unbuffered: reads go straight into the pooled encoding buffer
+            return new FileStream(_path, FileMode.Open, FileAccess.Read, FileShare.Read,
+                bufferSize: 0, FileOptions.Asynchronous | FileOptions.SequentialScan);
+        }
+
+        if (_stream!.CanSeek)
+        {
+            _stream.Position = _start;
+        }
+        return _stream;
+    }
+
+    internal bool OwnsStream => _path is not null;
+
+    /// <summary>
+    /// Files are reopened per read, so hedged attempts can upload them in parallel
+    /// </summary>
+    internal bool CanReadConcurrently => _path is not null;
+}
+
+/// <summary>
+/// Request body for generateContent that writes the JSON envelope and
+/// base64-encodes media straight from its source into the request stream
+/// Peak memory is two pooled buffers regardless of how large the media is
+/// </summary>
+public sealed class GeminiRequestContent : HttpContent
+{
+    // Multiple of 3 so every chunk except the last encodes without padding
+    private const int ChunkSize = 3 * 16 * 1024;
+
+    private static readonly byte[] ContentsStart = "{\"contents\":[{\"role\":\"user\",\"parts\":[{\"text\":"u8.ToArray();
+    private static readonly byte[] MediaStart = "},{\"inline_data\":{\"mime_type\":"u8.ToArray();
+    private static readonly byte[] DataStart = ",\"data\":\""u8.ToArray();
+    private static readonly byte[] DataEnd = "\"}"u8.ToArray();
+    private static readonly byte[] GenerationConfigStart = "}]}],\"generationConfig\":"u8.ToArray();
+    private static readonly byte[] EnvelopeEnd = "}"u8.ToArray();
+
+    private readonly string _prompt;
+    private readonly IReadOnlyList<GeminiMedia> _media;
+    private readonly GeminiGenerationConfig _config;
+
+    public GeminiRequestContent(string prompt, IReadOnlyList<GeminiMedia>? media, GeminiGenerationConfig config)
+    {
+        _prompt = prompt;
+        _media = media ?? [];
+        _config = config;
+        Headers.ContentType = new("application/json") { CharSet = "utf-8" };
+    }
+
+    protected override Task SerializeToStreamAsync(Stream stream, TransportContext? context) =>
+        SerializeToStreamAsync(stream, context, CancellationToken.None);
+
+    protected override async Task SerializeToStreamAsync(
+        Stream stream,
+        TransportContext? context,
+        CancellationToken cancellationToken)
+    {
+        await stream.WriteAsync(ContentsStart, cancellationToken);
+        await stream.WriteAsync(JsonSerializer.SerializeToUtf8Bytes(_prompt), cancellationToken);
+
+        if (_media.Count > 0)
+        {
+            var input = ArrayPool<byte>.Shared.Rent(ChunkSize);
+            var output = ArrayPool<byte>.Shared.Rent(Base64.GetMaxEncodedToUtf8Length(ChunkSize));
+            try
+            {
+                foreach (var media in _media)
+                {
+                    await stream.WriteAsync(MediaStart, cancellationToken);
+                    await stream.WriteAsync(JsonSerializer.SerializeToUtf8Bytes(media.MimeType), cancellationToken);
+                    await stream.WriteAsync(DataStart, cancellationToken);
+                    await WriteBase64Async(media, stream, input, output, cancellationToken);
+                    await stream.WriteAsync(DataEnd, cancellationToken);
+                }
+            }
+            finally
+            {
+                ArrayPool<byte>.Shared.Return(input);
+                ArrayPool<byte>.Shared.Return(output);
+            }
+        }
+
+        await stream.WriteAsync(GenerationConfigStart, cancellationToken);
+        await stream.WriteAsync(JsonSerializer.SerializeToUtf8Bytes(new
+        {
+            temperature = _config.Temperature,
+            topP = _config.TopP,
+            topK = _config.TopK,
+            maxOutputTokens = _config.MaxOutputTokens,
+            responseMimeType = _config.ResponseMimeType
+        }), cancellationToken);
+        await stream.WriteAsync(EnvelopeEnd, cancellationToken);
+    }
+
+    protected override bool TryComputeLength(out long length)
+    {
+        // Sent chunked; computing the length would mean reading every file twice
+        length = 0;
+        return false;
+    }
+
+    private static async Task WriteBase64Async(
+        GeminiMedia media,
+        Stream destination,
+        byte[] input,
+        byte[] output,
+        CancellationToken cancellationToken)
+    {
+        var source = media.OpenRead();
+        try
+        {
+            while (true)
+            {
+                // Fill the whole chunk so only the final block can need padding
+                var filled = 0;
+                int read;
+                while (filled < ChunkSize
+                       && (read = await source.ReadAsync(input.AsMemory(filled, ChunkSize - filled), cancellationToken)) > 0)
+                {
+                    filled += read;
+                }
+
+                var isFinalBlock = filled < ChunkSize;
+                Base64.EncodeToUtf8(input.AsSpan(0, filled), output, out _, out var written, isFinalBlock);
+                await destination.WriteAsync(output.AsMemory(0, written), cancellationToken);
+
+                if (isFinalBlock)
+                {
+                    return;
+                }
+            }
+        }
+        finally
+        {
+            if (media.OwnsStream)
+            {
+                await source.DisposeAsync();
+            }
+        }
+    }
+}
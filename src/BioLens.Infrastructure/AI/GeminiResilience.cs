@@ -0,0 +1,144 @@
+using System.Net;
+using Microsoft.Extensions.DependencyInjection;
+using Microsoft.Extensions.Logging;
+using Microsoft.Extensions.Options;
+using Polly;
+using Polly.Hedging;
+using Polly.Retry;
+using Polly.Timeout;
+
+namespace BioLens.Infrastructure.AI;
+
+/// <summary>
+/// Resilience pipeline for Gemini calls, outermost first: total timeout,
+/// jittered exponential retry, hedging, per-attempt timeout
+/// Hedging starts a second attempt when the first is slower than HedgingDelay,
+/// which hides the few slow upstream calls that dominate p99 latency
+/// </summary>
+public sealed class GeminiResilience
+{
+    /// <summary>
+    /// Set to false when the request body cannot be sent again
+    /// </summary>
+    public static readonly ResiliencePropertyKey<bool> CanRetryKey = new("BioLens.Gemini.CanRetry");
+
+    /// <summary>
+    /// Set to false when the request body cannot be sent twice at the same time
+    /// </summary>
+    public static readonly ResiliencePropertyKey<bool> CanHedgeKey = new("BioLens.Gemini.CanHedge");
+
+    public GeminiResilience(IOptions<GeminiResilienceOptions> options, ILogger<GeminiResilience> logger)
+    {
+        var settings = options.Value;
+
+        Pipeline = new ResiliencePipelineBuilder<HttpResponseMessage>()
+            .AddTimeout(TimeSpan.FromSeconds(settings.TotalTimeoutSeconds))
+            .AddRetry(new RetryStrategyOptions<HttpResponseMessage>
+            {
+                MaxRetryAttempts = settings.MaxRetryAttempts,
+                Delay = TimeSpan.FromMilliseconds(settings.RetryBaseDelayMs),
+                BackoffType = DelayBackoffType.Exponential,
+                UseJitter = true,
+                ShouldHandle = args => ValueTask.FromResult(
+                    args.Context.Properties.GetValue(CanRetryKey, true) && IsTransient(args.Outcome)),
+                OnRetry = args =>
+                {
+                    logger.LogWarning(
+                        "Retrying Gemini call (retry {Retry}) in {DelayMs} ms after {Outcome}",
+                        args.AttemptNumber + 1,
+                        args.RetryDelay.TotalMilliseconds,
+                        Describe(args.Outcome));
+                    return default;
+                }
+            })
+            .AddHedging(new HedgingStrategyOptions<HttpResponseMessage>
+            {
+                MaxHedgedAttempts = settings.MaxHedgedAttempts,
+                DelayGenerator = args => ValueTask.FromResult(
+                    args.Context.Properties.GetValue(CanHedgeKey, true)
+                        ? TimeSpan.FromMilliseconds(settings.HedgingDelayMs)
+                        : Timeout.InfiniteTimeSpan),
+                ShouldHandle = args => ValueTask.FromResult(
+                    args.Context.Properties.GetValue(CanHedgeKey, true) && IsTransient(args.Outcome)),
+                OnHedging = args =>
+                {
+                    logger.LogInformation("Starting hedged Gemini attempt {Attempt}", args.AttemptNumber);
+                    return default;
+                }
+            })
+            .AddTimeout(TimeSpan.FromSeconds(settings.AttemptTimeoutSeconds))
+            .Build();
+    }
+
+    public ResiliencePipeline<HttpResponseMessage> Pipeline { get; }
+
+    /// <summary>
+    /// Connection pool tuned for a single long-lived upstream: HTTP/2
+    /// multiplexing over few connections, recycled periodically so DNS
+    /// changes are picked up, with keep-alive pings to detect dead links
+    /// </summary>
+    public static SocketsHttpHandler CreateHandler(GeminiResilienceOptions settings) => new()
+    {
+        PooledConnectionLifetime = TimeSpan.FromMinutes(settings.PooledConnectionLifetimeMinutes),
+        PooledConnectionIdleTimeout = TimeSpan.FromSeconds(settings.PooledConnectionIdleTimeoutSeconds),
+        ConnectTimeout = TimeSpan.FromSeconds(settings.ConnectTimeoutSeconds),
+        EnableMultipleHttp2Connections = true,
+        KeepAlivePingDelay = TimeSpan.FromSeconds(settings.KeepAlivePingDelaySeconds),
+        KeepAlivePingTimeout = TimeSpan.FromSeconds(settings.KeepAlivePingTimeoutSeconds),
+        KeepAlivePingPolicy = HttpKeepAlivePingPolicy.WithActiveRequests,
+        AutomaticDecompression = DecompressionMethods.All
+    };
+
+    private static bool IsTransient(Outcome<HttpResponseMessage> outcome) => outcome switch
+    {
+        { Exception: HttpRequestException or TimeoutRejectedException } => true,
+        { Result: { } response } => response.StatusCode == HttpStatusCode.TooManyRequests
+                                    || (int)response.StatusCode >= 500,
+        _ => false
+    };
+
+    private static string Describe(Outcome<HttpResponseMessage> outcome) =>
+        outcome.Exception?.GetType().Name ?? $"HTTP {(int?)outcome.Result?.StatusCode}";
+}
+
+/// <summary>
+/// Bound to the Gemini:Resilience configuration section
+/// </summary>
+public class GeminiResilienceOptions
+{
+    public int AttemptTimeoutSeconds { get; set; } = 30;
+    public int TotalTimeoutSeconds { get; set; } = 90;
+    public int MaxRetryAttempts { get; set; } = 3;
+    public int RetryBaseDelayMs { get; set; } = 500;
+    public int MaxHedgedAttempts { get; set; } = 1;
+    public int HedgingDelayMs { get; set; } = 4000;
+    public int PooledConnectionLifetimeMinutes { get; set; } = 5;
+    public int PooledConnectionIdleTimeoutSeconds { get; set; } = 90;
+    public int ConnectTimeoutSeconds { get; set; } = 10;
+    public int KeepAlivePingDelaySeconds { get; set; } = 30;
+    public int KeepAlivePingTimeoutSeconds { get; set; } = 15;
+}
+
+public static class GeminiResilienceServiceCollectionExtensions
+{
+    /// <summary>
+    /// Registers the typed Gemini HttpClient on a tuned SocketsHttpHandler
+    /// The pipeline owns all timeouts, so the client timeout is disabled
+    /// </summary>
+    public static IHttpClientBuilder AddGeminiHttpClient(this IServiceCollection services)
+    {
+        services.AddSingleton<GeminiResilience>();
+
+        return services
+            .AddHttpClient<GeminiAIService>(client =>
+            {
+                client.Timeout = Timeout.InfiniteTimeSpan;
+                client.DefaultRequestVersion = HttpVersion.Version20;
+                client.DefaultVersionPolicy = HttpVersionPolicy.RequestVersionOrLower;
+            })
+            .ConfigurePrimaryHttpMessageHandler(provider =>
+                GeminiResilience.CreateHandler(provider.GetRequiredService<IOptions<GeminiResilienceOptions>>().Value))
+            // The handler recycles its own connections; don't rebuild it every two minutes
+            .SetHandlerLifetime(Timeout.InfiniteTimeSpan);
+    }
+}
@@ -0,0 +1,160 @@
+using BioLens.Domain.ValueObjects;
+using Microsoft.Extensions.DependencyInjection;
+using Microsoft.Extensions.Options;
+using Microsoft.ML;
+using Microsoft.ML.Data;
+using Microsoft.ML.Transforms.Image;
+
+namespace BioLens.Infrastructure.AI;
+
+/// <summary>
+/// On-device image triage that works without connectivity
+/// </summary>
+public interface IImageTriageEngine
+{
+    /// <summary>
+    /// Scores already decoded images, in batches
+    /// </summary>
+    IReadOnlyList<ImageTriageResult> Triage(IReadOnlyList<TriageImage> images);
+
+    /// <summary>
+    /// Decodes the captured images from their local files and scores them
+    /// </summary>
+    Task<IReadOnlyList<ImageTriageResult>> TriageAsync(
+        IReadOnlyCollection<MedicalImage> images,
+        CancellationToken cancellationToken = default);
+}
+
+public record TriageImage(Guid ImageId, MLImage Image);
+
+public record ImageTriageResult(
+    Guid ImageId,
+    string Label,
+    float Confidence,
+    IReadOnlyDictionary<string, float> Scores);
+
+/// <summary>
+/// Runs a local ONNX classifier through ML.NET on the CPU
+/// The model is loaded and the pipeline bound once, when the singleton is
+/// created; each batch is then a single Transform over the whole set of images
+/// </summary>
+public sealed class OnnxImageTriageEngine : IImageTriageEngine
+{
+    public const int ImageSize = 224;
+
+    private const string ResizedColumn = "resized";
+    private const string InputColumn = "input";
+    private const string OutputColumn = "output";
+
+    private readonly MLContext _ml = new(seed: 0);
+    private readonly ITransformer _model;
+    private readonly string[] _labels;
+    private readonly int _batchSize;
+
+    public OnnxImageTriageEngine(IOptions<ImageTriageOptions> options)
+    {
+        var settings = options.Value;
+        _labels = settings.Labels;
+        _batchSize = Math.Max(1, settings.BatchSize);
+
+        var modelPath = Path.IsPathRooted(settings.ModelPath)
+            ? settings.ModelPath
+            : Path.Combine(AppContext.BaseDirectory, settings.ModelPath);
+
+        var pipeline = _ml.Transforms
+            .ResizeImages(ResizedColumn, ImageSize, ImageSize, nameof(TriageRow.Image),
+                ImageResizingEstimator.ResizingKind.Fill)
+            .Append(_ml.Transforms.ExtractPixels(InputColumn, ResizedColumn, scaleImage: 1f / 255f))
+            .Append(_ml.Transforms.ApplyOnnxModel(OutputColumn, InputColumn, modelPath));
+
+        // Fitting only binds the schema and opens the ONNX session
+        _model = pipeline.Fit(_ml.Data.LoadFromEnumerable(Array.Empty<TriageRow>()));
+    }
+
+    public IReadOnlyList<ImageTriageResult> Triage(IReadOnlyList<TriageImage> images)
+    {
+        var results = new List<ImageTriageResult>(images.Count);
+        foreach (var batch in images.Chunk(_batchSize))
+        {
+            var rows = _ml.Data.LoadFromEnumerable(batch.Select(i => new TriageRow { Image = i.Image }));
+            var scored = _ml.Data.CreateEnumerable<TriageScores>(_model.Transform(rows), reuseRowObject: false);
+            results.AddRange(batch.Zip(scored, (image, output) => ToResult(image.ImageId, output.Scores)));
+        }
+        return results;
+    }
+
+    public Task<IReadOnlyList<ImageTriageResult>> TriageAsync(
+        IReadOnlyCollection<MedicalImage> images,
+        CancellationToken cancellationToken = default)
+    {
+        return Task.Run(() =>
+        {
+            var decoded = new List<TriageImage>(images.Count);
+            try
+            {
+                foreach (var image in images)
+                {
+                    cancellationToken.ThrowIfCancellationRequested();
+                    decoded.Add(new TriageImage(image.Id, MLImage.CreateFromFile(image.LocalFilePath)));
+                }
+                return Triage(decoded);
+            }
+            finally
+            {
+                foreach (var image in decoded)
+                {
+                    image.Image.Dispose();
+                }
+            }
+        }, cancellationToken);
+    }
+
+    private ImageTriageResult ToResult(Guid imageId, float[] logits)
+    {
+        // Softmax over the model outputs
+        var max = logits.Max();
+        var exp = logits.Select(l => MathF.Exp(l - max)).ToArray();
+        var sum = exp.Sum();
+
+        var scores = new Dictionary<string, float>(logits.Length);
+        for (var i = 0; i < logits.Length; i++)
+        {
+            scores[i < _labels.Length ? _labels[i] : $"class_{i}"] = exp[i] / sum;
+        }
+
+        var best = scores.MaxBy(s => s.Value);
+        return new ImageTriageResult(imageId, best.Key, best.Value, scores);
+    }
+
+    // Public so ML.NET can bind rows to them by reflection
+    public sealed class TriageRow
+    {
+        [ImageType(ImageSize, ImageSize)]
+        public MLImage? Image { get; set; }
+    }
+
+    public sealed class TriageScores
+    {
+        [ColumnName(OutputColumn)]
+        public float[] Scores { get; set; } = [];
+    }
+}
+
+/// <summary>
+/// Bound to the ImageTriage configuration section
+/// </summary>
+public class ImageTriageOptions
+{
+    public string ModelPath { get; set; } = "Models/triage-stub.onnx";
+    public string[] Labels { get; set; } = ["routine", "review", "urgent"];
+    public int BatchSize { get; set; } = 16;
+}
+
+public static class ImageTriageServiceCollectionExtensions
+{
+    public static IServiceCollection AddImageTriage(this IServiceCollection services)
+    {
+        services.AddSingleton<IImageTriageEngine, OnnxImageTriageEngine>();
+        return services;
+    }
+}
@@ -0,0 +1,282 @@
+using System.Collections.Concurrent;
+using System.Runtime.CompilerServices;
+using System.Threading.Channels;
+using Microsoft.Extensions.DependencyInjection;
+using Microsoft.Extensions.DependencyInjection.Extensions;
+using Microsoft.Extensions.Logging;
+using Microsoft.Extensions.Options;
+
+namespace BioLens.Infrastructure.AI;
+
+/// <summary>
+/// Whether a Gemini call has a health worker waiting on it
+/// </summary>
+public enum GeminiWorkload
+{
+    Interactive,
+    Backlog
+}
+
+/// <summary>
+/// Marks every Gemini call made in the current async flow as backlog work,
+/// e.g. while draining cases queued during an outage:
+/// <code>using (GeminiWorkloadScope.Backlog()) { await coordinator.ExecuteAsync(...); }</code>
+/// </summary>
+public static class GeminiWorkloadScope
+{
+    private static readonly AsyncLocal<GeminiWorkload> CurrentWorkload = new();
+
+    public static GeminiWorkload Current => CurrentWorkload.Value;
+
+    public static IDisposable Backlog()
+    {
+        var previous = CurrentWorkload.Value;
+        CurrentWorkload.Value = GeminiWorkload.Backlog;
+        return new Restore(previous);
+    }
+
+    private sealed class Restore(GeminiWorkload previous) : IDisposable
+    {
+        public void Dispose() => CurrentWorkload.Value = previous;
+    }
+}
+
+/// <summary>
+/// Front door for all Gemini calls
+/// Identical requests in flight share one upstream call (single-flight);
+/// backlog calls may join an interactive flight, never the other way round.
+/// Interactive calls go straight through; backlog calls wait in a bounded
+/// queue and start in order under a concurrency cap, so a drained backlog
+/// multiplexes over the pooled connections without queueing ahead of
+/// interactive calls
+/// </summary>
+public sealed class ScheduledGeminiAIService : IGeminiAIService, IAsyncDisposable
+{
+    private readonly CachedGeminiAIService _inner;
+    private readonly GeminiSchedulingOptions _options;
+    private readonly ILogger<ScheduledGeminiAIService> _logger;
+
+    private readonly ConcurrentDictionary<(string Key, GeminiWorkload Workload), Lazy<Task<GeminiResult>>> _inFlight = new();
+    private readonly Channel<BacklogItem> _backlog;
+    private readonly SemaphoreSlim _backlogSlots;
+    private readonly CancellationTokenSource _shutdown = new();
+    private readonly Task _dispatcher;
+
+    public ScheduledGeminiAIService(
+        CachedGeminiAIService inner,
+        IOptions<GeminiSchedulingOptions> options,
+        ILogger<ScheduledGeminiAIService> logger)
+    {
+        _inner = inner;
+        _options = options.Value;
+        _logger = logger;
+        _backlogSlots = new SemaphoreSlim(_options.BacklogConcurrency);
+        _backlog = Channel.CreateBounded<BacklogItem>(new BoundedChannelOptions(_options.BacklogQueueCapacity)
+        {
+            SingleReader = true,
+            FullMode = BoundedChannelFullMode.Wait
+        });
+        _dispatcher = Task.Run(() => DispatchBacklogAsync(_shutdown.Token));
+    }
+
+    public async Task<string> GenerateContentAsync(
+        string prompt,
+        IReadOnlyList<GeminiMedia>? media = null,
+        CancellationToken cancellationToken = default)
+    {
+        var result = await GenerateAsync(prompt, media, cancellationToken);
+        return result.Text;
+    }
+
+    public async Task<GeminiResult> GenerateAsync(
+        string prompt,
+        IReadOnlyList<GeminiMedia>? media = null,
+        CancellationToken cancellationToken = default)
+    {
+        var workload = GeminiWorkloadScope.Current;
+        var key = await GeminiResponseCache.ComputeKeyAsync(
+            GeminiAIService.GenerationConfig, prompt, media, cancellationToken);
+
+        if (key is null)
+        {
+            return await DispatchAsync(workload, key, prompt, media, cancellationToken);
+        }
+
+        // Joining a queued backlog flight would leave an interactive caller waiting behind the whole queue
+        if (workload == GeminiWorkload.Backlog
+            && _inFlight.TryGetValue((key, GeminiWorkload.Interactive), out var interactive))
+        {
+            _logger.LogDebug("Joined an identical Gemini call already in flight");
+            return await interactive.Value.WaitAsync(cancellationToken);
+        }
+
+        // The shared call ignores any single caller's token; each caller only stops waiting
+        var flightKey = (key, workload);
+        var flight = new Lazy<Task<GeminiResult>>(() => DispatchAsync(workload, key, prompt, media, _shutdown.Token));
+        var current = _inFlight.GetOrAdd(flightKey, flight);
+        if (ReferenceEquals(current, flight))
+        {
+            _ = flight.Value.ContinueWith(
+                _ => _inFlight.TryRemove(KeyValuePair.Create(flightKey, flight)),
+                CancellationToken.None,
+                TaskContinuationOptions.ExecuteSynchronously,
+                TaskScheduler.Default);
+        }
+        else
+        {
+            _logger.LogDebug("Joined an identical Gemini call already in flight");
+        }
+
+        return await current.Value.WaitAsync(cancellationToken);
+    }
+
+    /// <summary>
+    /// Interactive streams go straight through; a backlog stream holds one of
+    /// the backlog slots until it ends, so agents that always stream stay under
+    /// the same concurrency cap while a backlog drains
+    /// </summary>
+    public async IAsyncEnumerable<string> StreamContentAsync(
+        string prompt,
+        IReadOnlyList<GeminiMedia>? media = null,
+        [EnumeratorCancellation] CancellationToken cancellationToken = default)
+    {
+        if (GeminiWorkloadScope.Current == GeminiWorkload.Interactive)
+        {
+            await foreach (var chunk in _inner.StreamContentAsync(prompt, media, cancellationToken))
+            {
+                yield return chunk;
+            }
+            yield break;
+        }
+
+        using var linked = CancellationTokenSource.CreateLinkedTokenSource(cancellationToken, _shutdown.Token);
+        await _backlogSlots.WaitAsync(linked.Token);
+        try
+        {
+            await foreach (var chunk in _inner.StreamContentAsync(prompt, media, linked.Token))
+            {
+                yield return chunk;
+            }
+        }
+        finally
+        {
+            _backlogSlots.Release();
+        }
+    }
+
+    public async ValueTask DisposeAsync()
+    {
+        _backlog.Writer.TryComplete();
+        _shutdown.Cancel();
+        try
+        {
+            await _dispatcher;
+        }
+        catch (OperationCanceledException)
+        {
+        }
+        finally
+        {
+            while (_backlog.Reader.TryRead(out var item))
+            {
+                item.Completion.TrySetCanceled();
+            }
+            _shutdown.Dispose();
+        }
+    }
+
+    private async Task<GeminiResult> DispatchAsync(
+        GeminiWorkload workload,
+        string? key,
+        string prompt,
+        IReadOnlyList<GeminiMedia>? media,
+        CancellationToken cancellationToken)
+    {
+        if (workload == GeminiWorkload.Interactive)
+        {
+            return await _inner.GenerateAsync(key, prompt, media, cancellationToken);
+        }
+
+        var item = new BacklogItem(key, prompt, media, new(TaskCreationOptions.RunContinuationsAsynchronously));
+        await _backlog.Writer.WriteAsync(item, cancellationToken);
+        return await item.Completion.Task;
+    }
+
+    /// <summary>
+    /// Starts each queued backlog request as soon as a backlog slot is free
+    /// An item taken off the queue is always completed: if shutdown interrupts
+    /// the wait for a slot, it is cancelled here, and DisposeAsync cancels the
+    /// ones still queued
+    /// </summary>
+    private async Task DispatchBacklogAsync(CancellationToken cancellationToken)
+    {
+        await foreach (var item in _backlog.Reader.ReadAllAsync(cancellationToken))
+        {
+            try
+            {
+                await _backlogSlots.WaitAsync(cancellationToken);
+            }
+            catch (Exception ex)
+            {
+                if (ex is OperationCanceledException)
+                    item.Completion.TrySetCanceled(cancellationToken);
+                else
+                    item.Completion.TrySetException(ex);
+                throw;
+            }
+            _ = RunBacklogItemAsync(item, cancellationToken);
+        }
+    }
+
+    private async Task RunBacklogItemAsync(BacklogItem item, CancellationToken cancellationToken)
+    {
+        try
+        {
+            item.Completion.TrySetResult(await _inner.GenerateAsync(item.Key, item.Prompt, item.Media, cancellationToken));
+        }
+        catch (OperationCanceledException)
+        {
+            item.Completion.TrySetCanceled(cancellationToken);
+        }
+        catch (Exception ex)
+        {
+            item.Completion.TrySetException(ex);
+        }
+        finally
+        {
+            _backlogSlots.Release();
+        }
+    }
+
+    private sealed record BacklogItem(
+        string? Key,
+        string Prompt,
+        IReadOnlyList<GeminiMedia>? Media,
+        TaskCompletionSource<GeminiResult> Completion);
+}
+
+/// <summary>
+/// Bound to the Gemini:Scheduling configuration section
+/// </summary>
+public class GeminiSchedulingOptions
+{
+    public int BacklogConcurrency { get; set; } = 8;
+    public int BacklogQueueCapacity { get; set; } = 1000;
+}
+
+public static class GeminiSchedulingServiceCollectionExtensions
+{
+    /// <summary>
+    /// Registers the scheduling layer as IGeminiAIService in front of the cached client
+    /// The typed client's handler is never rotated (see AddGeminiHttpClient),
+    /// so holding it in a singleton is safe
+    /// </summary>
+    public static IServiceCollection AddScheduledGeminiAIService(this IServiceCollection services)
+    {
+        services.AddCachedGeminiAIService();
+        services.AddSingleton<ScheduledGeminiAIService>();
+        services.Replace(ServiceDescriptor.Singleton<IGeminiAIService>(
+            provider => provider.GetRequiredService<ScheduledGeminiAIService>()));
+        return services;
+    }
+}
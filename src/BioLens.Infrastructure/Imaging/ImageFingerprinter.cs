@@ -0,0 +1,308 @@
+using System.Numerics;
+using System.Security.Cryptography;
+using BioLens.Domain.ValueObjects;
+using LiteDB;
+using Microsoft.Extensions.DependencyInjection;
+using Microsoft.Extensions.Options;
+using SkiaSharp;
+
+namespace BioLens.Infrastructure.Imaging;
+
+/// <summary>
+/// Computes perceptual hashes for captured images
+/// Call it when an image is added to a case so the hash travels with the
+/// MedicalImage; images that arrive without one are hashed on demand
+/// </summary>
+public interface IImageFingerprinter
+{
+    ulong ComputeHash(string filePath);
+
+    /// <summary>
+    /// Returns the images with PerceptualHash set, hashing only those that lack one
+    /// </summary>
+    Task<IReadOnlyList<MedicalImage>> FingerprintAllAsync(
+        IReadOnlyCollection<MedicalImage> images,
+        CancellationToken cancellationToken = default);
+
+    /// <summary>
+    /// Collapses near-duplicates using the configured distance threshold
+    /// </summary>
+    IReadOnlyList<ImageGroup> GroupNearDuplicates(IEnumerable<MedicalImage> images);
+}
+
+/// <summary>
+/// A distinct image of a case and the near-duplicates collapsed into it
+/// </summary>
+public record ImageGroup(MedicalImage Representative, IReadOnlyList<MedicalImage> Duplicates);
+
+/// <summary>
+/// 64-bit DCT perceptual hash (pHash): the image is reduced to 32x32
+/// grayscale, and each bit records whether one of the 8x8 lowest-frequency
+/// DCT coefficients is above their median. Re-encoding, resizing and small
+/// exposure changes flip few bits, so the Hamming distance measures similarity
+/// </summary>
+public sealed class PerceptualImageFingerprinter : IImageFingerprinter
+{
+    private const int SampleSize = 32;
+    private const int HashSize = 8;
+
+    // cos((2x + 1) * u * pi / 2N) for the frequencies that make it into the hash
+    private static readonly double[,] Cosines = BuildCosines();
+
+    private readonly ImageFingerprintOptions _options;
+    private readonly SemaphoreSlim _workers;
+
+    public PerceptualImageFingerprinter(IOptions<ImageFingerprintOptions> options)
+    {
+        _options = options.Value;
+        _workers = new SemaphoreSlim(Math.Max(1, _options.MaxDegreeOfParallelism));
+    }
+
+    public static int Distance(ulong first, ulong second) => BitOperations.PopCount(first ^ second);
+
+    /// <summary>
+    /// Greedily groups images whose hashes are within maxDistance of a group's
+    /// first image, keeping capture order; a case holds few images, so the
+    /// pairwise scan is cheaper than any index
+    /// </summary>
+    public static IReadOnlyList<ImageGroup> Collapse(IEnumerable<MedicalImage> images, int maxDistance)
+    {
+        var groups = new List<(MedicalImage Representative, List<MedicalImage> Duplicates)>();
+        foreach (var image in images)
+        {
+            var match = image.PerceptualHash is { } hash
+                ? groups.FindIndex(g => g.Representative.PerceptualHash is { } other
+                                        && Distance(hash, other) <= maxDistance)
+                : -1;
+
+            if (match < 0)
+                groups.Add((image, new List<MedicalImage>()));
+            else
+                groups[match].Duplicates.Add(image);
+        }
+        return groups.Select(g => new ImageGroup(g.Representative, g.Duplicates)).ToList();
+    }
+
+    public IReadOnlyList<ImageGroup> GroupNearDuplicates(IEnumerable<MedicalImage> images) =>
+        Collapse(images, _options.NearDuplicateMaxDistance);
+
+    public async Task<IReadOnlyList<MedicalImage>> FingerprintAllAsync(
+        IReadOnlyCollection<MedicalImage> images,
+        CancellationToken cancellationToken = default)
+    {
+        return await Task.WhenAll(images.Select(async image =>
+        {
+            if (image.PerceptualHash.HasValue)
+                return image;
+
+            await _workers.WaitAsync(cancellationToken);
+            try
+            {
+                var hash = await Task.Run(() => ComputeHash(image.LocalFilePath), cancellationToken);
+                return image with { PerceptualHash = hash };
+            }
+            finally
+            {
+                _workers.Release();
+            }
+        }));
+    }
+
+    public ulong ComputeHash(string filePath)
+    {
+        var pixels = LoadGrayscale(filePath);
+
+        // Separable 2D DCT, keeping only the low frequencies
+        var rows = new double[HashSize, SampleSize];
+        for (var u = 0; u < HashSize; u++)
+            for (var y = 0; y < SampleSize; y++)
+            {
+                double sum = 0;
+                for (var x = 0; x < SampleSize; x++)
+                    sum += Cosines[u, x] * pixels[y * SampleSize + x];
+                rows[u, y] = sum;
+            }
+
+        Span<double> coefficients = stackalloc double[HashSize * HashSize];
+        for (var u = 0; u < HashSize; u++)
+            for (var v = 0; v < HashSize; v++)
+            {
+                double sum = 0;
+                for (var y = 0; y < SampleSize; y++)
+                    sum += Cosines[v, y] * rows[u, y];
+                coefficients[v * HashSize + u] = sum;
+            }
+
+        // The DC term only carries overall brightness; leave it out of the median
+        Span<double> sorted = stackalloc double[coefficients.Length - 1];
+        coefficients[1..].CopyTo(sorted);
+        sorted.Sort();
+        var median = sorted[sorted.Length / 2];
+
+        ulong hash = 0;
+        for (var i = 0; i < coefficients.Length; i++)
+        {
+            if (coefficients[i] > median)
+                hash |= 1UL << i;
+        }
+        return hash;
+    }
+
+    private static byte[] LoadGrayscale(string filePath)
+    {
+        using var codec = SKCodec.Create(filePath)
+            ?? throw new InvalidDataException($"Unsupported image format: {filePath}");
+
+        // Let the decoder downsample first; the hash only needs 32x32
+        var scale = Math.Min(1f, (float)SampleSize * 4 / Math.Min(codec.Info.Width, codec.Info.Height));
+        var decodeSize = codec.GetScaledDimensions(scale);
+        var decodeInfo = new SKImageInfo(decodeSize.Width, decodeSize.Height, SKColorType.Gray8, SKAlphaType.Opaque);
+
+        using var decoded = new SKBitmap(decodeInfo);
+        var status = codec.GetPixels(decodeInfo, decoded.GetPixels());
+        if (status is not (SKCodecResult.Success or SKCodecResult.IncompleteInput))
+        {
+            throw new InvalidDataException($"Could not decode {filePath}: {status}");
+        }
+
+        using var sample = decoded.Resize(
+            new SKImageInfo(SampleSize, SampleSize, SKColorType.Gray8, SKAlphaType.Opaque),
+            SKFilterQuality.Medium);
+        return sample.Bytes;
+    }
+
+    private static double[,] BuildCosines()
+    {
+        var cosines = new double[HashSize, SampleSize];
+        for (var u = 0; u < HashSize; u++)
+            for (var x = 0; x < SampleSize; x++)
+                cosines[u, x] = Math.Cos((2 * x + 1) * u * Math.PI / (2 * SampleSize));
+        return cosines;
+    }
+}
+
+/// <summary>
+/// Findings already produced for an image, looked up by a SHA-256 of its bytes
+/// Perceptual hashes only collapse near-duplicates within one case; unrelated
+/// images from different patients can share one, but not a content hash
+/// </summary>
+public interface IImageFindingsIndex
+{
+    Task<string> ComputeKeyAsync(string filePath, CancellationToken cancellationToken = default);
+
+    bool TryGet(string key, out string findingsJson);
+
+    void Store(string key, Guid imageId, string findingsJson);
+}
+
+/// <summary>
+/// Findings index in a LiteDB store, keyed by content hash so a hit is a
+/// primary-key read; the set of known keys is mirrored in memory, so the
+/// common case of a new image is answered without touching the disk
+/// </summary>
+public sealed class LiteDbImageFindingsIndex : IImageFindingsIndex, IDisposable
+{
+    private const string CollectionName = "image_findings";
+
+    private const int HashBufferSize = 64 * 1024;
+
+    private readonly LiteDatabase? _database;
+    private readonly ILiteCollection<IndexedImageFindings>? _findings;
+    private readonly HashSet<string> _knownKeys = new(StringComparer.Ordinal);
+    private readonly object _lock = new();
+
+    public LiteDbImageFindingsIndex(IOptions<ImageFingerprintOptions> options)
+    {
+        var settings = options.Value;
+        if (string.IsNullOrEmpty(settings.IndexDatabasePath))
+        {
+            return;
+        }
+
+        _database = new LiteDatabase(settings.IndexDatabasePath);
+        _findings = _database.GetCollection<IndexedImageFindings>(CollectionName);
+        foreach (var key in _findings.Query().Select(f => f.Id).ToEnumerable())
+        {
+            _knownKeys.Add(key);
+        }
+    }
+
+    public async Task<string> ComputeKeyAsync(string filePath, CancellationToken cancellationToken = default)
+    {
+        await using var stream = new FileStream(
+            filePath, FileMode.Open, FileAccess.Read, FileShare.Read, HashBufferSize,
+            FileOptions.Asynchronous | FileOptions.SequentialScan);
+        return Convert.ToHexString(await SHA256.HashDataAsync(stream, cancellationToken));
+    }
+
+    public bool TryGet(string key, out string findingsJson)
+    {
+        findingsJson = "";
+        lock (_lock)
+        {
+            if (_findings is null || !_knownKeys.Contains(key))
+            {
+                return false;
+            }
+
+            var stored = _findings.FindById(key);
+            if (stored is null)
+            {
+                _knownKeys.Remove(key);
+                return false;
+            }
+            findingsJson = stored.Findings;
+            return true;
+        }
+    }
+
+    public void Store(string key, Guid imageId, string findingsJson)
+    {
+        lock (_lock)
+        {
+            if (_findings is null)
+            {
+                return;
+            }
+
+            _findings.Upsert(new IndexedImageFindings
+            {
+                Id = key,
+                ImageId = imageId,
+                Findings = findingsJson,
+                CreatedAt = DateTime.UtcNow
+            });
+            _knownKeys.Add(key);
+        }
+    }
+
+    public void Dispose() => _database?.Dispose();
+}
+
+public class IndexedImageFindings
+{
+    public string Id { get; set; } = "";
+    public Guid ImageId { get; set; }
+    public string Findings { get; set; } = "";
+    public DateTime CreatedAt { get; set; }
+}
+
+/// <summary>
+/// Bound to the ImageFingerprinting configuration section
+/// </summary>
+public class ImageFingerprintOptions
+{
+    public int NearDuplicateMaxDistance { get; set; } = 6;
+    public int MaxDegreeOfParallelism { get; set; } = 2;
+    public string IndexDatabasePath { get; set; } = "biolens-fingerprints.db";
+}
+
+public static class ImageFingerprintServiceCollectionExtensions
+{
+    public static IServiceCollection AddImageFingerprinting(this IServiceCollection services)
+    {
+        services.AddSingleton<IImageFingerprinter, PerceptualImageFingerprinter>();
+        services.AddSingleton<IImageFindingsIndex, LiteDbImageFindingsIndex>();
+        return services;
+    }
+}
@@ -0,0 +1,257 @@
+using System.Collections.Concurrent;
+using BioLens.Domain.ValueObjects;
+using BioLens.Infrastructure.AI;
+using Microsoft.Extensions.DependencyInjection;
+using Microsoft.Extensions.Logging;
+using Microsoft.Extensions.Options;
+using SkiaSharp;
+
+namespace BioLens.Infrastructure.Imaging;
+
+/// <summary>
+/// Produces the upload-ready version of a captured image
+/// </summary>
+public interface IImagePreprocessor
+{
+    Task<PreparedImage> PrepareAsync(MedicalImage image, CancellationToken cancellationToken = default);
+
+    Task<IReadOnlyList<PreparedImage>> PrepareAllAsync(
+        IReadOnlyCollection<MedicalImage> images,
+        CancellationToken cancellationToken = default);
+}
+
+public record PreparedImage(
+    Guid ImageId,
+    string FilePath,
+    string MimeType,
+    int Width,
+    int Height,
+    long FileSizeBytes,
+    long OriginalSizeBytes,
+    bool FromCache)
+{
+    public GeminiMedia ToGeminiMedia() => GeminiMedia.FromFile(FilePath, MimeType);
+}
+
+/// <summary>
+/// Downscales captures to a maximum edge, bakes in the EXIF orientation and
+/// re-encodes them as JPEG without metadata (no GPS or device tags leave the
+/// phone). The derived file is cached next to the capture, keyed by the
+/// settings, and work runs on a bounded pool so a full case never saturates
+/// the device
+/// </summary>
+public sealed class ImagePreprocessor : IImagePreprocessor
+{
+    private readonly ImagePreprocessingOptions _options;
+    private readonly ILogger<ImagePreprocessor> _logger;
+    private readonly SemaphoreSlim _workers;
+    private readonly ConcurrentDictionary<string, Lazy<Task<PreparedImage>>> _inProgress = new();
+
+    public ImagePreprocessor(IOptions<ImagePreprocessingOptions> options, ILogger<ImagePreprocessor> logger)
+    {
+        _options = options.Value;
+        _logger = logger;
+        _workers = new SemaphoreSlim(Math.Max(1, _options.MaxDegreeOfParallelism));
+    }
+
+    public async Task<IReadOnlyList<PreparedImage>> PrepareAllAsync(
+        IReadOnlyCollection<MedicalImage> images,
+        CancellationToken cancellationToken = default)
+    {
+        return await Task.WhenAll(images.Select(image => PrepareAsync(image, cancellationToken)));
+    }
+
+    public Task<PreparedImage> PrepareAsync(MedicalImage image, CancellationToken cancellationToken = default)
+    {
+        // Concurrent requests for the same capture share one encode
+        var derivedPath = DerivedPath(image.LocalFilePath);
+        var work = _inProgress.GetOrAdd(derivedPath, path => new Lazy<Task<PreparedImage>>(async () =>
+        {
+            try
+            {
+                return await PrepareCoreAsync(image, path);
+            }
+            finally
+            {
+                _inProgress.TryRemove(path, out _);
+            }
+        }));
+        return work.Value.WaitAsync(cancellationToken);
+    }
+
+    /// <summary>
+    /// Keeps the source extension in the name, so lesion.png and lesion.jpg
+    /// captured side by side get separate derived files
+    /// </summary>
+    private string DerivedPath(string sourcePath)
+    {
+        var directory = Path.GetDirectoryName(sourcePath) ?? "";
+        var name = Path.GetFileName(sourcePath);
+        return Path.Combine(directory, $"{name}.prepared-{_options.MaxEdge}-q{_options.JpegQuality}.jpg");
+    }
+
+    private async Task<PreparedImage> PrepareCoreAsync(MedicalImage image, string derivedPath)
+    {
+        var source = new FileInfo(image.LocalFilePath);
+        var derived = new FileInfo(derivedPath);
+        if (derived.Exists && derived.LastWriteTimeUtc >= source.LastWriteTimeUtc)
+        {
+            using var codec = SKCodec.Create(derivedPath);
+            if (codec != null)
+            {
+                return new PreparedImage(image.Id, derivedPath, "image/jpeg",
+                    codec.Info.Width, codec.Info.Height, derived.Length, source.Length, FromCache: true);
+            }
+        }
+
+        await _workers.WaitAsync();
+        try
+        {
+            return await Task.Run(() => Encode(image, source, derivedPath));
+        }
+        finally
+        {
+            _workers.Release();
+        }
+    }
+
+    private PreparedImage Encode(MedicalImage image, FileInfo source, string derivedPath)
+    {
+        using var codec = SKCodec.Create(source.FullName)
+            ?? throw new InvalidDataException($"Unsupported image format: {source.FullName}");
+
+        var (width, height) = TargetSize(codec.Info.Width, codec.Info.Height);
+
+        // Let the decoder downsample (JPEG DCT scaling) before the high-quality resize
+        var scale = Math.Max((float)width / codec.Info.Width, (float)height / codec.Info.Height);
+        var decodeSize = codec.GetScaledDimensions(scale);
+        var decodeInfo = new SKImageInfo(decodeSize.Width, decodeSize.Height, SKColorType.Rgba8888, SKAlphaType.Premul);
+
+        using var decoded = new SKBitmap(decodeInfo);
+        var status = codec.GetPixels(decodeInfo, decoded.GetPixels());
+        if (status is not (SKCodecResult.Success or SKCodecResult.IncompleteInput))
+        {
+            throw new InvalidDataException($"Could not decode {source.FullName}: {status}");
+        }
+
+        var resized = decoded.Width == width && decoded.Height == height
+            ? decoded
+            : decoded.Resize(new SKImageInfo(width, height, SKColorType.Rgba8888, SKAlphaType.Premul), SKFilterQuality.High);
+        var oriented = ApplyOrigin(resized, codec.EncodedOrigin);
+        SKData encoded;
+        try
+        {
+            encoded = oriented.Encode(SKEncodedImageFormat.Jpeg, _options.JpegQuality);
+            width = oriented.Width;
+            height = oriented.Height;
+        }
+        finally
+        {
+            if (!ReferenceEquals(oriented, resized))
+                oriented.Dispose();
+            if (!ReferenceEquals(resized, decoded))
+                resized.Dispose();
+        }
+
+        // Write to a temporary sibling and rename, so readers never see a partial file
+        var temporary = $"{derivedPath}.{Guid.NewGuid():N}.tmp";
+        using (encoded)
+        using (var output = File.Create(temporary))
+        {
+            encoded.SaveTo(output);
+        }
+        File.Move(temporary, derivedPath, overwrite: true);
+
+        var size = new FileInfo(derivedPath).Length;
+        _logger.LogDebug(
+            "Prepared image {ImageId}: {OriginalBytes} -> {PreparedBytes} bytes, {Width}x{Height}",
+            image.Id, source.Length, size, width, height);
+
+        return new PreparedImage(image.Id, derivedPath, "image/jpeg",
+            width, height, size, source.Length, FromCache: false);
+    }
+
+    private (int Width, int Height) TargetSize(int width, int height)
+    {
+        var longest = Math.Max(width, height);
+        if (longest <= _options.MaxEdge)
+        {
+            return (width, height);
+        }
+
+        var ratio = (double)_options.MaxEdge / longest;
+        return (Math.Max(1, (int)Math.Round(width * ratio)), Math.Max(1, (int)Math.Round(height * ratio)));
+    }
+
+    /// <summary>
+    /// Re-draws the pixels upright; the orientation tag is dropped with the rest of the EXIF data
+    /// Returns the input itself when it is already upright
+    /// </summary>
+    private static SKBitmap ApplyOrigin(SKBitmap bitmap, SKEncodedOrigin origin)
+    {
+        if (origin == SKEncodedOrigin.TopLeft)
+        {
+            return bitmap;
+        }
+
+        int w = bitmap.Width, h = bitmap.Height;
+        var swapsAxes = origin is SKEncodedOrigin.LeftTop or SKEncodedOrigin.RightTop
+            or SKEncodedOrigin.RightBottom or SKEncodedOrigin.LeftBottom;
+        var upright = new SKBitmap(swapsAxes ? h : w, swapsAxes ? w : h, bitmap.ColorType, bitmap.AlphaType);
+
+        using var canvas = new SKCanvas(upright);
+        switch (origin)
+        {
+            case SKEncodedOrigin.TopRight:
+                canvas.Translate(w, 0);
+                canvas.Scale(-1, 1);
+                break;
+            case SKEncodedOrigin.BottomRight:
+                canvas.Translate(w, h);
+                canvas.RotateDegrees(180);
+                break;
+            case SKEncodedOrigin.BottomLeft:
+                canvas.Translate(0, h);
+                canvas.Scale(1, -1);
+                break;
+            case SKEncodedOrigin.LeftTop:
+                canvas.RotateDegrees(90);
+                canvas.Scale(1, -1);
+                break;
+            case SKEncodedOrigin.RightTop:
+                canvas.Translate(h, 0);
+                canvas.RotateDegrees(90);
+                break;
+            case SKEncodedOrigin.RightBottom:
+                canvas.Translate(h, w);
+                canvas.RotateDegrees(90);
+                canvas.Scale(-1, 1);
+                break;
+            case SKEncodedOrigin.LeftBottom:
+                canvas.Translate(0, w);
+                canvas.RotateDegrees(-90);
+                break;
+        }
+        canvas.DrawBitmap(bitmap, 0, 0);
+        return upright;
+    }
+}
+
+/// <summary>
+/// Bound to the ImagePreprocessing configuration section
+/// </summary>
+public class ImagePreprocessingOptions
+{
+    public int MaxEdge { get; set; } = 1536;
+    public int JpegQuality { get; set; } = 80;
+    public int MaxDegreeOfParallelism { get; set; } = 2;
+}
+
+public static class ImagePreprocessingServiceCollectionExtensions
+{
+    public static IServiceCollection AddImagePreprocessing(this IServiceCollection services)
+    {
+        services.AddSingleton<IImagePreprocessor, ImagePreprocessor>();
+        return services;
+    }
+}
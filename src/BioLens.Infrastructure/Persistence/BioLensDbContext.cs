@@ -1,11 +1,19 @@
 using BioLens.Domain.Entities;
+using BioLens.Domain.Enums;
 using BioLens.Domain.Repositories;
+using System.Runtime.CompilerServices;
 using Microsoft.EntityFrameworkCore;
 
 namespace BioLens.Infrastructure.Persistence;
 
 public class BioLensDbContext : DbContext
 {
+    /// <summary>
+    /// Shadow concurrency token on every entity; SQLite has no rowversion, so
+    /// it is incremented here on each modification
+    /// </summary>
+    public const string VersionProperty = "Version";
+
     public BioLensDbContext(DbContextOptions<BioLensDbContext> options) : base(options) { }
 
     public DbSet<DiagnosticCase> DiagnosticCases => Set<DiagnosticCase>();
@@ -15,10 +23,88 @@ public class BioLensDbContext : DbContext
     {
         modelBuilder.ApplyConfigurationsFromAssembly(typeof(BioLensDbContext).Assembly);
     }
+
+    public override int SaveChanges(bool acceptAllChangesOnSuccess)
+    {
+        var autoDetectChanges = IncrementVersions();
+        try
+        {
+            return base.SaveChanges(acceptAllChangesOnSuccess);
+        }
+        finally
+        {
+            ChangeTracker.AutoDetectChangesEnabled = autoDetectChanges;
+        }
+    }
+
+    public override async Task<int> SaveChangesAsync(
+        bool acceptAllChangesOnSuccess,
+        CancellationToken cancellationToken = default)
+    {
+        var autoDetectChanges = IncrementVersions();
+        try
+        {
+            return await base.SaveChangesAsync(acceptAllChangesOnSuccess, cancellationToken);
+        }
+        finally
+        {
+            ChangeTracker.AutoDetectChangesEnabled = autoDetectChanges;
+        }
+    }
+
+    /// <summary>
+    /// Detects changes once and bumps the version of every modified entity;
+    /// automatic detection is then switched off for the save so the JSON
+    /// columns are not diffed a second time. Returns the previous setting.
+    /// </summary>
+    private bool IncrementVersions()
+    {
+        var autoDetectChanges = ChangeTracker.AutoDetectChangesEnabled;
+        ChangeTracker.AutoDetectChangesEnabled = false;
+        if (autoDetectChanges)
+        {
+            ChangeTracker.DetectChanges();
+        }
+
+        foreach (var entry in ChangeTracker.Entries())
+        {
+            if (entry.State == EntityState.Modified
+                && entry.Metadata.FindProperty(VersionProperty) is not null)
+            {
+                var version = entry.Property<long>(VersionProperty);
+                version.CurrentValue = version.OriginalValue + 1;
+            }
+        }
+        return autoDetectChanges;
+    }
 }
 
+/// <summary>
+/// Hot lookups are compiled once per process, so a call skips LINQ
+/// translation and goes straight to the cached SQL
+/// </summary>
 public class DiagnosticCaseRepository : IDiagnosticCaseRepository
 {
+    private static readonly Func<BioLensDbContext, Guid, CancellationToken, Task<DiagnosticCase?>> CaseById =
+        EF.CompileAsyncQuery((BioLensDbContext context, Guid id, CancellationToken _) =>
+            context.DiagnosticCases
+                .Include(c => c.Patient)
+                .FirstOrDefault(c => c.Id == id));
+
+    private static readonly Func<BioLensDbContext, Guid, int, IAsyncEnumerable<DiagnosticCaseSummary>> SummariesByWorker =
+        EF.CompileAsyncQuery((BioLensDbContext context, Guid healthcareWorkerId, int take) =>
+            context.DiagnosticCases
+                .Where(c => c.HealthcareWorkerId == healthcareWorkerId)
+                .OrderByDescending(c => c.CreatedAt)
+                .Take(take)
+                .Select(c => new DiagnosticCaseSummary(
+                    c.Id,
+                    c.Patient.AnonymizedId,
+                    c.Status,
+                    c.CreatedAt,
+                    c.CompletedAt,
+                    c.IsSyncedToCloud)));
+
     private readonly BioLensDbContext _context;
 
     public DiagnosticCaseRepository(BioLensDbContext context)
@@ -26,11 +112,9 @@ public class DiagnosticCaseRepository : IDiagnosticCaseRepository
         _context = context;
     }
 
-    public async Task<DiagnosticCase?> GetByIdAsync(Guid id, CancellationToken cancellationToken = default)
+    public Task<DiagnosticCase?> GetByIdAsync(Guid id, CancellationToken cancellationToken = default)
     {
-        return await _context.DiagnosticCases
-            .Include(c => c.Patient)
-            .FirstOrDefaultAsync(c => c.Id == id, cancellationToken);
+        return CaseById(_context, id, cancellationToken);
     }
 
     public async Task<Guid> AddAsync(DiagnosticCase diagnosticCase, CancellationToken cancellationToken = default)
@@ -40,22 +124,171 @@ public class DiagnosticCaseRepository : IDiagnosticCaseRepository
         return diagnosticCase.Id;
     }
 
+    /// <summary>
+    /// Writes only the columns the change tracker saw change, guarded by the
+    /// version read with the aggregate; the patient is never rewritten. The
+    /// case must have been loaded through this repository's context, since a
+    /// detached copy carries neither a snapshot nor the version it was read at.
+    /// </summary>
     public async Task UpdateAsync(DiagnosticCase diagnosticCase, CancellationToken cancellationToken = default)
     {
-        _context.DiagnosticCases.Update(diagnosticCase);
+        if (_context.Entry(diagnosticCase).State == EntityState.Detached)
+        {
+            throw new InvalidOperationException(
+                $"Case {diagnosticCase.Id} is not tracked; load it with GetByIdAsync before updating it");
+        }
+
         await _context.SaveChangesAsync(cancellationToken);
     }
 
-    public async Task<List<DiagnosticCase>> GetUnsyncedAsync(CancellationToken cancellationToken = default)
+    /// <summary>
+    /// Persists the transition to InProgress as one single-column UPDATE
+    /// without running change detection over the aggregate
+    /// </summary>
+    public Task StartDiagnosisAsync(DiagnosticCase diagnosticCase, CancellationToken cancellationToken = default)
+    {
+        diagnosticCase.StartDiagnosis();
+        return UpdateStatusAsync(diagnosticCase, cancellationToken);
+    }
+
+    /// <summary>
+    /// Hands a case whose diagnosis run failed back to Created, the same way
+    /// </summary>
+    public Task AbandonDiagnosisAsync(DiagnosticCase diagnosticCase, CancellationToken cancellationToken = default)
+    {
+        diagnosticCase.AbandonDiagnosis();
+        return UpdateStatusAsync(diagnosticCase, cancellationToken);
+    }
+
+    /// <summary>
+    /// Writes the case's current status in one UPDATE guarded by the version
+    /// it was read at (when tracked) and bumps the version
+    /// </summary>
+    private async Task UpdateStatusAsync(DiagnosticCase diagnosticCase, CancellationToken cancellationToken)
     {
-        return await _context.DiagnosticCases
-            .Where(c => !c.IsSyncedToCloud)
-            .ToListAsync(cancellationToken);
+        var status = diagnosticCase.Status;
+        var entry = _context.Entry(diagnosticCase);
+        var tracked = entry.State != EntityState.Detached;
+        var version = entry.Property<long>(BioLensDbContext.VersionProperty);
+        var expectedVersion = tracked ? version.OriginalValue : 0;
+
+        var query = _context.DiagnosticCases.Where(c => c.Id == diagnosticCase.Id);
+        if (tracked)
+        {
+            query = query.Where(c => EF.Property<long>(c, BioLensDbContext.VersionProperty) == expectedVersion);
+        }
+
+        var updated = await query.ExecuteUpdateAsync(setters => setters
+                .SetProperty(c => c.Status, status)
+                .SetProperty(
+                    c => EF.Property<long>(c, BioLensDbContext.VersionProperty),
+                    c => EF.Property<long>(c, BioLensDbContext.VersionProperty) + 1),
+            cancellationToken);
+
+        if (updated == 0)
+        {
+            throw new DbUpdateConcurrencyException(
+                $"Case {diagnosticCase.Id} was changed or removed since it was loaded");
+        }
+
+        if (tracked)
+        {
+            // The row already matches; keep the next SaveChanges from writing it again
+            entry.Property(c => c.Status).OriginalValue = status;
+            entry.Property(c => c.Status).IsModified = false;
+            version.OriginalValue = expectedVersion + 1;
+            version.CurrentValue = expectedVersion + 1;
+        }
+    }
+
+    /// <summary>
+    /// Flags an uploaded batch in one UPDATE, bumping each version so a copy
+    /// loaded before the upload cannot be saved over it unnoticed
+    /// </summary>
+    public Task<int> MarkSyncedAsync(IReadOnlyCollection<Guid> caseIds, CancellationToken cancellationToken = default)
+    {
+        return _context.DiagnosticCases
+            .Where(c => caseIds.Contains(c.Id) && !c.IsSyncedToCloud)
+            .ExecuteUpdateAsync(setters => setters
+                .SetProperty(c => c.IsSyncedToCloud, true)
+                .SetProperty(
+                    c => EF.Property<long>(c, BioLensDbContext.VersionProperty),
+                    c => EF.Property<long>(c, BioLensDbContext.VersionProperty) + 1),
+                cancellationToken);
+    }
+
+    /// <summary>
+    /// Keyset pagination on (CreatedAt, Id): each page seeks past the last
+    /// key it returned through the filtered unsynced index, so memory stays at
+    /// one page however large the backlog, and cases marked as synced while
+    /// the stream is read never shift the pages
+    /// </summary>
+    public async IAsyncEnumerable<DiagnosticCase> GetUnsyncedAsync(
+        int pageSize = 50,
+        [EnumeratorCancellation] CancellationToken cancellationToken = default)
+    {
+        DateTimeOffset? lastCreatedAt = null;
+        var lastId = Guid.Empty;
+
+        while (true)
+        {
+            var query = _context.DiagnosticCases
+                .AsNoTracking()
+                .Include(c => c.Patient)
+                .Where(c => !c.IsSyncedToCloud);
+
+            if (lastCreatedAt is { } createdAt)
+            {
+                query = query.Where(c => c.CreatedAt > createdAt
+                                         || (c.CreatedAt == createdAt && c.Id.CompareTo(lastId) > 0));
+            }
+
+            var page = await query
+                .OrderBy(c => c.CreatedAt)
+                .ThenBy(c => c.Id)
+                .Take(pageSize)
+                .ToListAsync(cancellationToken);
+
+            foreach (var diagnosticCase in page)
+            {
+                yield return diagnosticCase;
+            }
+
+            if (page.Count < pageSize)
+            {
+                yield break;
+            }
+
+            lastCreatedAt = page[^1].CreatedAt;
+            lastId = page[^1].Id;
+        }
+    }
+
+    /// <summary>
+    /// Projection: reads only the listed columns and never materializes or tracks the aggregate
+    /// </summary>
+    public async Task<List<DiagnosticCaseSummary>> GetSummariesByHealthcareWorkerAsync(
+        Guid healthcareWorkerId,
+        int take = 50,
+        CancellationToken cancellationToken = default)
+    {
+        var summaries = new List<DiagnosticCaseSummary>(take);
+        await foreach (var summary in SummariesByWorker(_context, healthcareWorkerId, take)
+                           .WithCancellation(cancellationToken))
+        {
+            summaries.Add(summary);
+        }
+        return summaries;
     }
 }
 
 public class PatientRepository : IPatientRepository
 {
+    // Seeks the unique AnonymizedId index
+    private static readonly Func<BioLensDbContext, string, CancellationToken, Task<Patient?>> PatientByAnonymizedId =
+        EF.CompileAsyncQuery((BioLensDbContext context, string anonymizedId, CancellationToken _) =>
+            context.Patients.FirstOrDefault(p => p.AnonymizedId == anonymizedId));
+
     private readonly BioLensDbContext _context;
 
     public PatientRepository(BioLensDbContext context)
@@ -63,12 +296,11 @@ public class PatientRepository : IPatientRepository
         _context = context;
     }
 
-    public async Task<Patient?> GetByAnonymizedIdAsync(
+    public Task<Patient?> GetByAnonymizedIdAsync(
         string anonymizedId,
         CancellationToken cancellationToken = default)
     {
-        return await _context.Patients
-            .FirstOrDefaultAsync(p => p.AnonymizedId == anonymizedId, cancellationToken);
+        return PatientByAnonymizedId(_context, anonymizedId, cancellationToken);
     }
 
     public async Task<Guid> AddAsync(Patient patient, CancellationToken cancellationToken = default)
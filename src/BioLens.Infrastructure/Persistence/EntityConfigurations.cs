@@ -0,0 +1,111 @@
+using System.Text.Json;
+using BioLens.Domain.Entities;
+using BioLens.Domain.ValueObjects;
+using Microsoft.EntityFrameworkCore;
+using Microsoft.EntityFrameworkCore.ChangeTracking;
+using Microsoft.EntityFrameworkCore.Metadata.Builders;
+using Microsoft.EntityFrameworkCore.Storage.ValueConversion;
+
+namespace BioLens.Infrastructure.Persistence;
+
+/// <summary>
+/// Picked up by ApplyConfigurationsFromAssembly in BioLensDbContext
+/// </summary>
+public class DiagnosticCaseConfiguration : IEntityTypeConfiguration<DiagnosticCase>
+{
+    public void Configure(EntityTypeBuilder<DiagnosticCase> builder)
+    {
+        builder.HasKey(c => c.Id);
+        builder.Ignore(c => c.DomainEvents);
+        builder.Property<long>(BioLensDbContext.VersionProperty).IsConcurrencyToken();
+
+        builder.HasOne(c => c.Patient)
+            .WithMany()
+            .HasForeignKey("PatientId")
+            .IsRequired();
+
+        // SQLite cannot order or compare DateTimeOffset; store it as a sortable integer
+        builder.Property(c => c.CreatedAt)
+            .HasConversion(new DateTimeOffsetToBinaryConverter());
+        builder.Property(c => c.CompletedAt)
+            .HasConversion(new DateTimeOffsetToBinaryConverter());
+
+        // Value objects are only ever loaded with their case, so each is one JSON column
+        builder.Property(c => c.Context).HasJsonConversion();
+        builder.Property(c => c.AudioDescription).HasJsonConversion();
+        builder.Property(c => c.PrimaryDiagnosis).HasJsonConversion();
+        builder.Property(c => c.RecommendedProtocol).HasJsonConversion();
+
+        builder.Ignore(c => c.Images);
+        builder.Property<List<MedicalImage>>("_images")
+            .HasColumnName("Images")
+            .HasJsonConversion();
+
+        builder.Ignore(c => c.AlternativeDiagnoses);
+        builder.Property<List<DifferentialDiagnosis>>("_alternativeDiagnoses")
+            .HasColumnName("AlternativeDiagnoses")
+            .HasJsonConversion();
+
+        // Partial index over the sync backlog only, in keyset order; synced
+        // cases, the vast majority over time, are not in it
+        builder.HasIndex(c => new { c.CreatedAt, c.Id })
+            .HasDatabaseName("IX_DiagnosticCases_Unsynced")
+            .HasFilter("\"IsSyncedToCloud\" = 0");
+
+        // Covers the health worker's recent-cases view
+        builder.HasIndex(c => new { c.HealthcareWorkerId, c.CreatedAt });
+    }
+}
+
+public class PatientConfiguration : IEntityTypeConfiguration<Patient>
+{
+    public void Configure(EntityTypeBuilder<Patient> builder)
+    {
+        builder.HasKey(p => p.Id);
+        builder.Ignore(p => p.DomainEvents);
+        builder.Property<long>(BioLensDbContext.VersionProperty).IsConcurrencyToken();
+
+        // Every command resolves its patient by this id
+        builder.Property(p => p.AnonymizedId)
+            .IsRequired()
+            .HasMaxLength(64);
+        builder.HasIndex(p => p.AnonymizedId)
+            .IsUnique();
+
+        builder.Property(p => p.CreatedAt)
+            .HasConversion(new DateTimeOffsetToBinaryConverter());
+
+        builder.Ignore(p => p.MedicalHistory);
+        builder.Property<List<KnownCondition>>("_medicalHistory")
+            .HasColumnName("MedicalHistory")
+            .HasJsonConversion();
+
+        builder.Ignore(p => p.KnownAllergies);
+        builder.Property<List<Allergy>>("_knownAllergies")
+            .HasColumnName("KnownAllergies")
+            .HasJsonConversion();
+    }
+}
+
+internal static class JsonColumnExtensions
+{
+    private static readonly JsonSerializerOptions SerializerOptions = new(JsonSerializerDefaults.General);
+
+    /// <summary>
+    /// Stores the value as JSON text; the comparer works on the serialized
+    /// form, so mutating a list or replacing a record marks the column dirty
+    /// </summary>
+    public static PropertyBuilder<T> HasJsonConversion<T>(this PropertyBuilder<T> property)
+    {
+        property.HasConversion(
+            value => JsonSerializer.Serialize(value, SerializerOptions),
+            json => JsonSerializer.Deserialize<T>(json, SerializerOptions)!,
+            new ValueComparer<T>(
+                (left, right) => JsonSerializer.Serialize(left, SerializerOptions)
+                                 == JsonSerializer.Serialize(right, SerializerOptions),
+                value => JsonSerializer.Serialize(value, SerializerOptions).GetHashCode(),
+                value => JsonSerializer.Deserialize<T>(
+                    JsonSerializer.Serialize(value, SerializerOptions), SerializerOptions)!));
+        return property;
+    }
+}
@@ -0,0 +1,124 @@
+using System.Data.Common;
+using System.Runtime.CompilerServices;
+using BioLens.Domain.Repositories;
+using Microsoft.Data.Sqlite;
+using Microsoft.EntityFrameworkCore;
+using Microsoft.EntityFrameworkCore.Diagnostics;
+using Microsoft.Extensions.DependencyInjection;
+using Microsoft.Extensions.Options;
+
+namespace BioLens.Infrastructure.Persistence;
+
+/// <summary>
+/// Tunes every physical SQLite connection once, when it is first opened
+/// WAL lets background sync read while a capture is being written, and
+/// synchronous=NORMAL is durable in WAL mode except for the last commits
+/// before a power loss. Pooled connections keep their settings, so reopening
+/// one from the pool costs nothing extra.
+/// </summary>
+public sealed class SqlitePragmaInterceptor : DbConnectionInterceptor
+{
+    private readonly ConditionalWeakTable<object, object> _tuned = new();
+    private readonly string _pragmas;
+
+    public SqlitePragmaInterceptor(DatabaseOptions options)
+    {
+        _pragmas = string.Join(' ',
+            "PRAGMA journal_mode=WAL;",
+            "PRAGMA synchronous=NORMAL;",
+            "PRAGMA temp_store=MEMORY;",
+            $"PRAGMA mmap_size={options.MmapSizeMb * 1024L * 1024L};",
+            // Negative sizes are in KiB rather than pages
+            $"PRAGMA cache_size={-options.CacheSizeKb};",
+            $"PRAGMA busy_timeout={options.BusyTimeoutMs};");
+    }
+
+    public override void ConnectionOpened(DbConnection connection, ConnectionEndEventData eventData)
+    {
+        if (NeedsTuning(connection))
+        {
+            using var command = connection.CreateCommand();
+            command.CommandText = _pragmas;
+            command.ExecuteNonQuery();
+        }
+    }
+
+    public override async Task ConnectionOpenedAsync(
+        DbConnection connection,
+        ConnectionEndEventData eventData,
+        CancellationToken cancellationToken = default)
+    {
+        if (NeedsTuning(connection))
+        {
+            await using var command = connection.CreateCommand();
+            command.CommandText = _pragmas;
+            await command.ExecuteNonQueryAsync(cancellationToken);
+        }
+    }
+
+    /// <summary>
+    /// Keyed on the native handle, which survives the SqliteConnection being
+    /// returned to and taken from the pool
+    /// </summary>
+    private bool NeedsTuning(DbConnection connection)
+    {
+        if (connection is not SqliteConnection { Handle: { } handle })
+            return false;
+
+        lock (_tuned)
+        {
+            if (_tuned.TryGetValue(handle, out _))
+                return false;
+            _tuned.Add(handle, handle);
+            return true;
+        }
+    }
+}
+
+/// <summary>
+/// Bound to the Database configuration section
+/// </summary>
+public class DatabaseOptions
+{
+    public string ConnectionString { get; set; } = "Data Source=biolens.db";
+    public bool EnableSensitiveDataLogging { get; set; }
+    public int MmapSizeMb { get; set; } = 64;
+    public int CacheSizeKb { get; set; } = 8192;
+    public int BusyTimeoutMs { get; set; } = 5000;
+}
+
+public static class PersistenceServiceCollectionExtensions
+{
+    /// <summary>
+    /// Registers one pool of contexts for both uses: IDbContextFactory for
+    /// background work such as sync, and a scoped BioLensDbContext for
+    /// request handlers and repositories, rented from the same pool and
+    /// returned to it when the scope ends
+    /// </summary>
+    public static IServiceCollection AddBioLensPersistence(this IServiceCollection services, int poolSize = 32)
+    {
+        services.AddSingleton(provider =>
+            new SqlitePragmaInterceptor(provider.GetRequiredService<IOptions<DatabaseOptions>>().Value));
+
+        services.AddPooledDbContextFactory<BioLensDbContext>((provider, builder) =>
+        {
+            var settings = provider.GetRequiredService<IOptions<DatabaseOptions>>().Value;
+            var connectionString = new SqliteConnectionStringBuilder(settings.ConnectionString)
+            {
+                Pooling = true,
+                Cache = SqliteCacheMode.Private
+            }.ToString();
+
+            builder
+                .UseSqlite(connectionString)
+                .AddInterceptors(provider.GetRequiredService<SqlitePragmaInterceptor>())
+                .EnableSensitiveDataLogging(settings.EnableSensitiveDataLogging);
+        }, poolSize);
+
+        services.AddScoped(provider =>
+            provider.GetRequiredService<IDbContextFactory<BioLensDbContext>>().CreateDbContext());
+        services.AddScoped<IDiagnosticCaseRepository, DiagnosticCaseRepository>();
+        services.AddScoped<IPatientRepository, PatientRepository>();
+        return services;
+    }
+}
@@ -1,8 +1,14 @@
+using System.Text.Json;
 using BioLens.Agents.Core;
 using BioLens.Domain.Entities;
 using BioLens.Domain.Enums;
 using BioLens.Domain.ValueObjects;
+using BioLens.Infrastructure.AI;
+using BioLens.Infrastructure.Imaging;
+using Microsoft.Extensions.Logging.Abstractions;
+using Microsoft.Extensions.Options;
 using Microsoft.SemanticKernel;
+using SkiaSharp;
 using Xunit;
 
 namespace BioLens.Agents.Tests;
@@ -49,6 +55,102 @@ public class DiagnosticCoordinatorAgentTests
         Assert.NotNull(response);
         Assert.True(response.IsSuccess || response.Messages.Any()); // Either succeeds or has explanation
     }
+
+    [Fact]
+    public async Task ExecuteAsync_WithoutAudioDescription_ShouldSkipAudioStep()
+    {
+        // Arrange
+        var kernel = Kernel.CreateBuilder().Build();
+        var coordinator = new DiagnosticCoordinatorAgent(
+            kernel,
+            new ImageAnalysisAgent(kernel),
+            new AudioTranscriptionAgent(kernel),
+            new MedicalReasoningAgent(kernel),
+            new TreatmentPlannerAgent(kernel));
+
+        var patient = new Patient("PAT_TEST_002", 4, AgeUnit.Years, BiologicalSex.Female);
+        var context = new ContextualInformation(
+            new GeographicRegion("Test", "Test", null, 0, 0),
+            new List<string> { "Paracetamol" },
+            new List<string> { "Malaria" },
+            FacilityCapabilities.BasicHealthPost,
+            new CulturalConsiderations("en", new(), new()));
+
+        var diagnosticCase = new DiagnosticCase(patient, Guid.NewGuid(), context);
+
+        var request = new AgentRequest(
+            Guid.NewGuid().ToString(),
+            "RunDiagnosis",
+            new Dictionary<string, object> { ["case"] = diagnosticCase },
+            new AgentContext(diagnosticCase.Id, new Dictionary<string, object>()));
+
+        // Act
+        var response = await coordinator.ExecuteAsync(request);
+
+        // Assert
+        Assert.DoesNotContain("🎤 Processing audio symptoms...", response.Messages);
+        Assert.DoesNotContain("NullReferenceException", response.Metadata.GetValueOrDefault("error")?.ToString() ?? "");
+        Assert.True(response.Metadata.ContainsKey("stepDurationsMs"));
+    }
+
+    [Fact]
+    public async Task ExecuteAsync_WithImagesAndAudio_ShouldRunBothStepsConcurrently()
+    {
+        // Arrange: the fake API answers nothing until released, so a sequential run stalls at one call
+        var directory = Directory.CreateTempSubdirectory("biolens-workflow-").FullName;
+        try
+        {
+            var handler = new FakeGeminiHandler(blocked: true);
+            await using var gemini = GeminiTestServices.Create(handler);
+            var kernel = Kernel.CreateBuilder().Build();
+            var coordinator = new DiagnosticCoordinatorAgent(
+                kernel,
+                new ImageAnalysisAgent(kernel, gemini: gemini),
+                new AudioTranscriptionAgent(kernel, gemini),
+                new MedicalReasoningAgent(kernel, gemini),
+                new TreatmentPlannerAgent(kernel, gemini));
+
+            var patient = new Patient("PAT_TEST_003", 7, AgeUnit.Years, BiologicalSex.Male);
+            var context = new ContextualInformation(
+                new GeographicRegion("Test", "Test", null, 0, 0),
+                new List<string> { "Paracetamol" },
+                new List<string> { "Measles" },
+                FacilityCapabilities.BasicHealthPost,
+                new CulturalConsiderations("en", new(), new()));
+            var diagnosticCase = new DiagnosticCase(patient, Guid.NewGuid(), context);
+            diagnosticCase.AddMedicalImage(TestCaptures.Write(Path.Combine(directory, "rash.png"), SKColors.Red));
+            diagnosticCase.SetAudioDescription(new AudioSymptomDescription(
+                Guid.NewGuid(),
+                Path.Combine(directory, "symptoms.m4a"),
+                null,
+                "en",
+                12,
+                "Fever and rash for three days",
+                DateTimeOffset.UtcNow));
+
+            var request = new AgentRequest(
+                Guid.NewGuid().ToString(),
+                "RunDiagnosis",
+                new Dictionary<string, object> { ["case"] = diagnosticCase },
+                new AgentContext(diagnosticCase.Id, new Dictionary<string, object>()));
+
+            // Act
+            var run = coordinator.ExecuteAsync(request);
+            await handler.WaitForCallsAsync(2);
+            var callsBeforeRelease = handler.Calls;
+            handler.Release();
+            var response = await run.WaitAsync(TimeSpan.FromSeconds(10));
+
+            // Assert: image and audio both reached the API before either was answered
+            Assert.Equal(2, callsBeforeRelease);
+            Assert.Contains("🔍 Analyzing medical images...", response.Messages);
+            Assert.Contains("🎤 Processing audio symptoms...", response.Messages);
+        }
+        finally
+        {
+            Directory.Delete(directory, recursive: true);
+        }
+    }
 }
 
 public class ImageAnalysisAgentTests
@@ -84,6 +186,109 @@ public class ImageAnalysisAgentTests
         Assert.NotNull(response);
         Assert.Contains("Analyzed", response.Messages[0]);
     }
+
+    [Fact]
+    public async Task ExecuteAsync_WithPreprocessor_ShouldUploadPreparedImages()
+    {
+        // Arrange
+        var directory = Directory.CreateTempSubdirectory("biolens-upload-").FullName;
+        try
+        {
+            var capture = TestCaptures.Write(Path.Combine(directory, "rash.png"), SKColors.Red);
+            var requestBody = "";
+            var handler = new FakeGeminiHandler(body =>
+            {
+                requestBody = body;
+                return $"{{\"findings\": [{{\"imageId\": \"{capture.Id}\", \"observations\": [\"erythema\"]}}]}}";
+            });
+            await using var gemini = GeminiTestServices.Create(handler);
+            var preprocessor = new ImagePreprocessor(
+                Options.Create(new ImagePreprocessingOptions()), NullLogger<ImagePreprocessor>.Instance);
+            var agent = new ImageAnalysisAgent(
+                Kernel.CreateBuilder().Build(), preprocessor: preprocessor, gemini: gemini);
+
+            var request = new AgentRequest(
+                Guid.NewGuid().ToString(),
+                "AnalyzeImages",
+                new Dictionary<string, object> { ["images"] = new List<MedicalImage> { capture } },
+                new AgentContext(Guid.NewGuid(), new Dictionary<string, object>()));
+
+            // Act
+            var response = await agent.ExecuteAsync(request);
+
+            // Assert: the prepared JPEG, not the PNG capture, went up inline
+            var prepared = await preprocessor.PrepareAsync(capture);
+            Assert.True(response.IsSuccess);
+            Assert.Equal(1, handler.Calls);
+            Assert.Contains("\"mime_type\":\"image/jpeg\"", requestBody);
+            Assert.Contains(Convert.ToBase64String(await File.ReadAllBytesAsync(prepared.FilePath)), requestBody);
+        }
+        finally
+        {
+            Directory.Delete(directory, recursive: true);
+        }
+    }
+
+    [Fact]
+    public async Task ExecuteAsync_WithSamePerceptualHashButDifferentImages_ShouldNotShareFindings()
+    {
+        // Arrange: two patients' captures that collide on pHash, and a byte-identical copy of the first
+        var directory = Directory.CreateTempSubdirectory("biolens-index-").FullName;
+        try
+        {
+            const ulong collidingHash = 0xF0F0_F0F0_F0F0_F0F0;
+            var first = TestCaptures.Write(Path.Combine(directory, "patient-a.png"), SKColors.Red)
+                with { PerceptualHash = collidingHash };
+            var second = TestCaptures.Write(Path.Combine(directory, "patient-b.png"), SKColors.Blue)
+                with { PerceptualHash = collidingHash };
+            var copyPath = Path.Combine(directory, "patient-a-copy.png");
+            File.Copy(first.LocalFilePath, copyPath);
+            var copy = first with { Id = Guid.NewGuid(), LocalFilePath = copyPath };
+
+            var observation = "";
+            var handler = new FakeGeminiHandler(body =>
+            {
+                var imageId = new[] { first, second, copy }.First(i => body.Contains(i.Id.ToString())).Id;
+                return $"{{\"findings\": [{{\"imageId\": \"{imageId}\", \"observations\": [\"{observation}\"]}}]}}";
+            });
+            await using var gemini = GeminiTestServices.Create(handler);
+            var fingerprintOptions = Options.Create(new ImageFingerprintOptions
+            {
+                IndexDatabasePath = Path.Combine(directory, "fingerprints.db")
+            });
+            using var index = new LiteDbImageFindingsIndex(fingerprintOptions);
+            var agent = new ImageAnalysisAgent(
+                Kernel.CreateBuilder().Build(),
+                fingerprinter: new PerceptualImageFingerprinter(fingerprintOptions),
+                findingsIndex: index,
+                gemini: gemini);
+
+            // Act: three cases, one image each
+            observation = "patient A lesion";
+            var firstResponse = await agent.ExecuteAsync(Request(first));
+            observation = "patient B lesion";
+            var secondResponse = await agent.ExecuteAsync(Request(second));
+            var copyResponse = await agent.ExecuteAsync(Request(copy));
+
+            // Assert: only the byte-identical copy reuses stored findings
+            Assert.Equal(2, handler.Calls);
+            Assert.False(secondResponse.Metadata.ContainsKey("reusedFindings"));
+            Assert.DoesNotContain("patient A", JsonSerializer.Serialize(secondResponse.Result));
+            Assert.Equal(1, copyResponse.Metadata["reusedFindings"]);
+            Assert.Contains("patient A lesion", JsonSerializer.Serialize(copyResponse.Result));
+            Assert.True(firstResponse.IsSuccess);
+        }
+        finally
+        {
+            Directory.Delete(directory, recursive: true);
+        }
+    }
+
+    private static AgentRequest Request(MedicalImage image) => new(
+        Guid.NewGuid().ToString(),
+        "AnalyzeImages",
+        new Dictionary<string, object> { ["images"] = new List<MedicalImage> { image } },
+        new AgentContext(Guid.NewGuid(), new Dictionary<string, object>()));
 }
 
 public class MedicalReasoningAgentTests
@@ -133,3 +338,121 @@ public class MedicalReasoningAgentTests
         Assert.NotNull(response);
     }
 }
+
+public class TreatmentPlannerAgentTests
+{
+    [Fact]
+    public async Task ExecuteAsync_WithConcurrentIdenticalRequests_ShouldMakeOneGeminiCall()
+    {
+        // Arrange: the fake API holds the first call until the second has joined it
+        var handler = new FakeGeminiHandler(_ => "{\"protocolName\": \"ORS and zinc\"}", blocked: true);
+        var logger = new RecordingLogger<ScheduledGeminiAIService>();
+        await using var gemini = GeminiTestServices.Create(handler, logger: logger);
+        var kernel = Kernel.CreateBuilder().Build();
+
+        var context = new ContextualInformation(
+            new GeographicRegion("Kenya", "Turkana", null, 3.12, 35.6),
+            new List<string> { "ORS", "Zinc" },
+            new List<string> { "Cholera" },
+            FacilityCapabilities.BasicHealthPost,
+            new CulturalConsiderations("sw", new(), new()));
+        var request = new AgentRequest(
+            Guid.NewGuid().ToString(),
+            "PlanTreatment",
+            new Dictionary<string, object>
+            {
+                ["diagnosis"] = new { conditionName = "Acute watery diarrhoea" },
+                ["context"] = context
+            },
+            new AgentContext(Guid.NewGuid(), new Dictionary<string, object>()));
+
+        // Act
+        var first = new TreatmentPlannerAgent(kernel, gemini).ExecuteAsync(request);
+        var second = new TreatmentPlannerAgent(kernel, gemini).ExecuteAsync(request);
+        await handler.WaitForCallsAsync(1);
+        await logger.WaitForAsync("Joined an identical Gemini call");
+        handler.Release();
+        var responses = await Task.WhenAll(first, second).WaitAsync(TimeSpan.FromSeconds(5));
+
+        // Assert
+        Assert.Equal(1, handler.Calls);
+        Assert.All(responses, r => Assert.True(r.IsSuccess));
+        Assert.All(responses, r => Assert.Contains("ORS and zinc", r.Result!.ToString()));
+    }
+
+    [Fact]
+    public async Task ExecuteAsync_WithRepeatedCase_ShouldReportOfflineCache()
+    {
+        // Arrange: memory-only response cache in front of the fake API
+        var handler = new FakeGeminiHandler(_ => "{\"protocolName\": \"ORS and zinc\"}");
+        await using var gemini = GeminiTestServices.Create(
+            handler, cache: new GeminiCacheOptions { DatabasePath = "" });
+        var agent = new TreatmentPlannerAgent(Kernel.CreateBuilder().Build(), gemini);
+
+        var context = new ContextualInformation(
+            new GeographicRegion("Kenya", "Turkana", null, 3.12, 35.6),
+            new List<string> { "ORS", "Zinc" },
+            new List<string> { "Cholera" },
+            FacilityCapabilities.BasicHealthPost,
+            new CulturalConsiderations("sw", new(), new()));
+        var request = new AgentRequest(
+            Guid.NewGuid().ToString(),
+            "PlanTreatment",
+            new Dictionary<string, object>
+            {
+                ["diagnosis"] = new { conditionName = "Acute watery diarrhoea" },
+                ["context"] = context
+            },
+            new AgentContext(Guid.NewGuid(), new Dictionary<string, object>()));
+
+        // Act
+        var first = await agent.ExecuteAsync(request);
+        var repeated = await agent.ExecuteAsync(request);
+
+        // Assert
+        Assert.Equal(1, handler.Calls);
+        Assert.Equal(DiagnosisSource.GeminiAI, first.Metadata["source"]);
+        Assert.Equal(DiagnosisSource.OfflineCache, repeated.Metadata["source"]);
+        Assert.Contains("ORS and zinc", repeated.Result!.ToString());
+    }
+}
+
+public class IncrementalJsonObjectReaderTests
+{
+    [Fact]
+    public void Append_ShouldSurfacePropertiesBeforeObjectCompletes()
+    {
+        // Arrange
+        var reader = new IncrementalJsonObjectReader();
+
+        // Act
+        var first = reader.Append("```json\n{\"primaryDiagnosis\": {\"conditionName\": \"Malaria, \\\"severe\\\"\",");
+        var second = reader.Append(" \"urgency\": \"Emergency\"}, \"alternativeDiagnoses\": [{\"conditionName\"");
+        var third = reader.Append(": \"Typhoid\"}]}");
+
+        // Assert
+        Assert.Empty(first);
+        var primary = Assert.Single(second);
+        Assert.Equal("primaryDiagnosis", primary.Key);
+        Assert.Equal("Emergency", primary.Value.GetProperty("urgency").GetString());
+        Assert.Equal("alternativeDiagnoses", Assert.Single(third).Key);
+        Assert.True(reader.IsCompleted);
+    }
+
+    [Fact]
+    public void Append_WithProsePreamble_ShouldStartAtFirstBraceOutsideAString()
+    {
+        // Arrange: quoted braces, a stray inch mark and brackets before the real object
+        var reader = new IncrementalJsonObjectReader();
+
+        // Act
+        var preamble = reader.Append("Updated the \"{draft}\" plan for the 5\" lesion [see notes]:\n```json\n");
+        var properties = reader.Append("{\"urgency\": \"Emergency\", \"notes\": [\"{not a root}\"]}");
+
+        // Assert
+        Assert.Empty(preamble);
+        Assert.Equal(new[] { "urgency", "notes" }, properties.Select(p => p.Key));
+        Assert.Equal("Emergency", properties[0].Value.GetString());
+        Assert.True(reader.IsCompleted);
+    }
+}
@@ -0,0 +1,284 @@
+using System.Net;
+using BioLens.Domain.Enums;
+using BioLens.Infrastructure.AI;
+using Microsoft.Extensions.Logging.Abstractions;
+using Microsoft.Extensions.Options;
+using Polly;
+using Polly.Timeout;
+using Xunit;
+
+namespace BioLens.Agents.Tests.Infrastructure;
+
+public class ScheduledGeminiAIServiceTests
+{
+    [Fact]
+    public async Task DisposeAsync_ShouldCancelEveryQueuedBacklogCall()
+    {
+        // Arrange: one backlog slot, held by a call the fake API never answers
+        var handler = new FakeGeminiHandler(blocked: true);
+        var service = GeminiTestServices.Create(handler, new GeminiSchedulingOptions { BacklogConcurrency = 1 });
+
+        List<Task<GeminiResult>> calls;
+        using (GeminiWorkloadScope.Backlog())
+        {
+            calls = Enumerable.Range(0, 3)
+                .Select(i => service.GenerateAsync($"Backlog case {i}"))
+                .ToList();
+        }
+        await handler.WaitForCallsAsync(1);
+
+        // Act
+        await service.DisposeAsync();
+
+        // Assert: the running call, the one waiting for a slot and the queued one all end
+        foreach (var call in calls)
+        {
+            await Assert.ThrowsAnyAsync<OperationCanceledException>(() => call.WaitAsync(TimeSpan.FromSeconds(5)));
+        }
+        Assert.Equal(1, handler.Calls);
+    }
+
+    [Fact]
+    public async Task GenerateAsync_Interactive_ShouldNotWaitBehindMatchingQueuedBacklogCall()
+    {
+        // Arrange: an unrelated call holds the only backlog slot, so the matching backlog call stays queued
+        var handler = new FakeGeminiHandler(hold: body => body.Contains("Unrelated case"));
+        await using var service = GeminiTestServices.Create(handler, new GeminiSchedulingOptions { BacklogConcurrency = 1 });
+
+        Task<GeminiResult> queued;
+        using (GeminiWorkloadScope.Backlog())
+        {
+            _ = service.GenerateAsync("Unrelated case");
+            await handler.WaitForCallsAsync(1);
+            queued = service.GenerateAsync("Fever and rash for 3 days");
+        }
+
+        // Act
+        var interactive = await service.GenerateAsync("Fever and rash for 3 days").WaitAsync(TimeSpan.FromSeconds(5));
+
+        // Assert: the interactive call made its own request while the backlog copy still waits
+        Assert.Equal(DiagnosisSource.GeminiAI, interactive.Source);
+        Assert.Equal(2, handler.Calls);
+        Assert.False(queued.IsCompleted);
+
+        handler.Release();
+        await queued.WaitAsync(TimeSpan.FromSeconds(5));
+    }
+
+    [Fact]
+    public async Task StreamContentAsync_InBacklog_ShouldWaitForABacklogSlot()
+    {
+        // Arrange: a queued backlog call holds the only backlog slot
+        var handler = new FakeGeminiHandler(hold: body => body.Contains("Held case"));
+        await using var service = GeminiTestServices.Create(handler, new GeminiSchedulingOptions { BacklogConcurrency = 1 });
+
+        Task<GeminiResult> held;
+        Task<List<string>> stream;
+        using (GeminiWorkloadScope.Backlog())
+        {
+            held = service.GenerateAsync("Held case");
+            await handler.WaitForCallsAsync(1);
+
+            // Act
+            stream = CollectAsync(service.StreamContentAsync("Streamed case"));
+        }
+        await Task.Delay(200);
+
+        // Assert: the stream only reaches the API once the slot is free
+        Assert.Equal(1, handler.Calls);
+        Assert.False(stream.IsCompleted);
+
+        handler.Release();
+        await held.WaitAsync(TimeSpan.FromSeconds(5));
+        Assert.Single(await stream.WaitAsync(TimeSpan.FromSeconds(5)));
+        Assert.Equal(2, handler.Calls);
+    }
+
+    private static async Task<List<string>> CollectAsync(IAsyncEnumerable<string> chunks)
+    {
+        var collected = new List<string>();
+        await foreach (var chunk in chunks)
+        {
+            collected.Add(chunk);
+        }
+        return collected;
+    }
+}
+
+public class GeminiResilienceTests
+{
+    [Fact]
+    public async Task Pipeline_WithTransientFailures_ShouldHedgeThenRetryUntilSuccess()
+    {
+        // Arrange: each retry round is a primary attempt plus one hedge fired by its failure
+        var resilience = Resilience(new GeminiResilienceOptions { RetryBaseDelayMs = 1 });
+        var attempts = 0;
+
+        // Act
+        using var response = await ExecuteAsync(resilience, _ => Task.FromResult(
+            Interlocked.Increment(ref attempts) < 4
+                ? new HttpResponseMessage(HttpStatusCode.ServiceUnavailable)
+                : new HttpResponseMessage(HttpStatusCode.OK)));
+
+        // Assert
+        Assert.Equal(HttpStatusCode.OK, response.StatusCode);
+        Assert.Equal(4, attempts);
+    }
+
+    [Fact]
+    public async Task Pipeline_WithBodyThatCannotBeResent_ShouldMakeOneAttempt()
+    {
+        // Arrange
+        var resilience = Resilience(new GeminiResilienceOptions { RetryBaseDelayMs = 1 });
+        var attempts = 0;
+
+        // Act
+        using var response = await ExecuteAsync(resilience, _ =>
+        {
+            Interlocked.Increment(ref attempts);
+            return Task.FromResult(new HttpResponseMessage(HttpStatusCode.ServiceUnavailable));
+        }, canRetry: false, canHedge: false);
+
+        // Assert
+        Assert.Equal(HttpStatusCode.ServiceUnavailable, response.StatusCode);
+        Assert.Equal(1, attempts);
+    }
+
+    [Fact]
+    public async Task Pipeline_WithSlowAttempt_ShouldReturnHedgedResponseAndCancelTheSlowOne()
+    {
+        // Arrange: the first attempt never answers on its own
+        var resilience = Resilience(new GeminiResilienceOptions { HedgingDelayMs = 50 });
+        var slowAttemptCancelled = new TaskCompletionSource(TaskCreationOptions.RunContinuationsAsynchronously);
+        var attempts = 0;
+
+        // Act
+        using var response = await ExecuteAsync(resilience, async cancellationToken =>
+        {
+            if (Interlocked.Increment(ref attempts) > 1)
+            {
+                return new HttpResponseMessage(HttpStatusCode.OK);
+            }
+            using var registration = cancellationToken.Register(() => slowAttemptCancelled.TrySetResult());
+            await Task.Delay(Timeout.Infinite, cancellationToken);
+            return new HttpResponseMessage(HttpStatusCode.OK);
+        });
+
+        // Assert
+        Assert.Equal(HttpStatusCode.OK, response.StatusCode);
+        Assert.Equal(2, attempts);
+        await slowAttemptCancelled.Task.WaitAsync(TimeSpan.FromSeconds(5));
+    }
+
+    [Fact]
+    public async Task Pipeline_WithHungAttempt_ShouldTimeItOutAndRetry()
+    {
+        // Arrange: hedging off, so only the per-attempt timeout can end the first attempt
+        var resilience = Resilience(new GeminiResilienceOptions { AttemptTimeoutSeconds = 1, RetryBaseDelayMs = 1 });
+        var attempts = 0;
+
+        // Act
+        using var response = await ExecuteAsync(resilience, async cancellationToken =>
+        {
+            if (Interlocked.Increment(ref attempts) == 1)
+            {
+                await Task.Delay(Timeout.Infinite, cancellationToken);
+            }
+            return new HttpResponseMessage(HttpStatusCode.OK);
+        }, canHedge: false);
+
+        // Assert
+        Assert.Equal(HttpStatusCode.OK, response.StatusCode);
+        Assert.Equal(2, attempts);
+    }
+
+    [Fact]
+    public async Task Pipeline_WhenEveryAttemptHangs_ShouldStopAtTheTotalTimeout()
+    {
+        // Arrange
+        var resilience = Resilience(new GeminiResilienceOptions { TotalTimeoutSeconds = 1, HedgingDelayMs = 100 });
+
+        // Act & Assert
+        await Assert.ThrowsAsync<TimeoutRejectedException>(() => ExecuteAsync(resilience, async cancellationToken =>
+        {
+            await Task.Delay(Timeout.Infinite, cancellationToken);
+            return new HttpResponseMessage(HttpStatusCode.OK);
+        }).WaitAsync(TimeSpan.FromSeconds(10)));
+    }
+
+    private static GeminiResilience Resilience(GeminiResilienceOptions options) =>
+        new(Options.Create(options), NullLogger<GeminiResilience>.Instance);
+
+    /// <summary>
+    /// Runs one logical call the way GeminiAIService does, flagging whether the body can be resent
+    /// </summary>
+    private static async Task<HttpResponseMessage> ExecuteAsync(
+        GeminiResilience resilience,
+        Func<CancellationToken, Task<HttpResponseMessage>> attempt,
+        bool canRetry = true,
+        bool canHedge = true)
+    {
+        var context = ResilienceContextPool.Shared.Get();
+        context.Properties.Set(GeminiResilience.CanRetryKey, canRetry);
+        context.Properties.Set(GeminiResilience.CanHedgeKey, canHedge);
+        try
+        {
+            return await resilience.Pipeline.ExecuteAsync(
+                async attemptContext => await attempt(attemptContext.CancellationToken),
+                context);
+        }
+        finally
+        {
+            ResilienceContextPool.Shared.Return(context);
+        }
+    }
+}
+
+public class GeminiResponseCacheTests
+{
+    [Fact]
+    public void Set_BeyondStoreSize_ShouldEvictLeastRecentlyUsedAcrossRestarts()
+    {
+        // Arrange: memory tier off, so every lookup reads the store
+        var path = Path.Combine(Path.GetTempPath(), $"biolens-cache-{Guid.NewGuid():N}.db");
+        var options = Options.Create(new GeminiCacheOptions
+        {
+            MemoryCacheSizeMb = 0,
+            StoreSizeMb = 1,
+            DatabasePath = path
+        });
+        var body = new string('x', 400 * 1024);
+
+        try
+        {
+            using (var cache = new GeminiResponseCache(options))
+            {
+                cache.Set("a", body);
+                Thread.Sleep(10);
+                cache.Set("b", body);
+                Thread.Sleep(10);
+                Assert.True(cache.TryGet("a", out _));
+                Thread.Sleep(10);
+            }
+
+            // Act: the reopened store must count the two entries it already holds
+            using (var cache = new GeminiResponseCache(options))
+            {
+                cache.Set("c", body);
+
+                // Assert
+                Assert.False(cache.TryGet("b", out _));
+                Assert.True(cache.TryGet("a", out _));
+                Assert.True(cache.TryGet("c", out var text));
+                Assert.Equal(body, text);
+            }
+        }
+        finally
+        {
+            foreach (var file in Directory.GetFiles(Path.GetDirectoryName(path)!, Path.GetFileNameWithoutExtension(path) + "*"))
+            {
+                File.Delete(file);
+            }
+        }
+    }
+}
@@ -0,0 +1,106 @@
+using BioLens.Domain.Entities;
+using BioLens.Domain.Enums;
+using BioLens.Domain.ValueObjects;
+using BioLens.Infrastructure.Imaging;
+using Microsoft.Extensions.Logging.Abstractions;
+using Microsoft.Extensions.Options;
+using Microsoft.ML.Data;
+using SkiaSharp;
+using Xunit;
+
+namespace BioLens.Agents.Tests.Infrastructure;
+
+public class OnnxImageTriageEngineTests
+{
+    [Fact]
+    public void Triage_WithStubModel_ShouldScoreEveryImageInBatches()
+    {
+        // Arrange: the stub model scores images by their mean red, green and blue
+        var engine = new OnnxImageTriageEngine(Options.Create(new ImageTriageOptions { BatchSize = 2 }));
+        var images = new[] { (0, 0, 255), (0, 255, 0), (255, 0, 0) }
+            .Select(bgr => new TriageImage(Guid.NewGuid(), SolidImage(bgr.Item1, bgr.Item2, bgr.Item3)))
+            .ToList();
+
+        // Act
+        var results = engine.Triage(images);
+
+        // Assert
+        Assert.Equal(images.Select(i => i.ImageId), results.Select(r => r.ImageId));
+        Assert.Equal(new[] { "routine", "review", "urgent" }, results.Select(r => r.Label));
+        Assert.All(results, r => Assert.Equal(1f, r.Scores.Values.Sum(), 3));
+    }
+
+    private static MLImage SolidImage(byte blue, byte green, byte red)
+    {
+        var pixels = new byte[8 * 8 * 4];
+        for (var i = 0; i < pixels.Length; i += 4)
+        {
+            pixels[i] = blue;
+            pixels[i + 1] = green;
+            pixels[i + 2] = red;
+            pixels[i + 3] = 255;
+        }
+        return MLImage.CreateFromPixels(8, 8, MLPixelFormat.Bgra32, pixels);
+    }
+}
+
+public class ImagePreprocessorTests : IDisposable
+{
+    private readonly string _directory = Directory.CreateTempSubdirectory("biolens-prep-").FullName;
+
+    public void Dispose() => Directory.Delete(_directory, recursive: true);
+
+    [Fact]
+    public async Task PrepareAllAsync_WithSameNameDifferentFormats_ShouldNotShareDerivedFile()
+    {
+        // Arrange: lesion.png and lesion.jpg sit side by side with different content
+        var preprocessor = new ImagePreprocessor(
+            Options.Create(new ImagePreprocessingOptions()), NullLogger<ImagePreprocessor>.Instance);
+        var png = Capture("lesion.png", SKColors.Red, SKEncodedImageFormat.Png);
+        var jpeg = Capture("lesion.jpg", SKColors.Blue, SKEncodedImageFormat.Jpeg);
+
+        // Act
+        var prepared = await preprocessor.PrepareAllAsync(new[] { png, jpeg });
+
+        // Assert
+        Assert.NotEqual(prepared[0].FilePath, prepared[1].FilePath);
+        Assert.All(prepared, p => Assert.False(p.FromCache));
+        using var red = SKBitmap.Decode(prepared[0].FilePath);
+        using var blue = SKBitmap.Decode(prepared[1].FilePath);
+        Assert.True(red.GetPixel(0, 0).Red > 200);
+        Assert.True(blue.GetPixel(0, 0).Blue > 200);
+    }
+
+    private MedicalImage Capture(string fileName, SKColor color, SKEncodedImageFormat format) =>
+        TestCaptures.Write(Path.Combine(_directory, fileName), color, format);
+}
+
+public class PerceptualImageFingerprinterTests
+{
+    [Fact]
+    public void Collapse_ShouldGroupNearDuplicatesUnderTheFirstCapture()
+    {
+        // Arrange: the second image differs from the first in two bits, the third in many
+        var first = Image(0xF0F0_F0F0_F0F0_F0F0);
+        var nearDuplicate = Image(0xF0F0_F0F0_F0F0_F0F3);
+        var distinct = Image(0x0F0F_0F0F_0F0F_0F0F);
+
+        // Act
+        var groups = PerceptualImageFingerprinter.Collapse(new[] { first, nearDuplicate, distinct }, maxDistance: 6);
+
+        // Assert
+        Assert.Equal(2, PerceptualImageFingerprinter.Distance(first.PerceptualHash!.Value, nearDuplicate.PerceptualHash!.Value));
+        Assert.Equal(new[] { first.Id, distinct.Id }, groups.Select(g => g.Representative.Id));
+        Assert.Equal(nearDuplicate.Id, Assert.Single(groups[0].Duplicates).Id);
+        Assert.Empty(groups[1].Duplicates);
+    }
+
+    private static MedicalImage Image(ulong hash) => new(
+        Guid.NewGuid(),
+        "/path/image.jpg",
+        null,
+        ImageType.Skin,
+        new ImageMetadata(1920, 1080, 100000, "iPhone"),
+        DateTimeOffset.UtcNow,
+        hash);
+}
@@ -0,0 +1,196 @@
+using BioLens.Domain.Entities;
+using BioLens.Domain.Enums;
+using BioLens.Domain.ValueObjects;
+using BioLens.Infrastructure.Persistence;
+using Microsoft.Data.Sqlite;
+using Microsoft.EntityFrameworkCore;
+using Microsoft.Extensions.DependencyInjection;
+using Microsoft.Extensions.Options;
+using Xunit;
+
+namespace BioLens.Agents.Tests.Infrastructure;
+
+public class DiagnosticCaseRepositoryTests : IDisposable
+{
+    private readonly SqliteConnection _connection = new("Data Source=:memory:");
+    private readonly DbContextOptions<BioLensDbContext> _options;
+
+    public DiagnosticCaseRepositoryTests()
+    {
+        _connection.Open();
+        _options = new DbContextOptionsBuilder<BioLensDbContext>().UseSqlite(_connection).Options;
+        using var context = new BioLensDbContext(_options);
+        context.Database.EnsureCreated();
+    }
+
+    public void Dispose() => _connection.Dispose();
+
+    [Fact]
+    public async Task UpdateAsync_WithDetachedCase_ShouldThrow()
+    {
+        // Arrange
+        var caseId = await SeedCaseAsync();
+        DiagnosticCase detached;
+        await using (var loading = new BioLensDbContext(_options))
+        {
+            detached = (await new DiagnosticCaseRepository(loading).GetByIdAsync(caseId))!;
+        }
+        detached.MarkAsSynced();
+
+        await using var context = new BioLensDbContext(_options);
+
+        // Act & Assert
+        await Assert.ThrowsAsync<InvalidOperationException>(
+            () => new DiagnosticCaseRepository(context).UpdateAsync(detached));
+    }
+
+    [Fact]
+    public async Task UpdateAsync_WithStaleCase_ShouldThrowConcurrencyException()
+    {
+        // Arrange: two health workers load the same case
+        var caseId = await SeedCaseAsync();
+        await using var first = new BioLensDbContext(_options);
+        await using var second = new BioLensDbContext(_options);
+        var firstRepository = new DiagnosticCaseRepository(first);
+        var secondRepository = new DiagnosticCaseRepository(second);
+        var firstCopy = (await firstRepository.GetByIdAsync(caseId))!;
+        var secondCopy = (await secondRepository.GetByIdAsync(caseId))!;
+
+        firstCopy.StartDiagnosis();
+        await firstRepository.UpdateAsync(firstCopy);
+        secondCopy.MarkAsSynced();
+
+        // Act & Assert
+        await Assert.ThrowsAsync<DbUpdateConcurrencyException>(() => secondRepository.UpdateAsync(secondCopy));
+    }
+
+    [Fact]
+    public async Task AbandonDiagnosisAsync_AfterStart_ShouldHandCaseBackAndKeepVersionCheck()
+    {
+        // Arrange: a run starts on one copy while another copy is still open
+        var caseId = await SeedCaseAsync();
+        await using var context = new BioLensDbContext(_options);
+        await using var stale = new BioLensDbContext(_options);
+        var repository = new DiagnosticCaseRepository(context);
+        var diagnosticCase = (await repository.GetByIdAsync(caseId))!;
+        var staleCopy = (await new DiagnosticCaseRepository(stale).GetByIdAsync(caseId))!;
+        await repository.StartDiagnosisAsync(diagnosticCase);
+
+        // Act
+        await repository.AbandonDiagnosisAsync(diagnosticCase);
+
+        // Assert
+        await using (var reading = new BioLensDbContext(_options))
+        {
+            var stored = (await new DiagnosticCaseRepository(reading).GetByIdAsync(caseId))!;
+            Assert.Equal(CaseStatus.Created, stored.Status);
+        }
+        await Assert.ThrowsAsync<DbUpdateConcurrencyException>(
+            () => new DiagnosticCaseRepository(stale).StartDiagnosisAsync(staleCopy));
+    }
+
+    [Fact]
+    public async Task GetUnsyncedAsync_AcrossPageBoundaries_ShouldReturnEveryCaseOnceInOrder()
+    {
+        // Arrange: three unsynced cases share the timestamp that straddles the first page boundary
+        var start = new DateTimeOffset(2026, 1, 5, 8, 0, 0, TimeSpan.Zero);
+        var unsynced = new List<Guid>();
+        foreach (var minute in new[] { 0, 1, 2, 2, 2, 3, 4 })
+        {
+            unsynced.Add(await SeedCaseAsync(start.AddMinutes(minute)));
+        }
+        var alreadySynced = await SeedCaseAsync(start.AddMinutes(1));
+        await using (var marking = new BioLensDbContext(_options))
+        {
+            await new DiagnosticCaseRepository(marking).MarkSyncedAsync(new[] { alreadySynced });
+        }
+
+        // Act: mark each page synced as soon as it is read, as an upload would
+        var streamed = new List<DiagnosticCase>();
+        await using var reading = new BioLensDbContext(_options);
+        await using var writing = new BioLensDbContext(_options);
+        await foreach (var diagnosticCase in new DiagnosticCaseRepository(reading).GetUnsyncedAsync(pageSize: 3))
+        {
+            streamed.Add(diagnosticCase);
+            if (streamed.Count % 3 == 0)
+            {
+                await new DiagnosticCaseRepository(writing).MarkSyncedAsync(
+                    streamed.TakeLast(3).Select(c => c.Id).ToList());
+            }
+        }
+
+        // Assert: no case skipped or repeated, oldest first
+        Assert.Equal(unsynced.Order(), streamed.Select(c => c.Id).Order());
+        Assert.Equal(streamed.Count, streamed.Select(c => c.Id).Distinct().Count());
+        Assert.Equal(streamed.Select(c => c.CreatedAt).Order(), streamed.Select(c => c.CreatedAt));
+    }
+
+    private async Task<Guid> SeedCaseAsync(DateTimeOffset? createdAt = null)
+    {
+        await using var context = new BioLensDbContext(_options);
+        var patient = new Patient($"PAT_{Guid.NewGuid():N}", 30, AgeUnit.Years, BiologicalSex.Female);
+        var caseContext = new ContextualInformation(
+            new GeographicRegion("Test", "Test", null, 0, 0),
+            new List<string>(),
+            new List<string>(),
+            FacilityCapabilities.RuralClinic,
+            new CulturalConsiderations("en", new(), new()));
+        var diagnosticCase = new DiagnosticCase(patient, Guid.NewGuid(), caseContext);
+        if (createdAt is null)
+        {
+            return await new DiagnosticCaseRepository(context).AddAsync(diagnosticCase);
+        }
+
+        context.DiagnosticCases.Add(diagnosticCase);
+        context.Entry(diagnosticCase).Property(c => c.CreatedAt).CurrentValue = createdAt.Value;
+        await context.SaveChangesAsync();
+        return diagnosticCase.Id;
+    }
+}
+
+public class PersistenceSetupTests : IDisposable
+{
+    private readonly string _directory = Directory.CreateTempSubdirectory("biolens-db-").FullName;
+
+    public void Dispose()
+    {
+        // Pooled connections keep the database and its WAL files open
+        SqliteConnection.ClearAllPools();
+        Directory.Delete(_directory, recursive: true);
+    }
+
+    [Fact]
+    public async Task AddBioLensPersistence_WithFileDatabase_ShouldTuneEveryConnection()
+    {
+        // Arrange
+        var services = new ServiceCollection();
+        services.AddSingleton(Options.Create(new DatabaseOptions
+        {
+            ConnectionString = $"Data Source={Path.Combine(_directory, "biolens.db")}",
+            CacheSizeKb = 4096,
+            BusyTimeoutMs = 1234
+        }));
+        services.AddBioLensPersistence();
+        await using var provider = services.BuildServiceProvider();
+        var factory = provider.GetRequiredService<IDbContextFactory<BioLensDbContext>>();
+
+        // Act
+        await using var context = await factory.CreateDbContextAsync();
+        await context.Database.EnsureCreatedAsync();
+        await context.Database.OpenConnectionAsync();
+
+        // Assert
+        Assert.Equal("wal", await PragmaAsync(context, "journal_mode"));
+        Assert.Equal("1", await PragmaAsync(context, "synchronous"));
+        Assert.Equal("2", await PragmaAsync(context, "temp_store"));
+        Assert.Equal("-4096", await PragmaAsync(context, "cache_size"));
+        Assert.Equal("1234", await PragmaAsync(context, "busy_timeout"));
+    }
+
+    private static async Task<string> PragmaAsync(BioLensDbContext context, string name)
+    {
+        await using var command = context.Database.GetDbConnection().CreateCommand();
+        command.CommandText = $"PRAGMA {name};";
+        return Convert.ToString(await command.ExecuteScalarAsync())!;
+    }
+}
@@ -0,0 +1,169 @@
+using System.Net;
+using System.Net.Http.Json;
+using System.Text;
+using System.Text.Json;
+using BioLens.Domain.Entities;
+using BioLens.Domain.Enums;
+using BioLens.Domain.ValueObjects;
+using BioLens.Infrastructure.AI;
+using Microsoft.Extensions.Logging;
+using Microsoft.Extensions.Logging.Abstractions;
+using Microsoft.Extensions.Options;
+using SkiaSharp;
+using Xunit;
+
+namespace BioLens.Agents.Tests;
+
+/// <summary>
+/// Stands in for the Gemini REST API; counts requests and can hold them until released
+/// (all of them when blocked, or only those whose body matches hold)
+/// </summary>
+internal sealed class FakeGeminiHandler : HttpMessageHandler
+{
+    private readonly Func<string, string> _respond;
+    private readonly Func<string, bool> _hold;
+    private readonly TaskCompletionSource _released = new(TaskCreationOptions.RunContinuationsAsynchronously);
+    private int _calls;
+
+    public FakeGeminiHandler(
+        Func<string, string>? respond = null,
+        bool blocked = false,
+        Func<string, bool>? hold = null)
+    {
+        _respond = respond ?? (_ => "{}");
+        _hold = hold ?? (_ => blocked);
+    }
+
+    public int Calls => Volatile.Read(ref _calls);
+
+    public void Release() => _released.TrySetResult();
+
+    public async Task WaitForCallsAsync(int count)
+    {
+        var deadline = DateTime.UtcNow.AddSeconds(5);
+        while (Calls < count && DateTime.UtcNow < deadline)
+        {
+            await Task.Delay(10);
+        }
+        Assert.True(Calls >= count, $"Expected {count} Gemini calls, saw {Calls}");
+    }
+
+    protected override async Task<HttpResponseMessage> SendAsync(
+        HttpRequestMessage request,
+        CancellationToken cancellationToken)
+    {
+        Interlocked.Increment(ref _calls);
+        var body = await request.Content!.ReadAsStringAsync(cancellationToken);
+        if (_hold(body))
+        {
+            await _released.Task.WaitAsync(cancellationToken);
+        }
+
+        var response = new GeminiResponse([new Candidate(new Content([new Part(_respond(body))]))]);
+        if (request.RequestUri!.Query.Contains("alt=sse", StringComparison.Ordinal))
+        {
+            var events = $"data: {JsonSerializer.Serialize(response, JsonSerializerOptions.Web)}\n\n";
+            return new HttpResponseMessage(HttpStatusCode.OK)
+            {
+                Content = new StringContent(events, Encoding.UTF8, "text/event-stream")
+            };
+        }
+        return new HttpResponseMessage(HttpStatusCode.OK) { Content = JsonContent.Create(response) };
+    }
+}
+
+internal static class GeminiTestServices
+{
+    /// <summary>
+    /// The production decorator chain over a fake API, with the response cache
+    /// off unless cache options are given
+    /// </summary>
+    public static ScheduledGeminiAIService Create(
+        FakeGeminiHandler handler,
+        GeminiSchedulingOptions? scheduling = null,
+        ILogger<ScheduledGeminiAIService>? logger = null,
+        GeminiCacheOptions? cache = null)
+    {
+        var client = new GeminiAIService(
+            new HttpClient(handler),
+            NullLogger<GeminiAIService>.Instance,
+            Options.Create(new GeminiConfiguration { ApiKey = "test", BaseUrl = "https://gemini.test" }),
+            new GeminiResilience(Options.Create(new GeminiResilienceOptions()), NullLogger<GeminiResilience>.Instance));
+        var cached = new CachedGeminiAIService(
+            client,
+            new GeminiResponseCache(Options.Create(cache ?? new GeminiCacheOptions { Enabled = false })));
+        return new ScheduledGeminiAIService(
+            cached,
+            Options.Create(scheduling ?? new GeminiSchedulingOptions()),
+            logger ?? NullLogger<ScheduledGeminiAIService>.Instance);
+    }
+}
+
+/// <summary>
+/// Keeps formatted log messages so a test can wait for a specific one
+/// </summary>
+internal sealed class RecordingLogger<T> : ILogger<T>
+{
+    private readonly List<string> _messages = new();
+
+    public IDisposable? BeginScope<TState>(TState state) where TState : notnull => null;
+
+    public bool IsEnabled(LogLevel logLevel) => true;
+
+    public void Log<TState>(
+        LogLevel logLevel,
+        EventId eventId,
+        TState state,
+        Exception? exception,
+        Func<TState, Exception?, string> formatter)
+    {
+        lock (_messages)
+        {
+            _messages.Add(formatter(state, exception));
+        }
+    }
+
+    public async Task WaitForAsync(string fragment)
+    {
+        var deadline = DateTime.UtcNow.AddSeconds(5);
+        while (!Contains(fragment) && DateTime.UtcNow < deadline)
+        {
+            await Task.Delay(10);
+        }
+        Assert.True(Contains(fragment), $"Expected a log message containing '{fragment}'");
+    }
+
+    private bool Contains(string fragment)
+    {
+        lock (_messages)
+        {
+            return _messages.Any(m => m.Contains(fragment, StringComparison.Ordinal));
+        }
+    }
+}
+
+internal static class TestCaptures
+{
+    /// <summary>
+    /// Writes a solid-colour 64x64 capture and returns it as a case image
+    /// </summary>
+    public static MedicalImage Write(
+        string path,
+        SKColor color,
+        SKEncodedImageFormat format = SKEncodedImageFormat.Png)
+    {
+        using (var bitmap = new SKBitmap(64, 64))
+        {
+            bitmap.Erase(color);
+            using var data = bitmap.Encode(format, 90);
+            File.WriteAllBytes(path, data.ToArray());
+        }
+        return new MedicalImage(
+            Guid.NewGuid(),
+            path,
+            null,
+            ImageType.Skin,
+            new ImageMetadata(64, 64, new FileInfo(path).Length, "Test"),
+            DateTimeOffset.UtcNow);
+    }
+}
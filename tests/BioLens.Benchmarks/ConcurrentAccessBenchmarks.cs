@@ -0,0 +1,109 @@
+using BenchmarkDotNet.Attributes;
+using BioLens.Domain.Entities;
+using BioLens.Domain.Enums;
+using BioLens.Infrastructure.Persistence;
+using Microsoft.Data.Sqlite;
+using Microsoft.EntityFrameworkCore;
+using Microsoft.Extensions.DependencyInjection;
+
+namespace BioLens.Benchmarks;
+
+/// <summary>
+/// Capture and background sync contending for one SQLite file: writers add
+/// patients while readers look them up, all at once. Untuned opens a fresh
+/// context on SQLite's defaults (rollback journal, synchronous=FULL); tuned
+/// rents from the AddBioLensPersistence pool over WAL.
+/// </summary>
+[MemoryDiagnoser]
+public class ConcurrentAccessBenchmarks
+{
+    private const int SeedPatients = 10_000;
+    private const int OperationsPerWorker = 200;
+
+    private string _databasePath = "";
+    private ServiceProvider _services = default!;
+    private DbContextOptions<BioLensDbContext> _untunedOptions = default!;
+    private int _nextPatient;
+
+    [Params(false, true)]
+    public bool Tuned { get; set; }
+
+    [Params(2)]
+    public int Writers { get; set; }
+
+    [Params(4)]
+    public int Readers { get; set; }
+
+    [GlobalSetup]
+    public void Setup()
+    {
+        _databasePath = Path.Combine(Path.GetTempPath(), $"biolens-bench-{Guid.NewGuid():N}.db");
+        var connectionString = $"Data Source={_databasePath}";
+
+        _untunedOptions = new DbContextOptionsBuilder<BioLensDbContext>()
+            .UseSqlite(connectionString)
+            .Options;
+
+        _services = new ServiceCollection()
+            .Configure<DatabaseOptions>(options => options.ConnectionString = connectionString)
+            .AddBioLensPersistence()
+            .BuildServiceProvider();
+
+        // Seeded without the interceptor; the tuned run switches the file to WAL on first open
+        using var context = new BioLensDbContext(_untunedOptions);
+        context.Database.EnsureCreated();
+        for (var i = 0; i < SeedPatients; i++)
+        {
+            context.Patients.Add(NewPatient(i));
+        }
+        context.SaveChanges();
+        _nextPatient = SeedPatients;
+    }
+
+    [GlobalCleanup]
+    public void Cleanup()
+    {
+        _services.Dispose();
+        SqliteConnection.ClearAllPools();
+        foreach (var file in Directory.GetFiles(Path.GetDirectoryName(_databasePath)!, Path.GetFileName(_databasePath) + "*"))
+        {
+            File.Delete(file);
+        }
+    }
+
+    [Benchmark]
+    public async Task CaptureWhileSyncing()
+    {
+        var workers = Enumerable.Range(0, Writers).Select(_ => Task.Run(WriteAsync))
+            .Concat(Enumerable.Range(0, Readers).Select(seed => Task.Run(() => ReadAsync(seed))));
+        await Task.WhenAll(workers);
+    }
+
+    private async Task WriteAsync()
+    {
+        for (var i = 0; i < OperationsPerWorker; i++)
+        {
+            await using var context = CreateContext();
+            await new PatientRepository(context).AddAsync(NewPatient(Interlocked.Increment(ref _nextPatient)));
+        }
+    }
+
+    private async Task ReadAsync(int seed)
+    {
+        var random = new Random(seed);
+        for (var i = 0; i < OperationsPerWorker; i++)
+        {
+            await using var context = CreateContext();
+            await new PatientRepository(context).GetByAnonymizedIdAsync(AnonymizedId(random.Next(SeedPatients)));
+        }
+    }
+
+    private BioLensDbContext CreateContext() => Tuned
+        ? _services.GetRequiredService<IDbContextFactory<BioLensDbContext>>().CreateDbContext()
+        : new BioLensDbContext(_untunedOptions);
+
+    private static Patient NewPatient(int index) =>
+        new(AnonymizedId(index), 30, AgeUnit.Years, BiologicalSex.Female);
+
+    private static string AnonymizedId(int index) => $"PT-{index:D8}";
+}
@@ -0,0 +1,125 @@
+using BenchmarkDotNet.Attributes;
+using BioLens.Domain.Entities;
+using BioLens.Domain.Enums;
+using BioLens.Domain.ValueObjects;
+using BioLens.Infrastructure.Persistence;
+using Microsoft.EntityFrameworkCore;
+
+namespace BioLens.Benchmarks;
+
+/// <summary>
+/// Per-command lookups against a SQLite file holding PatientCount patients
+/// (and one case per ten patients), with and without the unique AnonymizedId
+/// index, comparing re-translated LINQ with the repositories' compiled queries
+/// </summary>
+[MemoryDiagnoser]
+public class RepositoryLookupBenchmarks
+{
+    private const int SeedBatchSize = 10_000;
+
+    private string _databasePath = "";
+    private DbContextOptions<BioLensDbContext> _options = default!;
+    private BioLensDbContext _context = default!;
+    private PatientRepository _patients = default!;
+    private DiagnosticCaseRepository _cases = default!;
+    private string[] _anonymizedIds = [];
+    private Guid[] _caseIds = [];
+    private int _next;
+
+    [Params(100_000)]
+    public int PatientCount { get; set; }
+
+    [Params(true, false)]
+    public bool Indexed { get; set; }
+
+    [GlobalSetup]
+    public void Setup()
+    {
+        _databasePath = Path.Combine(Path.GetTempPath(), $"biolens-bench-{Guid.NewGuid():N}.db");
+        _options = new DbContextOptionsBuilder<BioLensDbContext>()
+            .UseSqlite($"Data Source={_databasePath}")
+            .Options;
+
+        using (var context = new BioLensDbContext(_options))
+        {
+            context.Database.EnsureCreated();
+            if (!Indexed)
+            {
+                context.Database.ExecuteSqlRaw("DROP INDEX \"IX_Patients_AnonymizedId\"");
+            }
+        }
+
+        var caseIds = new List<Guid>(PatientCount / 10);
+        for (var start = 0; start < PatientCount; start += SeedBatchSize)
+        {
+            using var context = new BioLensDbContext(_options);
+            for (var i = start; i < Math.Min(start + SeedBatchSize, PatientCount); i++)
+            {
+                var patient = new Patient(AnonymizedId(i), 30, AgeUnit.Years, BiologicalSex.Female);
+                context.Patients.Add(patient);
+                if (i % 10 == 0)
+                {
+                    var diagnosticCase = new DiagnosticCase(patient, Guid.NewGuid(), CaseContext);
+                    context.DiagnosticCases.Add(diagnosticCase);
+                    caseIds.Add(diagnosticCase.Id);
+                }
+            }
+            context.SaveChanges();
+        }
+
+        var random = new Random(42);
+        _anonymizedIds = Enumerable.Range(0, 1024).Select(_ => AnonymizedId(random.Next(PatientCount))).ToArray();
+        _caseIds = Enumerable.Range(0, 1024).Select(_ => caseIds[random.Next(caseIds.Count)]).ToArray();
+
+        _context = new BioLensDbContext(_options);
+        _patients = new PatientRepository(_context);
+        _cases = new DiagnosticCaseRepository(_context);
+    }
+
+    [GlobalCleanup]
+    public void Cleanup()
+    {
+        _context.Dispose();
+        Microsoft.Data.Sqlite.SqliteConnection.ClearAllPools();
+        File.Delete(_databasePath);
+    }
+
+    [Benchmark(Baseline = true)]
+    public async Task<Patient?> PatientByAnonymizedId_Linq()
+    {
+        _context.ChangeTracker.Clear();
+        var anonymizedId = _anonymizedIds[_next++ & 1023];
+        return await _context.Patients.FirstOrDefaultAsync(p => p.AnonymizedId == anonymizedId);
+    }
+
+    [Benchmark]
+    public async Task<Patient?> PatientByAnonymizedId_Compiled()
+    {
+        _context.ChangeTracker.Clear();
+        return await _patients.GetByAnonymizedIdAsync(_anonymizedIds[_next++ & 1023]);
+    }
+
+    [Benchmark]
+    public async Task<DiagnosticCase?> CaseById_Linq()
+    {
+        _context.ChangeTracker.Clear();
+        var id = _caseIds[_next++ & 1023];
+        return await _context.DiagnosticCases.Include(c => c.Patient).FirstOrDefaultAsync(c => c.Id == id);
+    }
+
+    [Benchmark]
+    public async Task<DiagnosticCase?> CaseById_Compiled()
+    {
+        _context.ChangeTracker.Clear();
+        return await _cases.GetByIdAsync(_caseIds[_next++ & 1023]);
+    }
+
+    private static string AnonymizedId(int index) => $"PT-{index:D8}";
+
+    private static readonly ContextualInformation CaseContext = new(
+        new GeographicRegion("Kenya", "Turkana", null, 3.12, 35.6),
+        ["Amoxicillin", "Artemether-lumefantrine"],
+        ["Malaria"],
+        FacilityCapabilities.BasicHealthPost,
+        new CulturalConsiderations("sw", [], []));
+}
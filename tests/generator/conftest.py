@@ -0,0 +1,25 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+import generate_code  # noqa: E402
+
+
+@pytest.fixture
+def run_generator(tmp_path, capsys):
+    """Run the generator CLI into tmp_path/out and return the output directory"""
+    def run(*argv, output_dir=None):
+        output_dir = output_dir or tmp_path / "out"
+        generate_code.main(["--output-dir", str(output_dir), *argv])
+        capsys.readouterr()
+        return output_dir
+    return run
+
+
+def snapshot(base_dir: Path) -> dict[str, tuple[int, int]]:
+    """Map every file under base_dir to (inode, mtime_ns)"""
+    return {path.relative_to(base_dir).as_posix(): (path.stat().st_ino, path.stat().st_mtime_ns)
+            for path in base_dir.rglob("*") if path.is_file()}
@@ -0,0 +1,57 @@
+import json
+
+import pytest
+
+import generate_code
+
+
+def write_batch(tmp_path, variants):
+    path = tmp_path / "batch.json"
+    path.write_text(json.dumps(variants))
+    return path
+
+
+@pytest.mark.parametrize("staged", [False, True])
+def test_identical_outputs_are_hard_linked_across_variants(tmp_path, run_generator, staged):
+    batch = write_batch(tmp_path, [
+        {"name": "default"},
+        {"name": "custom", "params": {"gemini_model": "gemini-test"}},
+    ])
+
+    out = run_generator("--batch", str(batch), *(["--staged"] if staged else []))
+
+    baseline = generate_code.render_tree()
+    variant = generate_code.render_tree(params=generate_code.resolve_params({"gemini_model": "gemini-test"}))
+    for relative in baseline:
+        first, second = out / "default" / relative, out / "custom" / relative
+        assert first.read_bytes() == baseline[relative]
+        assert second.read_bytes() == variant[relative]
+        shared = first.stat().st_ino == second.stat().st_ino
+        assert shared == (baseline[relative] == variant[relative]), relative
+
+
+def test_variants_are_written_to_their_output_dir(tmp_path, run_generator):
+    batch = write_batch(tmp_path, [{"name": "field", "output_dir": "builds/field"}])
+
+    out = run_generator("--batch", str(batch))
+
+    assert (out / "builds/field/BioLens.sln").is_file()
+    assert not (out / "field").exists()
+
+
+def test_rewriting_a_variant_does_not_write_through_shared_links(tmp_path, run_generator):
+    batch = write_batch(tmp_path, [{"name": "a"}, {"name": "b"}])
+    out = run_generator("--batch", str(batch))
+    (out / "a/BioLens.sln").write_text("// edited\n")  # both names now show the edit
+
+    run_generator(output_dir=out / "b")
+
+    assert (out / "b/BioLens.sln").read_bytes() == generate_code.render_tree()["BioLens.sln"]
+    assert (out / "a/BioLens.sln").read_text() == "// edited\n"
+
+
+def test_duplicate_variant_names_are_rejected(tmp_path, run_generator):
+    batch = write_batch(tmp_path, [{"name": "a"}, {"name": "a"}])
+
+    with pytest.raises(SystemExit, match="Duplicate batch variant"):
+        run_generator("--batch", str(batch))
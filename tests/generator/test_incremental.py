@@ -0,0 +1,58 @@
+import json
+
+from conftest import snapshot
+
+import generate_code
+
+
+def test_first_run_records_every_file_in_the_manifest(run_generator):
+    out = run_generator("--incremental")
+
+    manifest = json.loads((out / generate_code.MANIFEST_NAME).read_text())
+    assert manifest["version"] == generate_code.MANIFEST_VERSION
+    rendered = generate_code.render_tree()
+    assert set(manifest["files"]) == set(rendered)
+    for relative, data in rendered.items():
+        assert (out / relative).read_bytes() == data
+
+
+def test_unchanged_files_are_not_rewritten(run_generator):
+    out = run_generator("--incremental")
+    before = snapshot(out)
+
+    run_generator("--incremental")
+
+    after = snapshot(out)
+    del before[generate_code.MANIFEST_NAME], after[generate_code.MANIFEST_NAME]
+    assert after == before
+
+
+def test_edited_and_deleted_files_are_regenerated(run_generator):
+    out = run_generator("--incremental")
+    edited = out / "BioLens.sln"
+    deleted = out / "src/BioLens.Domain/BioLens.Domain.csproj"
+    expected_edited, expected_deleted = edited.read_bytes(), deleted.read_bytes()
+    edited.write_bytes(expected_edited + b"// local edit\n")
+    deleted.unlink()
+    untouched = snapshot(out)["src/BioLens.Domain/Enums/Enums.cs"]
+
+    run_generator("--incremental")
+
+    assert edited.read_bytes() == expected_edited
+    assert deleted.read_bytes() == expected_deleted
+    assert snapshot(out)["src/BioLens.Domain/Enums/Enums.cs"] == untouched
+
+
+def test_parameter_change_rewrites_only_dependent_files(run_generator):
+    out = run_generator("--incremental")
+    before = snapshot(out)
+
+    run_generator("--incremental", "--param", "gemini_model=gemini-test")
+
+    after = snapshot(out)
+    changed = {relative for relative in before
+               if relative != generate_code.MANIFEST_NAME and after[relative] != before[relative]}
+    baseline = generate_code.render_tree()
+    variant = generate_code.render_tree(params=generate_code.resolve_params({"gemini_model": "gemini-test"}))
+    expected = {relative for relative in baseline if variant[relative] != baseline[relative]}
+    assert changed and changed == expected
@@ -0,0 +1,31 @@
+import pytest
+
+import generate_code
+
+
+def test_unknown_placeholder_reports_template_and_parameter(tmp_path, monkeypatch):
+    (tmp_path / "broken.cs.tmpl").write_text('var model = "{{ bogus }}";\n')
+    monkeypatch.setattr(generate_code, "TEMPLATES", generate_code.TemplateRegistry(tmp_path))
+
+    with pytest.raises(ValueError, match="Template broken needs parameter 'bogus'"):
+        generate_code.render_template("broken")
+
+
+def test_parameters_are_substituted_into_templates():
+    rendered = generate_code.render_template(
+        "infrastructure/gemini_service", {"gemini_model": "gemini-test"})
+
+    assert 'Model: "gemini-test"' in rendered
+
+
+@pytest.mark.parametrize("value", ['gemini"; System.Exit(1); //', "C:\\models", "a\nb"])
+def test_values_that_break_csharp_literals_are_rejected(value, run_generator):
+    with pytest.raises(ValueError, match="gemini_model cannot contain"):
+        generate_code.resolve_params({"gemini_model": value})
+    with pytest.raises(SystemExit):
+        run_generator("--param", f"gemini_model={value}")
+
+
+def test_unknown_parameter_is_rejected():
+    with pytest.raises(ValueError, match="Unknown template parameter: bogus"):
+        generate_code.resolve_params({"bogus": "1"})
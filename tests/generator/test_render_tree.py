@@ -0,0 +1,49 @@
+import io
+import tarfile
+
+import generate_code
+
+
+def test_render_tree_matches_files_written_to_disk(run_generator):
+    out = run_generator()
+
+    rendered = generate_code.render_tree()
+
+    on_disk = {path.relative_to(out).as_posix() for path in out.rglob("*")
+               if path.is_file() and path.name != generate_code.MANIFEST_NAME}
+    assert set(rendered) == on_disk
+    for relative, data in rendered.items():
+        assert (out / relative).read_bytes() == data
+
+
+def test_render_tree_does_not_touch_the_filesystem(tmp_path, monkeypatch):
+    monkeypatch.setattr(generate_code, "BASE_DIR", tmp_path / "never")
+
+    rendered = generate_code.render_tree()
+
+    assert not (tmp_path / "never").exists()
+    assert list(rendered)[0] == "BioLens.sln"
+    assert all(isinstance(data, bytes) for data in rendered.values())
+
+
+def test_render_tree_applies_parameters():
+    params = generate_code.resolve_params({"gemini_model": "gemini-test"})
+
+    rendered = generate_code.render_tree(params=params)
+
+    assert any(b"gemini-test" in data for data in rendered.values())
+    assert not any(b"gemini-test" in data for data in generate_code.render_tree().values())
+
+
+def test_archive_holds_the_rendered_tree_and_dockerfile(monkeypatch):
+    monkeypatch.setenv("SOURCE_DATE_EPOCH", "0")
+    first, second = io.BytesIO(), io.BytesIO()
+    generate_code.write_archive(first, "tar")
+    generate_code.write_archive(second, "tar")
+
+    assert first.getvalue() == second.getvalue()
+    with tarfile.open(fileobj=io.BytesIO(first.getvalue())) as archive:
+        members = {member.name: archive.extractfile(member).read() for member in archive}
+    assert "Dockerfile" in members
+    del members["Dockerfile"]
+    assert members == generate_code.render_tree()
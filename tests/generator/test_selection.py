@@ -0,0 +1,60 @@
+import json
+
+import pytest
+from conftest import snapshot
+
+import generate_code
+
+
+def test_selection_adds_transitive_dependencies_and_owning_project():
+    selected = generate_code.resolve_selection(["domain/entities/diagnostic_case"])
+
+    assert selected == {
+        "domain/entities/diagnostic_case",
+        "domain/entities/patient",
+        "domain/enums",
+        "domain/events",
+        "domain/value_objects",
+        "projects/BioLens.Domain",
+    }
+
+
+def test_selection_follows_project_references():
+    selected = generate_code.resolve_selection(["agents/core/agent_base"])
+
+    assert {"projects/BioLens.Agents", "projects/BioLens.Infrastructure",
+            "projects/BioLens.Application", "projects/BioLens.Domain"} <= selected
+    assert "projects/solution" not in selected
+
+
+def test_selection_expands_globs():
+    selected = generate_code.resolve_selection(["domain/entities/*"])
+
+    assert {"domain/entities/patient", "domain/entities/diagnostic_case"} <= selected
+
+
+def test_unknown_pattern_is_rejected(run_generator):
+    with pytest.raises(ValueError, match="no/such"):
+        generate_code.resolve_selection(["no/such/*"])
+    with pytest.raises(SystemExit):
+        run_generator("--only", "no/such/*")
+
+
+def test_scoped_run_writes_only_the_selection_and_keeps_the_rest(run_generator):
+    out = run_generator("--incremental")
+    full_manifest = json.loads((out / generate_code.MANIFEST_NAME).read_text())["files"]
+    before = snapshot(out)
+    for path in out.rglob("*.cs"):
+        path.write_text("// stale\n")
+    stale = snapshot(out)
+
+    run_generator("--only", "domain/enums")
+
+    after = snapshot(out)
+    rewritten = {relative for relative in after if after[relative] != stale[relative]}
+    assert rewritten == {"src/BioLens.Domain/Enums/Enums.cs",
+                         "src/BioLens.Domain/BioLens.Domain.csproj",
+                         generate_code.MANIFEST_NAME}
+    assert set(after) == set(before)
+    manifest = json.loads((out / generate_code.MANIFEST_NAME).read_text())["files"]
+    assert manifest == full_manifest
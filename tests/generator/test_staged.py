@@ -0,0 +1,74 @@
+import os
+import stat
+
+import pytest
+from conftest import snapshot
+
+import generate_code
+
+
+@pytest.fixture
+def umask():
+    previous = os.umask(0o022)
+    yield 0o022
+    os.umask(previous)
+
+
+def mode(path):
+    return stat.S_IMODE(path.stat().st_mode)
+
+
+def test_new_output_gets_the_umask_default_mode(run_generator, umask):
+    out = run_generator("--staged")
+
+    assert mode(out) == 0o755
+    for relative, data in generate_code.render_tree().items():
+        assert (out / relative).read_bytes() == data
+    assert [path.name for path in out.parent.iterdir()] == [out.name]
+
+
+def test_replaced_output_keeps_its_mode(run_generator, umask):
+    out = run_generator("--staged")
+    out.chmod(0o750)
+
+    run_generator("--staged")
+
+    assert mode(out) == 0o750
+
+
+def test_unchanged_files_are_carried_over_by_hard_link(run_generator):
+    out = run_generator("--staged", "--incremental")
+    before = snapshot(out)
+
+    run_generator("--staged", "--incremental")
+
+    after = snapshot(out)
+    assert after["BioLens.sln"][0] == before["BioLens.sln"][0]
+    assert (out / "BioLens.sln").stat().st_nlink == 1
+
+
+def test_foreign_files_block_the_swap(run_generator):
+    out = run_generator("--staged")
+    (out / "notes.txt").write_text("keep me")
+    before = snapshot(out)
+
+    with pytest.raises(SystemExit):
+        run_generator("--staged")
+
+    assert snapshot(out) == before
+    assert [path.name for path in out.parent.iterdir()] == [out.name]
+
+
+def test_failed_run_leaves_the_previous_output_in_place(run_generator, monkeypatch):
+    out = run_generator("--staged")
+    before = snapshot(out)
+
+    def fail(key, params=None):
+        raise RuntimeError("render failed")
+    monkeypatch.setattr(generate_code, "render_output", fail)
+
+    with pytest.raises(RuntimeError):
+        run_generator("--staged")
+
+    assert snapshot(out) == before
+    assert [path.name for path in out.parent.iterdir()] == [out.name]